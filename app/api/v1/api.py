@@ -1,8 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, products, categories
+from app.api.v1.endpoints import auth, users, products, categories, uploads, audit
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth")
 api_router.include_router(users.router, prefix="/users")
 api_router.include_router(products.router, prefix="/products")
 api_router.include_router(categories.router, prefix="/categories")
+api_router.include_router(uploads.router, prefix="/uploads")
+api_router.include_router(audit.router, prefix="/audit")
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+from bson import ObjectId
+from typing import Optional
+from app.db.mongodb_config import get_db
+from app.core.audit import AUDIT_COLLECTION
+from app.api.v1.endpoints.utils import require_admin, encode_mongo
+
+router = APIRouter(tags=["Audit"])
+
+
+def _object_id(value: str, name: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return ObjectId(value)
+
+
+# =====================
+# 🕵️ Audit trail (siapa mengubah apa, terbaru dulu)
+# =====================
+@router.get("", dependencies=[Depends(require_admin)])
+async def list_audit_events(
+    entity: Optional[str] = Query(None, pattern="^(products|categories|users)$"),
+    entity_id: Optional[str] = Query(None, description="Wajib bersama entity"),
+    actor_id: Optional[str] = Query(None, description="User yang melakukan perubahan"),
+    action: Optional[str] = Query(None, description="mis. product.update, user.create"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    db=Depends(get_db),
+):
+    """
+    Event audit (ditulis async per batch, jadi event beberapa detik terakhir bisa belum muncul).
+    Filter entity(+entity_id) / actor_id memakai index (meta.entity, meta.entity_id, ts) / (meta.actor_id, ts).
+    """
+    cond = {}
+    if entity_id and not entity:
+        raise HTTPException(status_code=400, detail="entity_id requires entity")
+    if entity:
+        cond["meta.entity"] = entity
+    if entity_id:
+        cond["meta.entity_id"] = _object_id(entity_id, "entity_id")
+    if actor_id:
+        cond["meta.actor_id"] = _object_id(actor_id, "actor_id")
+    if action:
+        cond["action"] = action
+    if since or until:
+        cond["ts"] = {}
+        if since:
+            cond["ts"]["$gte"] = since
+        if until:
+            cond["ts"]["$lt"] = until
+
+    total = await db[AUDIT_COLLECTION].count_documents(cond)
+    cursor = (
+        db[AUDIT_COLLECTION].find(cond)
+        .sort("ts", -1)
+        .skip((page - 1) * page_size)
+        .limit(page_size)
+    )
+    items = []
+    async for ev in cursor:
+        ev.pop("_id", None)
+        meta = ev.pop("meta", {})
+        items.append({**meta, **ev})
+
+    return {
+        "items": encode_mongo(items),
+        "meta": {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size,
+        },
+    }
@@ -1,13 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timezone
+from typing import Optional
 from bson import ObjectId
-from app.core.security import create_access_token, verify_password, hash_password, decode_token
-from app.db.mongodb_config import get_db
+from pymongo.errors import DuplicateKeyError
+from app.core.security import issue_tokens, verify_password, hash_password, decode_token
+from app.db.mongodb_config import get_db, CI_COLLATION, exists_case_insensitive
+from app.core.search import USER_SEARCH_FIELDS, user_search_fields
+from app.core.audit import record_event, diff_fields
 
 router = APIRouter(tags=["Auth"])
 
 
+async def _revoke(db, payload: dict) -> bool:
+    """
+    Catat jti token di revoked_tokens (hilang sendiri via TTL saat exp). False = sudah dicabut sebelumnya.
+    """
+    res = await db.revoked_tokens.update_one(
+        {"jti": payload["jti"]},
+        {"$setOnInsert": {"jti": payload["jti"],
+                          "expiresAt": datetime.fromtimestamp(payload["exp"], tz=timezone.utc)}},
+        upsert=True,
+    )
+    return res.upserted_id is not None
+
+
 @router.post("/register")
 async def register_user(
     email: str = Body(..., embed=True),
@@ -16,8 +33,9 @@ async def register_user(
     phone_number: str | None = Body(None, embed=True),
     db=Depends(get_db),
 ):
-    existing = await db.users.find_one({"email": email})
-    if existing:
+    # sama dengan normalisasi migrasi 0002 (spasi ikut dibandingkan index unik)
+    email = email.strip()
+    if await exists_case_insensitive(db, "users", "email_ci_unique", {"email": email}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     has_admin = await db.users.find_one({"role": "admin"}) is not None
@@ -28,16 +46,25 @@ async def register_user(
         "email": email,
         "full_name": full_name,
         "phone_number": phone_number,
+        **user_search_fields(full_name, email, phone_number),
         "profile_image": None,
         "role": role,
         "status": "active",
         "hashed_password": hash_password(password),
         "created_at": now,
         "updated_at": now,
+        "version": 1,
     }
-    res = await db.users.insert_one(doc)
-    user = await db.users.find_one({"_id": res.inserted_id}, {"hashed_password": 0})
-    user["_id"] = str(user["_id"])
+    try:
+        # unik case-insensitive dijaga index (collation)
+        res = await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    # role pertama (admin) ditentukan di sini -> ikut tercatat
+    await record_event("user.register", "users", res.inserted_id, diff_fields(None, doc, ["email", "role", "status"]))
+    # bangun response dari dokumen yang di-insert (tanpa baca ulang)
+    user = {k: v for k, v in doc.items() if k != "hashed_password" and k not in USER_SEARCH_FIELDS}
+    user["_id"] = str(res.inserted_id)
     return {"message": "Registered", "user": user}
 
 
@@ -46,30 +73,57 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db=Depends(get_db)
 ):
-    user = await db.users.find_one({"email": form_data.username})
+    user = await db.users.find_one({"email": form_data.username.strip()}, collation=CI_COLLATION)
     if not user or not verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
 
-    token_data = create_access_token(str(user["_id"]))
+    token_data = issue_tokens(user)
     # kirim juga role agar client-side bisa menyesuaikan UI
     token_data["role"] = user.get("role", "user")
     return token_data
 
+@router.post("/refresh")
+async def refresh_token(refresh_token: str = Body(..., embed=True), db=Depends(get_db)):
+    """
+    Tukar refresh token dengan access token baru. Role/status dibaca ulang dari DB di sini,
+    jadi perubahan role / nonaktif berlaku paling lambat 1 umur access token.
+    Refresh token di-rotate: yang lama dicatat di revoked_tokens dan tidak bisa dipakai lagi.
+    """
+    payload = decode_token(refresh_token, token_type="refresh")
+    if not payload or not payload.get("jti") or not payload.get("sub"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    try:
+        user_id = ObjectId(payload["sub"])
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    if not await _revoke(db, payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token already used")
+
+    user = await db.users.find_one({"_id": user_id}, {"role": 1, "status": 1})
+    if not user or user.get("status", "active") != "active":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+
+    token_data = issue_tokens(user)
+    token_data["role"] = user.get("role", "user")
+    return token_data
+
 @router.post("/logout")
-async def logout(token: str = Body(..., embed=True), db=Depends(get_db)):
-    # payload = decode_token(token)
-    # if not payload:
-    #     raise HTTPException(status_code=401, detail="Invalid token")
-    # jti = payload.get("jti")
-    # exp = payload.get("exp")
-    # if not jti or not exp:
-    #     raise HTTPException(status_code=400, detail="Bad token payload")
-    #
-    # from datetime import datetime, timezone
-    # expires_at = datetime.fromtimestamp(exp, tz=timezone.utc)
-    # await db.revoked_tokens.update_one(
-    #     {"jti": jti},
-    #     {"$set": {"jti": jti, "expiresAt": expires_at}},
-    #     upsert=True
-    # )
+async def logout(
+    token: Optional[str] = Body(None, embed=True, description="access token"),
+    refresh_token: Optional[str] = Body(None, embed=True),
+    db=Depends(get_db),
+):
+    """
+    Cabut access token dan/atau refresh token (jti -> revoked_tokens).
+    Mode stateless: access token tidak dicek ke DB, jadi tetap berlaku sampai `exp`
+    (maks STATELESS_ACCESS_TOKEN_MINUTES); refresh token langsung tidak bisa dipakai lagi.
+    """
+    payloads = [p for p in (decode_token(token) if token else None,
+                            decode_token(refresh_token, token_type="refresh") if refresh_token else None)
+                if p and p.get("jti") and p.get("exp")]
+    if not payloads:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    for payload in payloads:
+        await _revoke(db, payload)
     return {"message": "Logged out"}
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Header, Response
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from typing import Optional
-from app.db.mongodb_config import get_db
-from app.api.v1.endpoints.utils import get_current_user, require_admin
+from app.db.mongodb_config import get_db, exists_case_insensitive
+from app.core.cache import cached, invalidate_categories
+from app.core.audit import record_event, diff_fields
+from app.archive import ARCHIVE_COLLECTION
+from app.api.v1.endpoints.utils import get_current_user, require_admin, build_projection, parse_if_match, \
+    version_filter, set_etag, raise_write_failed, parse_object_ids, batch_response
+
+CATEGORY_FIELDS = ["_id", "name", "slug", "status", "created_at", "updated_at", "version"]
 
 router = APIRouter(tags=["Categories"], prefix="/categories")
 
@@ -17,8 +25,10 @@ async def list_categories(
     status: Optional[str] = Query(None, pattern="^(active|inactive)$"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma separated field list, '*' untuk semua field"),
     current_user=Depends(get_current_user),
 ):
+    projection, requested = build_projection(fields, CATEGORY_FIELDS)
     cond = {}
     ands = []
     if q:
@@ -33,29 +43,33 @@ async def list_categories(
     if ands:
         cond = {"$and": ands}
 
-    total = await db.categories.count_documents(cond)
-    cursor = (
-        db.categories.find(cond)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
-        .sort("created_at", -1)
-    )
-
-    items = []
-    async for d in cursor:
-        d["_id"] = str(d["_id"])
-        items.append(d)
-
-    pages = (total + page_size - 1) // page_size
-    return {
-        "items": items,
-        "meta": {
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "pages": pages
+    async def fetch():
+        total = await db.categories.count_documents(cond)
+        cursor = (
+            db.categories.find(cond, projection)
+            .skip((page - 1) * page_size)
+            .limit(page_size)
+            .sort("created_at", -1)
+        )
+
+        items = []
+        async for d in cursor:
+            d["_id"] = str(d["_id"])
+            items.append(d)
+
+        pages = (total + page_size - 1) // page_size
+        return {
+            "items": items,
+            "meta": {
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "pages": pages
+            }
         }
-    }
+
+    key = ("list", q, status, page, page_size, tuple(sorted(requested)) if requested is not None else "*")
+    return await cached("categories", key, fetch)
 
 # =====================
 # 🟩 Simple Select list (for dropdowns)
@@ -65,24 +79,39 @@ async def select_categories(
     db=Depends(get_db),
     status: Optional[str] = Query("active", pattern="^(active|inactive)$")
 ):
-    cond = {"status": status}
-    cursor = db.categories.find(cond, {"name": 1})
-    items = []
-    async for cat in cursor:
-        items.append({"id": str(cat["_id"]), "name": cat["name"]})
-    return items
+    async def fetch():
+        cursor = db.categories.find({"status": status}, {"name": 1})
+        return [{"id": str(cat["_id"]), "name": cat["name"]} async for cat in cursor]
+
+    return await cached("categories", ("select", status), fetch)
+
+# =====================
+# 🟩 Get many categories by id (1 query $in)
+# =====================
+@router.get("/batch")
+async def get_categories_batch(
+    ids: str = Query(..., description="Comma separated category id (maks BATCH_GET_MAX_IDS)"),
+    fields: Optional[str] = Query(None, description="Comma separated field list, '*' untuk semua field"),
+    db=Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    oids = parse_object_ids(ids)
+    projection, requested = build_projection(fields, CATEGORY_FIELDS)
+    docs = await db.categories.find({"_id": {"$in": oids}}, projection).to_list(length=len(oids))
+    return batch_response(oids, docs)
 
 # =====================
 # 🟨 Get single category detail
 # =====================
 @router.get("/{category_id}")
-async def get_category(category_id: str, db=Depends(get_db)):
+async def get_category(category_id: str, response: Response, db=Depends(get_db)):
     if not ObjectId.is_valid(category_id):
         raise HTTPException(400, "Invalid category id")
     cat = await db.categories.find_one({"_id": ObjectId(category_id)})
     if not cat:
         raise HTTPException(404, "Category not found")
     cat["_id"] = str(cat["_id"])
+    set_etag(response, cat.get("version"))
     return cat
 
 # =====================
@@ -90,13 +119,14 @@ async def get_category(category_id: str, db=Depends(get_db)):
 # =====================
 @router.post("", dependencies=[Depends(require_admin)])
 async def create_category(
+    response: Response,
     name: str = Body(...),
     slug: Optional[str] = Body(None),
     status: str = Body("active", pattern="^(active|inactive)$"),
     db=Depends(get_db),
 ):
-    exist = await db.categories.find_one({"name": name})
-    if exist:
+    name = name.strip()
+    if await exists_case_insensitive(db, "categories", "name_ci_unique", {"name": name}):
         raise HTTPException(400, "Category name already exists")
 
     now = datetime.now(timezone.utc)
@@ -105,10 +135,18 @@ async def create_category(
         "slug": slug,
         "status": status,
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        "version": 1,
     }
-    res = await db.categories.insert_one(doc)
+    try:
+        # nama unik case-insensitive dijaga index (collation)
+        res = await db.categories.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(400, "Category name already exists")
+    await invalidate_categories()
+    await record_event("category.create", "categories", res.inserted_id, diff_fields(None, doc))
     doc["_id"] = str(res.inserted_id)
+    set_etag(response, doc["version"])
     return {"message": "Created", "category": doc}
 
 # =====================
@@ -117,9 +155,11 @@ async def create_category(
 @router.put("/{category_id}", dependencies=[Depends(require_admin)])
 async def update_category(
     category_id: str,
+    response: Response,
     name: Optional[str] = Body(None),
     slug: Optional[str] = Body(None),
     status: Optional[str] = Body(None),
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
     db=Depends(get_db),
 ):
     if not ObjectId.is_valid(category_id):
@@ -127,7 +167,10 @@ async def update_category(
 
     update = {}
     if name is not None:
-        update["name"] = name
+        update["name"] = name.strip()
+        dup = {"name": update["name"], "_id": {"$ne": ObjectId(category_id)}}
+        if await exists_case_insensitive(db, "categories", "name_ci_unique", dup):
+            raise HTTPException(400, "Category name already exists")
     if slug is not None:
         update["slug"] = slug
     if status is not None:
@@ -136,29 +179,49 @@ async def update_category(
         return {"message": "Nothing to update"}
 
     update["updated_at"] = datetime.now(timezone.utc)
-    res = await db.categories.update_one({"_id": ObjectId(category_id)}, {"$set": update})
-    if res.matched_count == 0:
-        raise HTTPException(404, "Category not found")
-
-    doc = await db.categories.find_one({"_id": ObjectId(category_id)})
+    expected = parse_if_match(if_match)
+    try:
+        # syarat versi (If-Match) ada di filter -> tetap 1 round-trip; dokumen baru = lama + $set
+        old = await db.categories.find_one_and_update(
+            version_filter(ObjectId(category_id), expected),
+            {"$set": update, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(400, "Category name already exists")
+    if not old:
+        await raise_write_failed([db.categories], ObjectId(category_id), expected, "Category not found")
+    await invalidate_categories()
+    await record_event("category.update", "categories", old["_id"], diff_fields(old, update))
+    doc = {**old, **update, "version": old.get("version", 0) + 1}
     doc["_id"] = str(doc["_id"])
+    set_etag(response, doc["version"])
     return {"message": "Updated", "category": doc}
 
 # =====================
 # 🟥 Delete category
 # =====================
 @router.delete("/{category_id}", dependencies=[Depends(require_admin)])
-async def delete_category(category_id: str, db=Depends(get_db)):
+async def delete_category(
+    category_id: str,
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
+    db=Depends(get_db),
+):
     if not ObjectId.is_valid(category_id):
         raise HTTPException(400, "Invalid id")
 
-    # Cek apakah masih digunakan oleh produk
-    used = await db.products.find_one({"category_id": ObjectId(category_id)})
+    # Cek apakah masih digunakan oleh produk (termasuk produk arsip: restore butuh kategorinya)
+    cond = {"category_id": ObjectId(category_id)}
+    used = await db.products.find_one(cond, {"_id": 1}) or \
+        await db[ARCHIVE_COLLECTION].find_one(cond, {"_id": 1})
     if used:
         raise HTTPException(400, "Cannot delete category; still used by products.")
 
-    res = await db.categories.delete_one({"_id": ObjectId(category_id)})
+    expected = parse_if_match(if_match)
+    res = await db.categories.delete_one(version_filter(ObjectId(category_id), expected))
     if res.deleted_count == 0:
-        raise HTTPException(404, "Category not found")
+        await raise_write_failed([db.categories], ObjectId(category_id), expected, "Category not found")
+    await invalidate_categories()
+    await record_event("category.delete", "categories", ObjectId(category_id))
 
     return {"message": "Deleted successfully"}
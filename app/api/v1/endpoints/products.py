@@ -1,13 +1,28 @@
 import os
+import re
+import time
+import asyncio
 
 from math import ceil
 from typing import Optional, List, Union, Annotated
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Header, Response
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime, timezone
 from app.db.mongodb_config import get_db
 from app.core.config import settings
-from app.api.v1.endpoints.utils import get_current_user, save_upload_file, require_admin, normalize_upload_list, encode_mongo
+from app.core.singleflight import singleflight
+from app.core.cache import cached, invalidate_products, shared_generation
+from app.core.search import normalize_key, prefix_filter
+from app.core.storage import get_storage, key_from_path
+from app.core.audit import record_event, diff_fields
+from app.core.events import broker, publish_product_event
+from app.archive import ARCHIVE_COLLECTION, restore_product
+from app.api.v1.endpoints.uploads import public_url, with_public_urls
+from app.api.v1.endpoints.utils import get_current_user, save_upload_file, require_admin, normalize_upload_list, encode_mongo, \
+    build_projection, trim_fields, enqueue_upload_deletion, parse_if_match, version_filter, set_etag, raise_write_failed, \
+    parse_object_ids, batch_response
 
 ImagesParam = Annotated[Union[List[UploadFile], List[str]], File()]
 
@@ -19,6 +34,172 @@ basic_access = [Depends(get_current_user)]
 # admin_access = None
 # basic_access = None
 
+# Sparse fieldsets (?fields=): field dokumen + field turunan beserta dependency-nya
+PRODUCT_FIELDS = [
+    "_id", "name", "description", "price", "category_id", "images", "stock",
+    "low_stock_threshold", "status", "created_at", "updated_at", "version",
+]
+PRODUCT_COMPUTED = {
+    "category_name": {"category_id": 1},
+    "is_low_stock": {"stock": 1, "low_stock_threshold": 1},
+    "thumbnail": {"images": {"$slice": 1}},
+}
+# Default list view: cukup untuk grid (tanpa description & array images penuh)
+PRODUCT_LIST_DEFAULT = ["_id", "name", "price", "stock", "status", "category_name", "thumbnail", "is_low_stock"]
+FIELDS_DESC = "Comma separated field list, '*' untuk semua field"
+# field internal (kunci index pencarian) -> tidak pernah ikut ke response
+PRODUCT_INTERNAL_FIELDS = ("name_key",)
+
+
+def _strip_internal(doc: dict) -> dict:
+    for f in PRODUCT_INTERNAL_FIELDS:
+        doc.pop(f, None)
+    return doc
+
+
+def _match_stages(query: dict, include_archived: bool) -> list:
+    # include_archived -> hasil products + products_archive (filter sama) sebelum sort/paging
+    stages = [{"$match": query}]
+    if include_archived:
+        stages.append({"$unionWith": {"coll": ARCHIVE_COLLECTION, "pipeline": [{"$match": query}]}})
+    return stages
+
+
+async def _find_product(db, product_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+    """
+    Cari di products, lalu di arsip (cold tier) kalau tidak ada.
+    """
+    doc = await db.products.find_one({"_id": product_id}, projection)
+    if doc is None:
+        doc = await db[ARCHIVE_COLLECTION].find_one({"_id": product_id}, projection)
+    return doc
+
+
+async def _update_hot(db, product_id: ObjectId, change: dict, expected: Optional[List[int]] = None,
+                      match: Optional[dict] = None, no_match: str = "Product not found", **kwargs) -> dict:
+    """
+    find_one_and_update (+ version naik) di products dengan syarat versi If-Match (+ syarat `match`);
+    produk yang sudah diarsip dipulihkan dulu (di-write = hot lagi), hanya kalau arsipnya memenuhi syarat
+    yang sama. Tidak kena -> 404 / 412, produk ada & versi cocok tapi `match` tidak terpenuhi -> 404
+    `no_match` (tanpa write).
+    """
+    change = {**change, "$inc": {"version": 1}}
+    cond = {**version_filter(product_id, expected), **(match or {})}
+    doc = await db.products.find_one_and_update(cond, change, **kwargs)
+    if doc is None and await restore_product(db, product_id, cond):
+        doc = await db.products.find_one_and_update(cond, change, **kwargs)
+    if doc is None:
+        if match:
+            current = await _find_product(db, product_id, {"version": 1})
+            if current and (expected is None or (current.get("version") or 0) in expected):
+                raise HTTPException(status_code=404, detail=no_match)
+        await raise_write_failed([db.products, db[ARCHIVE_COLLECTION]], product_id, expected, "Product not found")
+    return doc
+
+
+# Cache nama kategori per worker: dimuat penuh (jumlah kategori kecil), dianggap basi kalau
+# TTL habis atau generasi "categories" naik: lokal (write di worker ini) atau di result cache
+# (CACHE_BACKEND=redis -> write di worker lain juga terlihat, nama basi tidak masuk cache bersama).
+_category_cache = {"names": {}, "generation": None, "expires": 0.0}
+
+
+async def _category_names(db, category_ids) -> dict:
+    """
+    Nama kategori untuk banyak id sekaligus, dari cache; id yang belum dikenal diambil dengan 1 query $in.
+    """
+    ids = {c for c in category_ids if c}
+    if not ids:
+        return {}
+
+    cache = _category_cache
+    generation = (singleflight.generation("categories"), await shared_generation("categories"))
+    if cache["generation"] != generation or cache["expires"] < time.monotonic():
+        async def load():
+            return {c["_id"]: c.get("name") async for c in db.categories.find({}, {"name": 1})}
+        names = await singleflight.do("categories", ("names", generation[1]), load)
+        cache.update(names=dict(names), generation=generation,
+                     expires=time.monotonic() + settings.CATEGORY_CACHE_TTL_SECONDS)
+
+    missing = [c for c in ids if c not in cache["names"]]
+    if missing:
+        # kategori baru dari worker lain / id yatim -> simpan juga hasil negatif (None)
+        found = {c["_id"]: c.get("name") async for c in db.categories.find({"_id": {"$in": missing}}, {"name": 1})}
+        for c in missing:
+            cache["names"][c] = found.get(c)
+    return {c: cache["names"][c] for c in ids}
+
+
+def _price_boundaries() -> List[float]:
+    return sorted({float(b) for b in settings.PRODUCT_PRICE_BUCKETS.split(",") if b.strip()})
+
+
+def _agg_projection(projection: dict) -> dict:
+    # projection find() -> $project: {"$slice": n} harus jadi ekspresi {"$slice": ["$field", n]}
+    return {
+        k: {"$slice": [f"${k}", v["$slice"]]} if isinstance(v, dict) and "$slice" in v else v
+        for k, v in projection.items()
+    }
+
+
+async def _search_with_facets(db, query: dict, projection: Optional[dict], sort_by: str, sort_dir: int,
+                              skip: int, limit: int, include_archived: bool = False):
+    """
+    1 aggregate: $match sekali, lalu $facet -> halaman hasil, total, dan jumlah per
+    kategori / status / rentang harga (semua dari filter yang sama).
+    """
+    items = [{"$sort": {sort_by: sort_dir}}, {"$skip": skip}, {"$limit": limit}]
+    if projection:
+        items.append({"$project": _agg_projection(projection)})
+
+    boundaries = _price_boundaries()
+    price_facet = [{"$limit": 0}]
+    if len(boundaries) >= 2:
+        price_facet = [{"$bucket": {"groupBy": "$price", "boundaries": boundaries,
+                                    "default": "above", "output": {"count": {"$sum": 1}}}}]
+
+    pipeline = _match_stages(query, include_archived) + [
+        {"$facet": {
+            "items": items,
+            "total": [{"$count": "n"}],
+            "category": [{"$group": {"_id": "$category_id", "count": {"$sum": 1}}}],
+            "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "price": price_facet,
+        }},
+    ]
+    result = (await db.products.aggregate(pipeline).to_list(length=1))[0]
+    total = result["total"][0]["n"] if result["total"] else 0
+
+    names = await _category_names(db, [c["_id"] for c in result["category"]])
+    by_price = {b["_id"]: b["count"] for b in result["price"]}
+    facets = {
+        "category": sorted(
+            ({"id": str(c["_id"]) if c["_id"] else None, "name": names.get(c["_id"]), "count": c["count"]}
+             for c in result["category"]),
+            key=lambda c: -c["count"],
+        ),
+        "status": [{"value": s["_id"], "count": s["count"]} for s in result["status"]],
+        "price": [],
+    }
+    if len(boundaries) >= 2:
+        # semua rentang ditampilkan (count 0 juga) supaya sidebar stabil; "max": None = ke atas
+        facets["price"] = [
+            {"min": lo, "max": hi, "count": by_price.get(lo, 0)}
+            for lo, hi in zip(boundaries, boundaries[1:])
+        ] + [{"min": boundaries[-1], "max": None, "count": by_price.get("above", 0)}]
+    return total, result["items"], facets
+
+
+def _decorate_product(doc: dict, requested: Optional[set], category_names: dict) -> dict:
+    # field turunan hanya dihitung kalau diminta (requested None = semua)
+    if requested is None or "category_name" in requested:
+        doc["category_name"] = category_names.get(doc.get("category_id"))
+    if requested is None or "is_low_stock" in requested:
+        doc["is_low_stock"] = bool(doc.get("stock", 0) <= doc.get("low_stock_threshold", 0))
+    if requested is None or "thumbnail" in requested:
+        images = doc.get("images") or []
+        doc["thumbnail"] = images[0] if images else None
+    return trim_fields(_strip_internal(doc), requested)
+
 
 @router.get("/{product_id}/images", dependencies=basic_access)
 async def get_product_images(product_id: str, db=Depends(get_db)):
@@ -28,7 +209,7 @@ async def get_product_images(product_id: str, db=Depends(get_db)):
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
 
-    product = await db.products.find_one({"_id": ObjectId(product_id)})
+    product = await _find_product(db, ObjectId(product_id), {"images": 1})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -36,13 +217,22 @@ async def get_product_images(product_id: str, db=Depends(get_db)):
     if not images:
         return {"message": "No images for this product", "images": []}
 
+    # ukuran file dari storage aktif (S3/GridFS: stat paralel, bukan satu-satu)
+    storage = get_storage()
+
+    async def _size(img_path):
+        key = key_from_path(img_path)
+        info = await storage.stat(key) if key else None
+        return info.size if info else None
+
+    sizes = await asyncio.gather(*(_size(p) for p in images))
+
     image_info_list = []
-    for img_path in images:
-        # path absolut (buat dapat ukuran file)
-        abs_path = os.path.join(settings.BASE_DIR, img_path.lstrip("/"))
+    for img_path, size in zip(images, sizes):
         file_name = os.path.basename(img_path)
-        size_kb = os.path.getsize(abs_path) / 1024 if os.path.exists(abs_path) else None
+        size_kb = size / 1024 if size is not None else None
         preview_url = f"/uploads/{'/'.join(img_path.split('/')[2:])}" if img_path.startswith("/uploads/") else img_path
+        preview_url = public_url(preview_url)  # bertanda tangan kalau UPLOAD_ACCESS != public
 
         image_info_list.append({
             "file_name": file_name,
@@ -59,13 +249,22 @@ async def get_products(
     search: Optional[str] = Query(None, description="Filter by name (contains)"),
     category_id: Optional[str] = Query(None, description="Filter by category"),
     status: Optional[str] = Query(None, pattern="^(active|inactive)$"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = Query(None, description="true = stock > 0, false = stock habis"),
     sort_by: Optional[str] = Query("created_at", description="Column to sort by"),
     order: Optional[str] = Query("desc", description="Sort order: asc or desc"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESC),
+    facets: bool = Query(False, description="Sertakan jumlah per kategori, status & rentang harga"),
+    include_archived: bool = Query(False, description="Sertakan produk yang sudah diarsip (products_archive)"),
     db=Depends(get_db),
 ):
     """
     Get paginated product list with optional filters and sorting.
+    `facets=true` -> hasil + facet counts dalam 1 aggregate $facet.
+    `include_archived=true` -> ikut cari di cold tier (lebih lambat; default hanya produk hot).
     """
+    projection, requested = build_projection(fields, PRODUCT_FIELDS, PRODUCT_COMPUTED, PRODUCT_LIST_DEFAULT)
 
     query = {}
     if search:
@@ -74,6 +273,14 @@ async def get_products(
         query["category_id"] = ObjectId(category_id)
     if status:
         query["status"] = status
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    if in_stock is not None:
+        query["stock"] = {"$gt": 0} if in_stock else {"$lte": 0}
 
     # Tentukan kolom valid untuk sorting (hindari field yang tidak ada)
     allowed_sort_fields = [
@@ -85,69 +292,178 @@ async def get_products(
 
     sort_dir = -1 if order.lower() == "desc" else 1
 
-    total = await db.products.count_documents(query)
-    pages = ceil(total / page_size) if total > 0 else 1
+    async def fetch():
+        facet_counts = None
+        if facets:
+            total, docs, facet_counts = await _search_with_facets(
+                db, query, projection, sort_by, sort_dir, (page - 1) * page_size, page_size, include_archived
+            )
+        elif include_archived:
+            total = await db.products.count_documents(query) + await db[ARCHIVE_COLLECTION].count_documents(query)
+            pipeline = _match_stages(query, True) + [
+                {"$sort": {sort_by: sort_dir}}, {"$skip": (page - 1) * page_size}, {"$limit": page_size},
+            ]
+            if projection:
+                pipeline.append({"$project": _agg_projection(projection)})
+            docs = await db.products.aggregate(pipeline).to_list(length=page_size)
+        else:
+            total = await db.products.count_documents(query)
+            cursor = (
+                db.products.find(query, projection)
+                .sort(sort_by, sort_dir)
+                .skip((page - 1) * page_size)
+                .limit(page_size)
+            )
+            docs = await cursor.to_list(length=page_size)
+        pages = ceil(total / page_size) if total > 0 else 1
+
+        # join category name (skip kalau tidak diminta)
+        category_names = {}
+        if requested is None or "category_name" in requested:
+            category_names = await _category_names(db, [d.get("category_id") for d in docs])
+
+        items = [encode_mongo(_decorate_product(doc, requested, category_names)) for doc in docs]
+
+        result = {
+            "meta": {
+                "page": page,
+                "page_size": page_size,
+                "pages": pages,
+                "total": total,
+                "sort_by": sort_by,
+                "order": order.lower(),
+                "fields": sorted(requested) if requested is not None else "*",
+            },
+            "items": items,
+        }
+        if facet_counts is not None:
+            result["facets"] = facet_counts
+        return result
+
+    # request identik yang bersamaan (mis. halaman 1 saat flash sale) berbagi 1 fetch
+    key = (page, page_size, search, str(query.get("category_id")), status, min_price, max_price, in_stock,
+           sort_by, sort_dir, tuple(sorted(requested)) if requested is not None else "*", facets, include_archived)
+    result = await cached("products", key, fetch)
+    if settings.UPLOAD_ACCESS == "public":
+        return result
+    return {**result, "items": [with_public_urls(item) for item in result["items"]]}
+
+@router.get("/autocomplete", dependencies=basic_access)
+async def autocomplete_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Awalan nama produk"),
+    limit: int = Query(10, ge=1, le=20),
+    db=Depends(get_db),
+):
+    """
+    Type-ahead nama produk: top-N {id, name, thumbnail} dengan prefix `q`.
+    Range scan di index name_key (ter-normalisasi), tanpa count & tanpa dokumen penuh.
+    """
+    key = normalize_key(q)
+    if not key:
+        return []
+
+    async def fetch():
+        cursor = (
+            db.products.find({"name_key": prefix_filter(key)}, {"name": 1, "images": {"$slice": 1}})
+            .sort("name_key", 1)
+            .limit(limit)
+        )
+        return [
+            {"id": str(d["_id"]), "name": d.get("name"), "thumbnail": (d.get("images") or [None])[0]}
+            async for d in cursor
+        ]
 
-    cursor = (
-        db.products.find(query)
-        .sort(sort_by, sort_dir)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
-    )
+    # ketikan yang sama dari banyak admin / keystroke berulang -> 1 query
+    return [with_public_urls(item) for item in await cached("products", ("autocomplete", key, limit), fetch)]
 
-    items = []
-    async for doc in cursor:
-        # join category name
-        if doc.get("category_id"):
-            cat = await db.categories.find_one({"_id": doc["category_id"]}, {"name": 1})
-            doc["category_name"] = cat["name"] if cat else None
-        else:
-            doc["category_name"] = None
 
-        # tambah info stok menipis
-        doc["is_low_stock"] = bool(
-            doc.get("stock", 0) <= doc.get("low_stock_threshold", 0)
-        )
+@router.get("/events", dependencies=basic_access)
+async def product_events(
+    product_ids: Optional[str] = Query(None, description="Comma separated product id; kosong = semua produk"),
+    last_event_id: Optional[str] = Header(None, description="Resume setelah event ini (dikirim EventSource otomatis)"),
+):
+    """
+    Server-Sent Events perubahan produk (create / update stok, harga, status / delete, transisi low-stock),
+    pengganti polling GET /products.
+    """
+    if broker.client_count >= settings.SSE_MAX_CLIENTS:
+        raise HTTPException(status_code=503, detail="Too many event stream clients", headers={"Retry-After": "5"})
+    ids = {str(i) for i in parse_object_ids(product_ids)} if product_ids else None
+    return StreamingResponse(
+        broker.stream(last_event_id, ids),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx jangan menahan event di buffer proxy
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        # ambil thumbnail (gambar pertama)
-        images = doc.get("images", [])
-        doc["thumbnail"] = images[0] if images else None
 
-        items.append(encode_mongo(doc))
+@router.get("/batch", dependencies=basic_access)
+async def get_products_batch(
+    ids: str = Query(..., description="Comma separated product id (maks BATCH_GET_MAX_IDS)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESC),
+    db=Depends(get_db),
+):
+    """
+    Banyak produk sekaligus (pengganti N x GET /products/{id}): 1 query $in (+ arsip hanya untuk id
+    yang tidak ada di products) dan 1 lookup nama kategori. Urutan mengikuti `ids`; id yang tidak
+    ditemukan ada di `missing`.
+    """
+    oids = parse_object_ids(ids)
+    projection, requested = build_projection(fields, PRODUCT_FIELDS, PRODUCT_COMPUTED)
+
+    docs = await db.products.find({"_id": {"$in": oids}}, projection).to_list(length=len(oids))
+    if len(docs) < len(oids):
+        found = {d["_id"] for d in docs}
+        rest = [i for i in oids if i not in found]
+        docs += await db[ARCHIVE_COLLECTION].find({"_id": {"$in": rest}}, projection).to_list(length=len(rest))
+
+    category_names = {}
+    if requested is None or "category_name" in requested:
+        category_names = await _category_names(db, [d.get("category_id") for d in docs])
+    # tanpa fields= sama dengan detail: semua field + category_name & is_low_stock
+    docs = [
+        _decorate_product(d, requested if requested is not None else set(d) | {"category_name", "is_low_stock"},
+                          category_names)
+        for d in docs
+    ]
+    return batch_response(oids, [with_public_urls(d) for d in docs])
 
-    return {
-        "meta": {
-            "page": page,
-            "page_size": page_size,
-            "pages": pages,
-            "total": total,
-            "sort_by": sort_by,
-            "order": order.lower(),
-        },
-        "items": items,
-    }
 
 @router.get("/{product_id}", dependencies=basic_access)
-async def get_product(product_id: str, db=Depends(get_db)):
+async def get_product(
+    product_id: str,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESC),
+    db=Depends(get_db),
+):
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
-    doc = await db.products.find_one({"_id": ObjectId(product_id)})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Product not found")
-    doc["_id"] = str(doc["_id"])
-    if doc.get("category_id"):
-        cat = await db.categories.find_one({"_id": doc["category_id"]},
-                                           {"name": 1})
-        doc["category_name"] = cat["name"] if cat else None
-    else:
-        doc["category_name"] = None
-
-    doc["is_low_stock"] = bool(
-        doc.get("stock", 0) <= doc.get("low_stock_threshold", 0))
-    return encode_mongo(doc)
+    projection, requested = build_projection(fields, PRODUCT_FIELDS, PRODUCT_COMPUTED)
+    if projection is not None:
+        projection.setdefault("version", 1)  # untuk ETag, walau tidak diminta di fields
+
+    async def fetch():
+        doc = await _find_product(db, ObjectId(product_id), projection)
+        if not doc:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        category_names = {}
+        if doc.get("category_id") and (requested is None or "category_name" in requested):
+            category_names = await _category_names(db, [doc["category_id"]])
+        wanted = requested
+        if wanted is None:
+            # detail tanpa fields= tetap seperti sebelumnya (tanpa thumbnail)
+            wanted = set(doc) | {"category_name", "is_low_stock"}
+        return {"version": doc.get("version", 0), "product": encode_mongo(_decorate_product(doc, wanted, category_names))}
+
+    key = (str(ObjectId(product_id)), tuple(sorted(requested)) if requested is not None else "*")
+    result = await cached("product", key, fetch)
+    set_etag(response, result["version"])
+    return with_public_urls(result["product"])
 
 @router.post("", dependencies=admin_access)
 async def create_product(
+    response: Response,
     name: str = Form(...),
     description: Optional[str] = Form(None),
     price: float = Form(...),
@@ -169,6 +485,7 @@ async def create_product(
     now = datetime.now(timezone.utc)
     doc = {
         "name": name,
+        "name_key": normalize_key(name),
         "description": description,
         "price": float(price),
         "category_id": cat_obj,
@@ -177,16 +494,21 @@ async def create_product(
         "low_stock_threshold": int(low_stock_threshold),
         "status": status,
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        "version": 1,
     }
-    res = await db.products.insert_one(doc)
-    created = await db.products.find_one({"_id": res.inserted_id})
-    return {"message": "Created", "product": encode_mongo(created)}
+    await db.products.insert_one(doc)  # insert_one mengisi doc["_id"]
+    await invalidate_products(doc["_id"])
+    await record_event("product.create", "products", doc["_id"], diff_fields(None, doc))
+    await publish_product_event(db, "product.create", doc["_id"], None, doc)
+    set_etag(response, doc["version"])
+    return {"message": "Created", "product": with_public_urls(encode_mongo(_strip_internal(doc)))}
 
 
 @router.post("/{product_id}/images", dependencies=admin_access)
 async def upload_product_images(
     product_id: str,
+    response: Response,
     files: List[UploadFile] = File(...),   # ← required sekarang (File(...))
     replace: bool = Form(False),
     db=Depends(get_db),
@@ -195,46 +517,52 @@ async def upload_product_images(
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
 
-    # 🔍 pastikan produk ada
-    product = await db.products.find_one({"_id": ObjectId(product_id)})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
     # 🔧 filter file valid
     upload_files = [f for f in files if getattr(f, "filename", None)]
     if not upload_files:
         raise HTTPException(status_code=400, detail="No valid files uploaded")
 
-    # 💾 simpan file ke folder uploads/products
+    # 💾 simpan file ke storage (uploads/products)
     saved_images = []
     for f in upload_files:
         path = await save_upload_file(
             f,
-            base_dir=settings.UPLOAD_DIR,
             sub_dir=settings.PRODUCT_UPLOAD_SUBDIR,
             prefix=f"product_{product_id}_"
         )
         saved_images.append(path)
 
-    # 🔄 update field images
+    # 🔄 update field images + ambil hasil akhir dalam 1 round-trip
+    now = datetime.now(timezone.utc)
     if replace:
-        new_images = saved_images
+        change = {"$set": {"images": saved_images, "updated_at": now}}
     else:
-        new_images = (product.get("images") or []) + saved_images
-
-    await db.products.update_one(
-        {"_id": ObjectId(product_id)},
-        {"$set": {"images": new_images, "updated_at": datetime.now(timezone.utc)}}
-    )
+        change = {"$push": {"images": {"$each": saved_images}}, "$set": {"updated_at": now}}
 
-    # 🔁 ambil ulang produk biar hasil fresh
-    doc = await db.products.find_one({"_id": ObjectId(product_id)})
-    return {"message": "Images uploaded successfully", "product": encode_mongo(doc)}
+    # replace -> ambil dokumen lama supaya file gambar lama ikut dihapus (bukan cuma lepas referensi)
+    try:
+        doc = await _update_hot(
+            db, ObjectId(product_id), change,
+            return_document=ReturnDocument.BEFORE if replace else ReturnDocument.AFTER,
+        )
+    except HTTPException:
+        await enqueue_upload_deletion(db, saved_images)
+        raise
+    await invalidate_products(product_id)
+    await record_event("product.images.upload", "products", doc["_id"],
+                       {"images": {"added": saved_images, "replace": replace}})
+    if replace:
+        await enqueue_upload_deletion(db, [img for img in doc.get("images") or [] if img not in saved_images])
+        doc.update(change["$set"])
+        doc["version"] = doc.get("version", 0) + 1
+    set_etag(response, doc.get("version"))
+    return {"message": "Images uploaded successfully", "product": with_public_urls(encode_mongo(_strip_internal(doc)))}
 
 
 @router.put("/{product_id}", dependencies=admin_access)
 async def update_product(
     product_id: str,
+    response: Response,
     name: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     price: Optional[float] = Form(None),
@@ -242,6 +570,7 @@ async def update_product(
     stock: Optional[int] = Form(None, ge=0),
     low_stock_threshold: Optional[int] = Form(None, ge=0),
     status: Optional[str] = Form(None, pattern="^(active|inactive)$"),
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
     db=Depends(get_db),
 ):
     """
@@ -253,16 +582,13 @@ async def update_product(
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
 
-    # 🔍 Pastikan produk ada
-    product = await db.products.find_one({"_id": ObjectId(product_id)})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
     update = {}
+    category_name = None
 
     # 📝 Field-field yang bisa diupdate
     if name is not None:
         update["name"] = name
+        update["name_key"] = normalize_key(name)
     if description is not None:
         update["description"] = description
     if price is not None:
@@ -276,10 +602,11 @@ async def update_product(
             if not ObjectId.is_valid(category_id):
                 raise HTTPException(status_code=400, detail="Invalid category id format")
             cat_obj = ObjectId(category_id)
-            cat_exist = await db.categories.find_one({"_id": cat_obj, "status": "active"})
+            cat_exist = await db.categories.find_one({"_id": cat_obj, "status": "active"}, {"name": 1})
             if not cat_exist:
                 raise HTTPException(status_code=400, detail="Category not found or inactive")
             update["category_id"] = cat_obj
+            category_name = cat_exist.get("name")
 
     if stock is not None:
         update["stock"] = int(stock)
@@ -293,68 +620,71 @@ async def update_product(
 
     update["updated_at"] = datetime.now(timezone.utc)
 
-    # 💾 Update ke database
-    res = await db.products.update_one(
-        {"_id": ObjectId(product_id)},
-        {"$set": update}
-    )
-
-    if res.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # 🔁 Ambil ulang produk
-    doc = await db.products.find_one({"_id": ObjectId(product_id)})
-
-    # tambahkan category_name untuk display
-    if doc.get("category_id"):
+    # 💾 Update + cek versi + ambil dokumen lama (1 round-trip, tanpa pre-read);
+    # dokumen baru = lama + $set, nilai lama dipakai audit (harga/stok dari -> ke)
+    # produk arsip yang di-update (mis. diaktifkan lagi) kembali ke products
+    before = await _update_hot(db, ObjectId(product_id), {"$set": update}, parse_if_match(if_match),
+                               return_document=ReturnDocument.BEFORE)
+    doc = {**before, **update, "version": before.get("version", 0) + 1}
+    await invalidate_products(product_id)
+    await record_event("product.update", "products", doc["_id"], diff_fields(before, update))
+    await publish_product_event(db, "product.update", doc["_id"], before, doc)
+    set_etag(response, doc.get("version"))
+
+    # tambahkan category_name untuk display (pakai hasil validasi kategori kalau ada)
+    if category_name is not None:
+        doc["category_name"] = category_name
+    elif doc.get("category_id"):
         cat = await db.categories.find_one({"_id": doc["category_id"]}, {"name": 1})
         doc["category_name"] = cat["name"] if cat else None
     else:
         doc["category_name"] = None
 
-    return {"message": "Product updated successfully", "product": encode_mongo(doc)}
+    return {"message": "Product updated successfully", "product": with_public_urls(encode_mongo(_strip_internal(doc)))}
 
 
 @router.delete("/{product_id}", dependencies=admin_access)
-async def delete_product(product_id: str, db=Depends(get_db)):
+async def delete_product(
+    product_id: str,
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
+    db=Depends(get_db),
+):
     """
         Hapus produk dan semua gambar terkait di folder upload.
         """
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
 
-    product = await db.products.find_one({"_id": ObjectId(product_id)})
+    # 🗑️ Hapus dari database (dengan syarat versi) sekaligus ambil daftar gambarnya
+    expected = parse_if_match(if_match)
+    cond = version_filter(ObjectId(product_id), expected)
+    deleted_fields = {"images": 1, "name": 1, "price": 1, "stock": 1, "status": 1}
+    product = await db.products.find_one_and_delete(cond, projection=deleted_fields)
+    if product is None:
+        product = await db[ARCHIVE_COLLECTION].find_one_and_delete(cond, projection=deleted_fields)
+    elif product.get("status") == "inactive":
+        # kandidat arsip: archive_products bisa sedang menyalinnya -> buang salinan arsip yang tertinggal
+        await db[ARCHIVE_COLLECTION].delete_one({"_id": product["_id"]})
     if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # 🔥 Hapus semua file fisik
-    for img_path in product.get("images", []):
-        abs_path = os.path.join(settings.BASE_DIR, img_path.lstrip("/"))
-        delete_file_safe(abs_path)
+        await raise_write_failed([db.products, db[ARCHIVE_COLLECTION]], ObjectId(product_id), expected,
+                                 "Product not found")
+    await invalidate_products(product_id)
+    await record_event("product.delete", "products", product["_id"],
+                       diff_fields(product, {}, ["name", "price", "stock", "status"]))
+    await publish_product_event(db, "product.delete", product["_id"], product, None)
 
-    # 🗑️ Hapus dari database
-    await db.products.delete_one({"_id": ObjectId(product_id)})
+    # 🔥 File fisik dihapus di background (job queue)
+    await enqueue_upload_deletion(db, product.get("images") or [])
 
     return {"message": "Product and images deleted successfully"}
 
 
-def delete_file_safe(filepath: str):
-    """Delete file safely if exists (absolute or relative path)."""
-    try:
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-        elif filepath.startswith("/uploads/"):  # relative URL
-            abs_path = os.path.join(settings.BASE_DIR, filepath.lstrip("/"))
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
-    except Exception as e:
-        print(f"[WARN] Failed to delete file {filepath}: {e}")
-
-
 @router.delete("/{product_id}/images", dependencies=admin_access)
 async def delete_product_images(
     product_id: str,
+    response: Response,
     filename: Optional[str] = Query(None, description="Nama file yang ingin dihapus. Kosongkan untuk hapus semua."),
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
     db=Depends(get_db),
 ):
     """
@@ -363,44 +693,35 @@ async def delete_product_images(
     if not ObjectId.is_valid(product_id):
         raise HTTPException(400, "Invalid product id")
 
-    product = await db.products.find_one({"_id": ObjectId(product_id)})
-    if not product:
-        raise HTTPException(404, "Product not found")
+    # 1 round-trip: $pull / $set dengan ReturnDocument.BEFORE -> tahu file mana yang dilepas.
+    # Syarat gambar ada di filter write -> 404 tidak mengubah produk (versi & cache tetap).
+    if filename:
+        pattern = f"{re.escape(filename)}$"
+        change = {"$pull": {"images": {"$regex": pattern}}}
+        match, no_match = {"images": {"$regex": pattern}}, f"File '{filename}' not found in product"
+    else:
+        change = {"$set": {"images": []}}
+        match, no_match = {"images.0": {"$exists": True}}, "No images found for this product"
+    product = await _update_hot(db, ObjectId(product_id), change, parse_if_match(if_match),
+                                match=match, no_match=no_match, return_document=ReturnDocument.BEFORE)
+    await invalidate_products(product_id)
 
     images: List[str] = product.get("images") or []
-    if not images:
-        raise HTTPException(404, "No images found for this product")
-
     if filename:
         # Hapus 1 file spesifik
-        new_images = []
-        deleted_files = []
-        for img_path in images:
-            if img_path.endswith(filename):
-                delete_file_safe(os.path.join(settings.BASE_DIR, img_path.lstrip("/")))
-                deleted_files.append(img_path)
-            else:
-                new_images.append(img_path)
-
-        if not deleted_files:
-            raise HTTPException(404, f"File '{filename}' not found in product")
-
-        await db.products.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$set": {"images": new_images}}
-        )
-
+        new_images = [img for img in images if not img.endswith(filename)]
+        deleted_files = [img for img in images if img.endswith(filename)]
         msg = f"Deleted {len(deleted_files)} image(s)"
     else:
         # Hapus semua
-        for img_path in images:
-            delete_file_safe(os.path.join(settings.BASE_DIR, img_path.lstrip("/")))
-
-        await db.products.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$set": {"images": []}}
-        )
+        new_images = []
+        deleted_files = images
         msg = "All images deleted"
 
-    doc = await db.products.find_one({"_id": ObjectId(product_id)})
-    return {"message": msg, "product": encode_mongo(doc)}
\ No newline at end of file
+    await enqueue_upload_deletion(db, deleted_files)
+    await record_event("product.images.delete", "products", product["_id"], {"images": {"removed": deleted_files}})
+
+    product["images"] = new_images
+    product["version"] = product.get("version", 0) + 1
+    set_etag(response, product["version"])
+    return {"message": msg, "product": with_public_urls(encode_mongo(_strip_internal(product)))}
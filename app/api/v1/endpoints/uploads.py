@@ -0,0 +1,155 @@
+import asyncio
+import mimetypes
+
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from app.core.config import settings
+from app.core.security import decode_token
+from app.core.storage import LocalStorage, get_storage, key_from_path
+from app.core.upload_urls import signed_url, verify
+from app.api.v1.endpoints.utils import get_current_user
+
+# /api/v1/uploads/... (butuh login)
+router = APIRouter(tags=["Uploads"])
+# /uploads/{path} di root app; dipakai kalau UPLOAD_DELIVERY != static atau UPLOAD_ACCESS != public
+files_router = APIRouter()
+
+
+def public_url(path: Optional[str]) -> Optional[str]:
+    """
+    URL yang bisa dibuka client untuk path '/uploads/...': ditandatangani kalau akses /uploads dibatasi.
+    """
+    if not path or settings.UPLOAD_ACCESS == "public" or not path.startswith("/uploads/"):
+        return path
+    return signed_url(path)
+
+
+# field response yang berisi path upload (string atau list)
+UPLOAD_URL_FIELDS = ("images", "thumbnail", "profile_image")
+
+
+def with_public_urls(doc):
+    """
+    Salinan doc dengan semua path upload lewat public_url. Dipanggil saat response dibuat (setelah
+    cache), jadi yang di-cache tetap path mentah dan signature tidak ikut basi di cache.
+    """
+    if settings.UPLOAD_ACCESS == "public" or not isinstance(doc, dict):
+        return doc
+    out = dict(doc)
+    for field in UPLOAD_URL_FIELDS:
+        value = out.get(field)
+        if isinstance(value, list):
+            out[field] = [public_url(p) if isinstance(p, str) else p for p in value]
+        elif isinstance(value, str):
+            out[field] = public_url(value)
+    return out
+
+
+@router.get("/sign")
+async def sign_upload_url(
+    path: str = Query(..., description="Path file, mis. /uploads/products/xxx.png"),
+    ttl: Optional[int] = Query(None, ge=1, le=7 * 86400, description="Umur URL (detik)"),
+    current_user=Depends(get_current_user),
+):
+    """
+    URL bertanda tangan (HMAC) yang kadaluarsa -> bisa dilayani proxy tanpa memanggil app.
+    """
+    if key_from_path(path) is None:
+        raise HTTPException(status_code=400, detail="Invalid upload path")
+    ttl = ttl or settings.UPLOAD_URL_TTL_SECONDS
+    return {"url": signed_url(path, ttl), "expires_in": ttl}
+
+
+def _check_access(request: Request, path: str, st: Optional[str], ts: Optional[int], e: Optional[int]) -> None:
+    if settings.UPLOAD_ACCESS == "public" or verify(path, st, ts, e):
+        return
+    if settings.UPLOAD_ACCESS == "token":
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        # cukup verifikasi signature + exp JWT (tanpa query DB) di jalur file
+        if scheme.lower() == "bearer" and decode_token(token):
+            return
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    'bytes=a-b' / 'bytes=a-' / 'bytes=-n' -> (start, end) eksklusif. None = kirim utuh
+    (tanpa Range / multi-range / format aneh); range di luar ukuran file -> 416.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+        else:
+            start, end = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def _stream_from_storage(request: Request, storage, key: str) -> Response:
+    info = await storage.stat(key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Last-Modified": formatdate(info.mtime, usegmt=True),
+        "Cache-Control": "public, max-age=86400" if settings.UPLOAD_ACCESS == "public" else "private",
+    }
+    media_type = info.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+    byte_range = _parse_range(request.headers.get("range"), info.size)
+    if byte_range is None:
+        headers["Content-Length"] = str(info.size)
+        return StreamingResponse(storage.get(key), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start)
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{info.size}"
+    return StreamingResponse(storage.get(key, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@files_router.get("/uploads/{file_path:path}", include_in_schema=False)
+async def serve_upload(
+    file_path: str,
+    request: Request,
+    st: Optional[str] = None,
+    ts: Optional[int] = None,
+    e: Optional[int] = None,
+):
+    """
+    Cek akses lalu serahkan pengiriman file ke reverse proxy (X-Accel-Redirect / X-Sendfile),
+    atau kirim sendiri (mode static, dengan dukungan Range). Storage gridfs/s3 selalu di-stream app.
+    """
+    path = f"/uploads/{file_path}"
+    key = key_from_path(path)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    _check_access(request, path, st, ts, e)
+
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        return await _stream_from_storage(request, storage, key)
+
+    abs_path = storage.local_path(key)
+    if abs_path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    media_type = mimetypes.guess_type(abs_path.name)[0] or "application/octet-stream"
+    if settings.UPLOAD_DELIVERY == "x-accel":
+        rel = abs_path.relative_to(storage.base).as_posix()
+        # proxy yang mengecek file ada/tidak (404) dan mengirim isinya
+        redirect = settings.UPLOAD_ACCEL_PREFIX.rstrip("/") + "/" + quote(rel)
+        return Response(headers={"X-Accel-Redirect": redirect}, media_type=media_type)
+    if settings.UPLOAD_DELIVERY == "x-sendfile":
+        return Response(headers={"X-Sendfile": str(abs_path)}, media_type=media_type)
+
+    if not await asyncio.to_thread(abs_path.is_file):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(abs_path, media_type=media_type)
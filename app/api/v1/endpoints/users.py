@@ -3,13 +3,28 @@ import os
 from math import ceil
 
 from typing import Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Header, Response
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
-from app.db.mongodb_config import get_db
+from app.db.mongodb_config import get_db, exists_case_insensitive
 from app.core.config import settings
+from app.core.search import USER_SEARCH_FIELDS, user_search_fields, user_search_filter, name_keys, digits
+from app.core.audit import record_event, diff_fields
 from app.core.security import create_access_token, verify_password, hash_password, decode_token
-from app.api.v1.endpoints.utils import get_current_user, save_upload_file, require_admin, delete_public_upload_safe, encode_mongo
+from app.api.v1.endpoints.utils import get_current_user, save_upload_file, require_admin, encode_mongo, \
+    build_projection, enqueue_upload_deletion, parse_if_match, version_filter, set_etag, raise_write_failed, \
+    parse_object_ids, batch_response
+from app.api.v1.endpoints.uploads import with_public_urls
+
+USER_FIELDS = [
+    "_id", "email", "full_name", "phone_number", "profile_image", "role", "status", "created_at", "updated_at",
+    "version",
+]
+# field internal yang tidak pernah ikut ke response
+USER_HIDDEN_PROJECTION = {"hashed_password": 0, **{f: 0 for f in USER_SEARCH_FIELDS}}
+USER_LIST_DEFAULT = ["_id", "email", "full_name", "phone_number", "profile_image", "role", "status", "created_at"]
 
 dependencies = [Depends(require_admin)]
 
@@ -19,21 +34,21 @@ router = APIRouter(tags=["Users"])
 
 @router.get("/me")
 async def get_me(
+    response: Response,
     current_user=Depends(get_current_user),
     db=Depends(get_db)
 ):
     """
     Ambil data user yang sedang login (dari JWT token).
     """
-    user = await db.users.find_one({"_id": current_user["_id"]})
+    # jangan expose password / field internal
+    user = await db.users.find_one({"_id": current_user["_id"]}, USER_HIDDEN_PROJECTION)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # jangan expose password
-    user.pop("password", None)
-
-    return {"user": encode_mongo(user)}
+    set_etag(response, user.get("version"))
+    return {"user": with_public_urls(encode_mongo(user))}
 
 
 @router.post("", dependencies=dependencies)
@@ -47,8 +62,8 @@ async def create_user(
     profile_image: UploadFile | None | str = File(None),
     db=Depends(get_db),
 ):
-    existing = await db.users.find_one({"email": email})
-    if existing:
+    email = email.strip()
+    if await exists_case_insensitive(db, "users", "email_ci_unique", {"email": email}):
         raise HTTPException(status_code=400, detail="Email already exists")
 
     # Simpan gambar jika ada
@@ -60,7 +75,6 @@ async def create_user(
             and profile_image != "" and profile_image.filename:
         image_path = await save_upload_file(
             profile_image,
-            base_dir=settings.UPLOAD_DIR,
             sub_dir=settings.USER_UPLOAD_SUBDIR,
             prefix=f"user_{email.replace('@','_')}_"
         )
@@ -70,40 +84,50 @@ async def create_user(
         "email": email,
         "full_name": full_name,
         "phone_number": phone_number,
+        **user_search_fields(full_name, email, phone_number),
         "profile_image": image_path,
         "role": role,
         "status": status,
         "hashed_password": hash_password(password),
         "created_at": now,
         "updated_at": now,
+        "version": 1,
     }
-    res = await db.users.insert_one(doc)
-    user = await db.users.find_one({"_id": res.inserted_id}, {"hashed_password": 0})
-    user["_id"] = str(user["_id"])
-    return {"message": "User created successfully", "user": user}
+    try:
+        res = await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        await enqueue_upload_deletion(db, [image_path])
+        raise HTTPException(status_code=400, detail="Email already exists")
+    await record_event("user.create", "users", res.inserted_id,
+                       diff_fields(None, doc, ["email", "full_name", "phone_number", "role", "status"]))
+    user = {k: v for k, v in doc.items() if k not in USER_HIDDEN_PROJECTION}
+    user["_id"] = str(res.inserted_id)
+    return {"message": "User created successfully", "user": with_public_urls(user)}
 
 
 @router.get("", dependencies=dependencies)
 async def get_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None, description="Cari berdasarkan nama/email"),
+    search: Optional[str] = Query(None, description="Cari prefix nama/email/telepon"),
     role: Optional[str] = Query(None, description="Filter berdasarkan role (admin/user)"),
     status: Optional[str] = Query(None, pattern="^(active|inactive)$"),
     sort_by: Optional[str] = Query("created_at", description="Kolom untuk sorting"),
     order: Optional[str] = Query("desc", description="Urutan: asc atau desc"),
+    fields: Optional[str] = Query(None, description="Comma separated field list, '*' untuk semua field"),
     db=Depends(get_db),
 ):
     """
     Ambil daftar user dengan pagination, filter, dan sorting.
     """
+    projection, requested = build_projection(fields, USER_FIELDS, default=USER_LIST_DEFAULT)
+    if projection is None:
+        projection = USER_HIDDEN_PROJECTION  # jangan pernah expose hash password
 
     query = {}
-    if search:
-        query["$or"] = [
-            {"username": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
-        ]
+    if search and search.strip():
+        # field kunci ber-index (prefix ter-normalisasi), bukan regex /i yang scan semua user
+        query.update(user_search_filter(search))
     if role:
         query["role"] = role
     if status:
@@ -111,7 +135,7 @@ async def get_users(
 
     # 🔧 Kolom yang diizinkan untuk sorting
     allowed_sort_fields = [
-        "username", "email", "role", "status", "created_at", "updated_at"
+        "full_name", "email", "role", "status", "created_at", "updated_at"
     ]
     if sort_by not in allowed_sort_fields:
         sort_by = "created_at"
@@ -122,17 +146,13 @@ async def get_users(
     pages = ceil(total / page_size) if total > 0 else 1
 
     cursor = (
-        db.users.find(query)
+        db.users.find(query, projection)
         .sort(sort_by, sort_dir)
         .skip((page - 1) * page_size)
         .limit(page_size)
     )
 
-    items = []
-    async for user in cursor:
-        # optional: hapus password field biar aman
-        user.pop("password", None)
-        items.append(encode_mongo(user))
+    items = [with_public_urls(encode_mongo(user)) async for user in cursor]
 
     return {
         "meta": {
@@ -142,32 +162,53 @@ async def get_users(
             "total": total,
             "sort_by": sort_by,
             "order": order.lower(),
+            "fields": sorted(requested) if requested is not None else "*",
         },
         "items": items,
     }
 
 
+@router.get("/batch", dependencies=dependencies)
+async def get_users_batch(
+    ids: str = Query(..., description="Comma separated user id (maks BATCH_GET_MAX_IDS)"),
+    fields: Optional[str] = Query(None, description="Comma separated field list, '*' untuk semua field"),
+    db=Depends(get_db),
+):
+    """
+    Banyak user sekaligus dengan 1 query $in, urutan mengikuti `ids`.
+    """
+    oids = parse_object_ids(ids)
+    projection, _ = build_projection(fields, USER_FIELDS)
+    if projection is None:
+        projection = USER_HIDDEN_PROJECTION  # jangan pernah expose hash password
+    docs = await db.users.find({"_id": {"$in": oids}}, projection).to_list(length=len(oids))
+    return batch_response(oids, [with_public_urls(d) for d in docs])
+
+
 @router.get("/{user_id}", dependencies=dependencies)
-async def get_user(user_id: str, db=Depends(get_db), current_user=Depends(get_current_user)):
+async def get_user(user_id: str, response: Response, db=Depends(get_db), current_user=Depends(get_current_user)):
     if not ObjectId.is_valid(user_id):
         raise HTTPException(status_code=400, detail="Invalid user id")
     # self or admin
     if str(current_user["_id"]) != user_id and current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    doc = await db.users.find_one({"_id": ObjectId(user_id)}, {"hashed_password": 0})
+    doc = await db.users.find_one({"_id": ObjectId(user_id)}, USER_HIDDEN_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="User not found")
     doc["_id"] = str(doc["_id"])
-    return doc
+    set_etag(response, doc.get("version"))
+    return with_public_urls(doc)
 
 
 @router.put("/{user_id}", dependencies=dependencies)
 async def update_user(
     user_id: str,
+    response: Response,
     full_name: Optional[str] = Form(None),
     phone_number: Optional[str] = Form(None),
     status: Optional[str] = Form(None, pattern="^(active|inactive|)$"),
     profile_image: UploadFile | None | str = File(None),
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
     db=Depends(get_db),
     current_user=Depends(get_current_user),
 ):
@@ -178,12 +219,6 @@ async def update_user(
             "role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
 
-        # Ambil dokumen lama (untuk cleanup gambar lama kalau ganti)
-    old = await db.users.find_one({"_id": ObjectId(user_id)},
-                                  {"hashed_password": 0})
-    if not old:
-        raise HTTPException(status_code=404, detail="User not found")
-
     update = {}
     if full_name is not None:
         update["full_name"] = full_name
@@ -196,44 +231,63 @@ async def update_user(
             and profile_image != "" and profile_image.filename:
         path = await save_upload_file(
             profile_image,
-            base_dir=settings.UPLOAD_DIR,
             sub_dir=settings.USER_UPLOAD_SUBDIR,
             prefix=f"user_{user_id}_"
         )
         update["profile_image"] = path
-        delete_public_upload_safe(old.get("profile_image"))
 
     if not update:
         return {"message": "Nothing to update"}
 
     update["updated_at"] = datetime.now(timezone.utc)
-    res = await db.users.update_one({"_id": ObjectId(user_id)},
-                                    {"$set": update})
-    if res.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
+    # 1 round-trip: cek versi (If-Match) + ambil dokumen lama (untuk cleanup gambar lama),
+    # dokumen baru = lama + $set
+    # kunci search nama / telepon ikut di $set yang sama (tiap kunci hanya butuh field sumbernya)
+    keys = {}
+    if "full_name" in update:
+        keys["search_keys"] = name_keys(full_name)
+    if "phone_number" in update:
+        keys["phone_key"] = digits(phone_number)
+    expected = parse_if_match(if_match)
+    old = await db.users.find_one_and_update(
+        version_filter(ObjectId(user_id), expected),
+        {"$set": {**update, **keys}, "$inc": {"version": 1}},
+        projection=USER_HIDDEN_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not old:
+        await enqueue_upload_deletion(db, [update.get("profile_image")])
+        await raise_write_failed([db.users], ObjectId(user_id), expected, "User not found")
 
-    doc = await db.users.find_one({"_id": ObjectId(user_id)},
-                                  {"hashed_password": 0})
+    if "profile_image" in update:
+        await enqueue_upload_deletion(db, [old.get("profile_image")])
+    await record_event("user.update", "users", old["_id"], diff_fields(old, update))
+
+    doc = {**old, **update, "version": old.get("version", 0) + 1}
     doc["_id"] = str(doc["_id"])
-    return {"message": "Updated", "user": doc}
+    set_etag(response, doc["version"])
+    return {"message": "Updated", "user": with_public_urls(doc)}
 
 
 
 @router.delete("/{user_id}", dependencies=dependencies)
-async def delete_user(user_id: str, db=Depends(get_db)):
+async def delete_user(
+    user_id: str,
+    if_match: Optional[str] = Header(None, description="ETag dari GET; beda versi -> 412"),
+    db=Depends(get_db),
+):
     if not ObjectId.is_valid(user_id):
         raise HTTPException(status_code=400, detail="Invalid user id")
 
-    # Ambil dulu untuk tahu path fotonya
-    doc = await db.users.find_one({"_id": ObjectId(user_id)})
+    # hapus (dengan syarat versi) sekaligus ambil path fotonya
+    expected = parse_if_match(if_match)
+    doc = await db.users.find_one_and_delete(version_filter(ObjectId(user_id), expected),
+                                             projection={"profile_image": 1, "email": 1, "role": 1, "status": 1})
     if not doc:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    res = await db.users.delete_one({"_id": ObjectId(user_id)})
-    if res.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
+        await raise_write_failed([db.users], ObjectId(user_id), expected, "User not found")
+    await record_event("user.delete", "users", doc["_id"], diff_fields(doc, {}, ["email", "role", "status"]))
 
-    # Bersihkan file foto (jika ada). Gagal hapus = diabaikan.
-    delete_public_upload_safe(doc.get("profile_image"))
+    # Bersihkan file foto (jika ada) di background
+    await enqueue_upload_deletion(db, [doc.get("profile_image")])
 
     return {"message": "Deleted"}
@@ -2,12 +2,16 @@ import os
 
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Optional, Callable, Sequence, List
-from fastapi import Depends, HTTPException, UploadFile
+from typing import Optional, Callable, Sequence, List, Tuple
+from fastapi import Depends, HTTPException, Response, UploadFile
 from fastapi.security import OAuth2PasswordBearer
 from app.core.security import decode_token
 from app.db.mongodb_config import get_db
 from app.core.config import settings
+from app.core.jobs import job_handler, enqueue
+from app.core.audit import set_actor
+from app.core.encoding import NegotiatedResponse
+from app.core.storage import CHUNK_SIZE, LocalStorage, get_storage, key_from_path, public_path
 from bson import ObjectId
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
@@ -22,6 +26,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     if not sub:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
+    if settings.AUTH_STATELESS and "role" in payload:
+        # hot path tanpa DB: claim sudah diverifikasi (signature + exp); umur token pendek
+        # menggantikan cek revoked/user di DB. Token lama tanpa claim role -> jalur DB di bawah.
+        try:
+            user_id = ObjectId(sub)
+        except Exception:
+            raise HTTPException(status_code=401, detail="Invalid token payload")
+        if payload.get("status", "active") != "active":
+            raise HTTPException(status_code=401, detail="User is inactive")
+        user = {"_id": user_id, "role": payload["role"], "status": payload.get("status")}
+        set_actor(user)  # actor untuk audit log request ini
+        return user
+
     # cek blacklist (logout)
     revoked = await db.revoked_tokens.find_one({"jti": jti})
     if revoked:
@@ -34,6 +51,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
         user = None
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    set_actor(user)
     return user
 
 def require_roles(*roles: str) -> Callable:
@@ -45,53 +63,66 @@ def require_roles(*roles: str) -> Callable:
 
 require_admin = require_roles("admin")
 
-async def save_upload_file(file: UploadFile, base_dir: str, sub_dir: str, prefix: str = "") -> str:
-    os.makedirs(os.path.join(base_dir, sub_dir), exist_ok=True)
+async def _iter_upload(file: UploadFile, chunk_size: int = CHUNK_SIZE):
+    await file.seek(0)
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def save_upload_file(file: UploadFile, sub_dir: str, prefix: str = "") -> str:
+    """
+    Simpan file upload ke storage aktif (STORAGE_BACKEND) secara streaming, return path public '/uploads/...'.
+    """
     ext = os.path.splitext(file.filename or "")[1].lower() or ".bin"
     filename = f"{prefix}{int(datetime.now(timezone.utc).timestamp()*1000)}{ext}"
-    rel_path = os.path.join(sub_dir, filename).replace("\\", "/")
-    abs_path = os.path.join(base_dir, rel_path)
-
-    content = await file.read()
-    with open(abs_path, "wb") as f:
-        f.write(content)
-    return f"/uploads/{rel_path}"
+    key = f"{sub_dir.strip('/')}/{filename}"
+    await get_storage().put(key, _iter_upload(file), file.content_type)
+    return public_path(key)
 
 
 def _public_upload_to_abs(public_path: Optional[str]) -> Optional[Path]:
     """
-    Konversi path public '/uploads/xxx' -> absolute path di filesystem.
+    Konversi path public '/uploads/xxx' -> absolute path di UPLOAD_DIR (storage local).
     Return None jika formatnya tidak valid / di luar UPLOAD_DIR.
     """
-    if not public_path or not public_path.startswith("/uploads/"):
-        return None
-    # buang prefix route '/uploads/' lalu gabungkan dengan folder fisik settings.UPLOAD_DIR
-    rel = public_path[len("/uploads/"):]
-    base = Path(settings.UPLOAD_DIR).resolve()
-    cand = (base / rel).resolve()
-    try:
-        # Python 3.10+: pastikan masih di bawah base
-        if not str(cand).startswith(str(base)):
-            return None
-    except Exception:
-        return None
-    return cand
+    key = key_from_path(public_path)
+    return LocalStorage().local_path(key) if key else None
+
 
-def delete_public_upload_safe(public_path: Optional[str]) -> bool:
+async def delete_public_upload_safe(public_path: Optional[str]) -> bool:
     """
-    Hapus file upload berdasarkan path public ('/uploads/...').
+    Hapus file upload berdasarkan path public ('/uploads/...') dari storage aktif.
     Mengembalikan True jika berhasil dihapus, False jika tidak ada / gagal (tanpa raise).
     """
-    p = _public_upload_to_abs(public_path)
-    if not p:
+    key = key_from_path(public_path)
+    if not key:
         return False
     try:
-        if p.exists() and p.is_file():
-            p.unlink()
-            return True
+        return await get_storage().delete(key)
     except Exception:
-        pass
-    return False
+        return False
+
+
+async def _delete_uploads(paths: Sequence[str]) -> None:
+    storage = get_storage()
+    for key in filter(None, map(key_from_path, paths)):
+        # file yang sudah terhapus (job dijalankan ulang) -> False, anggap sukses
+        # error lain (permission, disk, S3 down) -> raise supaya job di-retry
+        await storage.delete(key)
+
+
+@job_handler("delete_uploads")
+async def delete_uploads_job(payload: dict) -> None:
+    await _delete_uploads(payload.get("paths") or [])
+
+
+async def enqueue_upload_deletion(db, paths: Sequence[Optional[str]]) -> None:
+    """
+    Hapus file upload ('/uploads/...') di background lewat job queue, bukan di request.
+    """
+    paths = [p for p in paths if p]
+    if paths:
+        await enqueue(db, "delete_uploads", {"paths": paths})
 
 
 async def normalize_upload_list(files: Optional[Sequence[UploadFile | None]]) -> List[UploadFile]:
@@ -131,4 +162,124 @@ def encode_mongo(obj):
         return [encode_mongo(x) for x in obj]
     if isinstance(obj, dict):
         return {k: encode_mongo(v) for k, v in obj.items()}
-    return obj
\ No newline at end of file
+    return obj
+
+def build_projection(
+    fields: Optional[str],
+    allowed: Sequence[str],
+    computed: Optional[dict] = None,
+    default: Optional[Sequence[str]] = None,
+) -> Tuple[Optional[dict], Optional[set]]:
+    """
+    Terjemahkan query `fields=a,b,c` -> projection Mongo.
+    - `allowed`  : field dokumen yang boleh diminta
+    - `computed` : field turunan -> projection yang dibutuhkan, mis. {"thumbnail": {"images": {"$slice": 1}}}
+    - `default`  : dipakai kalau `fields` kosong; None = semua field
+    `fields=*` = semua field. Return (projection | None, set field yang diminta | None).
+    """
+    computed = computed or {}
+    if fields is None or fields.strip() == "":
+        if default is None:
+            return None, None
+        requested = set(default)
+    elif fields.strip() == "*":
+        return None, None
+    else:
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+
+    unknown = requested - set(allowed) - set(computed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+    projection = {f: 1 for f in requested if f in allowed}
+    for name in requested & set(computed):
+        for key, spec in computed[name].items():
+            # field asli yang diminta penuh menang atas kebutuhan computed ($slice dsb)
+            if projection.get(key) != 1:
+                projection[key] = spec
+    projection.setdefault("_id", 1)
+    return projection, requested
+
+
+def parse_object_ids(ids: str, limit: Optional[int] = None) -> List[ObjectId]:
+    """
+    Query `ids=a,b,c` -> list ObjectId unik sesuai urutan input. Id invalid / lebih dari limit -> 400.
+    """
+    limit = limit or settings.BATCH_GET_MAX_IDS
+    raw = [i.strip() for i in ids.split(",") if i.strip()]
+    invalid = [i for i in raw if not ObjectId.is_valid(i)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid id(s): {', '.join(invalid[:10])}")
+    out = list(dict.fromkeys(ObjectId(i) for i in raw))
+    if not out:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(out) > limit:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {limit})")
+    return out
+
+
+def batch_response(ids: Sequence[ObjectId], docs: Sequence[dict]) -> NegotiatedResponse:
+    """
+    Hasil multi-get: items sesuai urutan `ids` + daftar id yang tidak ditemukan.
+    Di-encode sekali (encode_mongo -> render), tanpa jsonable_encoder FastAPI per item.
+    """
+    by_id = {d["_id"]: d for d in docs}
+    return NegotiatedResponse(encode_mongo({
+        "items": [by_id[i] for i in ids if i in by_id],
+        "missing": [i for i in ids if i not in by_id],
+    }))
+
+
+def trim_fields(doc: dict, requested: Optional[set]) -> dict:
+    """
+    Buang field bantu (dependency computed field) yang tidak diminta client.
+    """
+    if requested is None:
+        return doc
+    return {k: v for k, v in doc.items() if k in requested or k == "_id"}
+
+
+# Optimistic concurrency: field `version` naik ($inc) di setiap write, diekspos sebagai ETag.
+# If-Match dicek di filter write itu sendiri -> 1 round-trip, 412 kalau versi sudah berubah.
+def parse_if_match(if_match: Optional[str]) -> Optional[List[int]]:
+    """
+    Header If-Match -> daftar versi yang diterima. None = tanpa syarat (header kosong / '*').
+    ETag yang bukan versi dari API ini tidak pernah cocok (list kosong -> 412); begitu juga weak ETag
+    (W/"..."): If-Match pakai strong comparison (RFC 9110 §13.1.1).
+    """
+    if if_match is None or if_match.strip() in ("", "*"):
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            continue
+        try:
+            versions.append(int(tag.strip('"')))
+        except ValueError:
+            continue
+    return versions
+
+
+def version_filter(_id, expected: Optional[List[int]]) -> dict:
+    cond = {"_id": _id}
+    if expected is not None:
+        # dokumen lama tanpa field version = versi 0
+        cond["version"] = {"$in": expected + [None] if 0 in expected else expected}
+    return cond
+
+
+def set_etag(response: Response, version: Optional[int]) -> None:
+    response.headers["ETag"] = f'"{version or 0}"'
+
+
+async def raise_write_failed(collections: Sequence, _id, expected: Optional[List[int]], detail: str):
+    """
+    Write ber-filter versi tidak kena dokumen: 412 kalau dokumennya ada (versi berubah), selain itu 404.
+    Query tambahan ini hanya di jalur gagal.
+    """
+    if expected is not None:
+        for collection in collections:
+            if await collection.count_documents({"_id": _id}, limit=1):
+                raise HTTPException(status_code=412, detail="Resource was modified (If-Match version mismatch)")
+    raise HTTPException(status_code=404, detail=detail)
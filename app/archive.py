@@ -0,0 +1,180 @@
+"""
+Arsip produk (hot/cold tier): produk inactive yang tidak berubah lebih dari ARCHIVE_AFTER_DAYS
+dipindah per batch ke collection products_archive, supaya index & working set `products`
+hanya berisi data yang masih dipakai. Produk yang di-update lagi dipulihkan otomatis (restore_product).
+
+Contoh:
+    python -m app.archive --dry-run            # hitung kandidat saja
+    python -m app.archive --days 30
+    python -m app.archive --restore <product_id>
+
+Juga jalan terjadwal dari lifespan (ARCHIVE_ENABLED, ARCHIVE_INTERVAL_SECONDS), 1 worker per interval.
+"""
+import os
+import time
+import socket
+import random
+import asyncio
+import argparse
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.cache import invalidate_products
+from app.db.mongodb_config import get_db, acquire_lock
+
+ARCHIVE_COLLECTION = "products_archive"
+
+PRODUCTS_ARCHIVED = registry.counter(
+    "products_archived_total", "Products moved from products to products_archive")
+PRODUCTS_RESTORED = registry.counter(
+    "products_restored_total", "Archived products moved back to products on write")
+PRODUCT_TIER_DOCUMENTS = registry.gauge(
+    "product_tier_documents", "Documents per product tier (hot=products, cold=products_archive)", ("tier",))
+PRODUCT_TIER_BYTES = registry.gauge(
+    "product_tier_bytes", "Data + index bytes per product tier (collStats)", ("tier",))
+
+
+def archive_filter(older_than_days: float) -> dict:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    # pakai index (status, updated_at)
+    return {"status": "inactive", "updated_at": {"$lt": cutoff}}
+
+
+async def archive_products(db, older_than_days: Optional[float] = None, batch_size: Optional[int] = None,
+                           dry_run: bool = False) -> dict:
+    """
+    Pindahkan kandidat per batch dengan 2 write: 1 bulk upsert ke arsip, lalu 1 delete_many dari products
+    dengan filter kandidat yang sama (crash di tengah = dokumen ada di dua tempat, bukan hilang; diulang aman).
+    Produk yang berubah di antara dua langkah itu tetap di products -> salinan arsipnya dibuang; yang dihapus
+    user dibersihkan delete_product (produk inactive ikut menghapus salinan arsipnya).
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cond = archive_filter(days)
+    report = {"candidates": 0, "archived": 0, "skipped": 0, "dry_run": dry_run}
+    started = time.perf_counter()
+
+    if dry_run:
+        report["candidates"] = await db.products.count_documents(cond)
+        report["duration_s"] = round(time.perf_counter() - started, 3)
+        return report
+
+    while True:
+        docs = await db.products.find(cond).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        report["candidates"] += len(docs)
+        now = datetime.now(timezone.utc)
+        await db[ARCHIVE_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": d["_id"]}, {**d, "archived_at": now}, upsert=True) for d in docs],
+            ordered=False,
+        )
+        ids = [d["_id"] for d in docs]
+        deleted = (await db.products.delete_many({"_id": {"$in": ids}, **cond})).deleted_count
+        if deleted < len(ids):
+            # berubah (tidak lagi cocok filter) sejak dibaca -> tetap hot, salinan arsip dibuang
+            still_hot = [d["_id"] async for d in db.products.find({"_id": {"$in": ids}}, {"_id": 1})]
+            if still_hot:
+                await db[ARCHIVE_COLLECTION].delete_many({"_id": {"$in": still_hot}})
+        report["archived"] += deleted
+        report["skipped"] += len(ids) - deleted
+        PRODUCTS_ARCHIVED.inc(amount=deleted)
+
+    if report["archived"]:
+        # list tanpa include_archived berubah (produk inactive lama hilang dari hasil)
+        await invalidate_products()
+    report["duration_s"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def restore_product(db, product_id: ObjectId, cond: Optional[dict] = None) -> Optional[dict]:
+    """
+    Kembalikan 1 produk dari arsip ke products. None kalau tidak ada di arsip atau tidak cocok `cond`
+    (mis. filter versi If-Match): syarat write dicek di dokumen arsip, jadi write yang gagal tidak memulihkan.
+    """
+    doc = await db[ARCHIVE_COLLECTION].find_one({**(cond or {}), "_id": product_id})
+    if not doc:
+        return None
+    doc.pop("archived_at", None)
+    try:
+        await db.products.insert_one(doc)
+    except DuplicateKeyError:
+        pass  # sudah dipulihkan request lain
+    await db[ARCHIVE_COLLECTION].delete_one({"_id": product_id})
+    PRODUCTS_RESTORED.inc()
+    return doc
+
+
+async def _tier_bytes(db, collection: str) -> Optional[float]:
+    try:
+        stats = await db.command({"collStats": collection})
+    except (OperationFailure, NotImplementedError):
+        return None
+    return float(stats.get("size", 0) + stats.get("totalIndexSize", 0))
+
+
+async def update_tier_metrics(db) -> dict:
+    """
+    Ukuran hot vs cold tier -> gauge /metrics (penurunan working set `products` terlihat di sini).
+    """
+    stats = {}
+    for tier, collection in (("hot", "products"), ("cold", ARCHIVE_COLLECTION)):
+        docs = await db[collection].estimated_document_count()
+        size = await _tier_bytes(db, collection)
+        PRODUCT_TIER_DOCUMENTS.set(tier, value=docs)
+        if size is not None:
+            PRODUCT_TIER_BYTES.set(tier, value=size)
+        stats[tier] = {"documents": docs, "bytes": size}
+    return stats
+
+
+async def run_periodically(db, interval: Optional[float] = None) -> None:
+    """
+    Task lifespan: tiap interval, worker yang mendapat lock (_meta.archive_lock) mengarsip produk.
+    """
+    interval = interval or settings.ARCHIVE_INTERVAL_SECONDS
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    await asyncio.sleep(random.uniform(0, min(interval, 60)))
+    while True:
+        try:
+            if await acquire_lock(db, "archive_lock", owner, timedelta(seconds=interval * 0.9)):
+                report = await archive_products(db)
+                await update_tier_metrics(db)
+                if report["archived"]:
+                    print(f"🧊 Product archive: {report}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WARN] product archive failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="Arsipkan produk inactive lama ke products_archive")
+    argp.add_argument("--dry-run", dest="dry_run", action="store_true", help="hitung kandidat saja")
+    argp.add_argument("--days", type=float, default=None, help="umur minimum sejak updated_at (hari)")
+    argp.add_argument("--batch-size", dest="batch_size", type=int, default=None)
+    argp.add_argument("--restore", default=None, metavar="PRODUCT_ID", help="pulihkan 1 produk dari arsip")
+    return argp.parse_args(argv)
+
+
+async def main(args) -> None:
+    db = await get_db()
+    if args.restore:
+        doc = await restore_product(db, ObjectId(args.restore))
+        print(f"✅ Restored {args.restore}" if doc else f"[WARN] {args.restore} not found in archive")
+        return
+    report = await archive_products(db, args.days, args.batch_size, dry_run=args.dry_run)
+    verb = "would archive" if args.dry_run else "archived"
+    count = report["candidates"] if args.dry_run else report["archived"]
+    print(f"✅ {verb} {count:,} products in {report['duration_s']}s")
+    print(await update_tier_metrics(db))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,262 @@
+import re
+import math
+import time
+import asyncio
+import ipaddress
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import decode_token
+
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests rejected by admission control", ("route_class", "reason"))
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "admission_in_flight", "Requests holding an admission slot", ("route_class",))
+ADMISSION_QUEUED = registry.gauge(
+    "admission_queued", "Requests waiting for an admission slot", ("route_class",))
+ADMISSION_WAIT = registry.histogram(
+    "admission_wait_seconds", "Time spent waiting for an admission slot", ("route_class",))
+
+
+def _parse_spec(spec: str, arity: int) -> Dict[str, Tuple[float, ...]]:
+    """
+    "auth=8/32/2,upload=4/16/5" -> {"auth": (8.0, 32.0, 2.0), "upload": (4.0, 16.0, 5.0)}
+    """
+    out = {}
+    for part in (spec or "").split(","):
+        name, _, values = part.strip().partition("=")
+        nums = [float(v) for v in values.split("/") if v.strip()]
+        if name and len(nums) == arity:
+            out[name.strip()] = tuple(nums)
+    return out
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Batas request bersamaan per route class + antrean terbatas dengan timeout.
+    Antrean penuh / timeout -> Rejected(503) supaya gagal cepat, bukan menumpuk.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+
+    async def acquire(self) -> None:
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            ADMISSION_IN_FLIGHT.inc(self.name)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected(503, "queue_full", self.queue_timeout)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[fut] = None
+        ADMISSION_QUEUED.inc(self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, "queue_timeout", self.queue_timeout)
+        except BaseException:
+            # request dibatalkan tepat setelah slot diserahkan -> kembalikan slotnya
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            self._waiters.pop(fut, None)
+            ADMISSION_QUEUED.dec(self.name)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, self.name)
+        # slot sudah dipindahkan oleh release() ke request ini
+
+    def release(self) -> None:
+        # serahkan slot langsung ke waiter berikutnya (FIFO) supaya tidak diserobot
+        while self._waiters:
+            fut, _ = self._waiters.popitem(last=False)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._active -= 1
+        ADMISSION_IN_FLIGHT.dec(self.name)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Token bucket per key (user id / IP). Jumlah key dibatasi (LRU) supaya memori tetap kecil.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = 10_000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, key: str) -> None:
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None) or TokenBucket(self.burst)
+        # bucket baru dibuat setelah `now` -> selisih negatif, jangan sampai mengurangi token
+        bucket.tokens = min(self.burst, bucket.tokens + max(0.0, now - bucket.updated) * self.rate)
+        bucket.updated = now
+        self._buckets[key] = bucket
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        if bucket.tokens < 1:
+            raise Rejected(429, "rate_limited", (1 - bucket.tokens) / self.rate)
+        bucket.tokens -= 1
+
+
+_API = re.escape(settings.API_V1_STR)
+_AUTH_RE = re.compile(rf"^{_API}/auth/(login|register)$")
+_PRODUCT_LIST_RE = re.compile(rf"^{_API}/products/?$")
+
+
+def classify(scope) -> Optional[str]:
+    """
+    Route class untuk endpoint mahal; None = request murah (tidak dibatasi).
+    """
+    method, path = scope["method"], scope["path"]
+    if method == "POST" and _AUTH_RE.match(path):
+        return "auth"  # PBKDF2
+    if method in ("POST", "PUT"):
+        for k, v in scope["headers"]:
+            if k == b"content-type" and v.startswith(b"multipart/form-data"):
+                return "upload"
+        return None
+    if method == "GET" and _PRODUCT_LIST_RE.match(path):
+        qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        try:
+            page = int(qs.get("page", ["1"])[0])
+            page_size = int(qs.get("page_size", ["10"])[0])
+        except ValueError:
+            return None
+        if (qs.get("search") or qs.get("facets", [""])[0].lower() in ("true", "1")
+                or (page - 1) * page_size >= settings.ADMISSION_DEEP_PAGE_OFFSET):
+            return "heavy_list"  # regex scan / aggregate $facet / skip besar
+    return None
+
+
+def _parse_networks(spec: str) -> list:
+    networks = []
+    for part in (spec or "").split(","):
+        if part.strip():
+            try:
+                networks.append(ipaddress.ip_network(part.strip(), strict=False))
+            except ValueError:
+                print(f"[WARN] TRUSTED_PROXIES: invalid address {part.strip()!r} ignored")
+    return networks
+
+
+_TRUSTED_PROXIES = _parse_networks(settings.TRUSTED_PROXIES)
+
+
+def _trusted(addr: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    return any(ip in net for net in _TRUSTED_PROXIES)
+
+
+def client_ip(scope) -> Optional[str]:
+    """
+    IP client: koneksi langsung, atau lewat proxy tepercaya (TRUSTED_PROXIES) hop X-Forwarded-For paling
+    kanan yang bukan proxy tepercaya (hop di kirinya bisa dipalsukan client).
+    """
+    client = scope.get("client")
+    addr = client[0] if client else None
+    if addr is None or not _trusted(addr):
+        return addr
+    forwarded = ",".join(v.decode("latin-1") for k, v in scope["headers"] if k == b"x-forwarded-for")
+    for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+        if not _trusted(hop):
+            return hop
+        addr = hop
+    return addr
+
+
+def _client_key(scope) -> str:
+    for k, v in scope["headers"]:
+        if k == b"authorization" and v[:7].lower() == b"bearer ":
+            payload = decode_token(v[7:].decode("latin-1"))
+            if payload and payload.get("sub"):
+                return f"user:{payload['sub']}"
+    return f"ip:{client_ip(scope) or 'unknown'}"
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware: rate limit per user (429) lalu batas concurrency per route class (503),
+    keduanya dengan header Retry-After. Request murah tidak tersentuh.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limiters = {
+            name: ConcurrencyLimiter(name, int(c), int(q), t)
+            for name, (c, q, t) in _parse_spec(settings.ADMISSION_LIMITS, 3).items()
+        }
+        self.rate_limiters = {
+            name: RateLimiter(name, rate, burst)
+            for name, (rate, burst) in _parse_spec(settings.RATE_LIMITS, 2).items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route_class = classify(scope)
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiters.get(route_class)
+        try:
+            rate_limiter = self.rate_limiters.get(route_class)
+            if rate_limiter:
+                rate_limiter.check(_client_key(scope))
+            if limiter:
+                await limiter.acquire()
+        except Rejected as e:
+            ADMISSION_REJECTED.inc(route_class, e.reason)
+            return await self._reject(send, e)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if limiter:
+                limiter.release()
+
+    @staticmethod
+    async def _reject(send, e: Rejected):
+        body = (b'{"detail":"Server busy, retry later"}' if e.status == 503
+                else b'{"detail":"Too many requests"}')
+        await send({
+            "type": "http.response.start",
+            "status": e.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(e.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
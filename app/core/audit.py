@@ -0,0 +1,201 @@
+"""
+Audit log perubahan katalog & user (siapa mengubah harga, stok, role, status, ...).
+
+Handler hanya menaruh event ke antrean in-memory (tanpa round-trip DB); flusher di background
+menulis per batch dengan insert_many (AUDIT_BATCH_SIZE event atau tiap AUDIT_FLUSH_INTERVAL_MS).
+Antrean penuh -> tunggu maks AUDIT_ENQUEUE_TIMEOUT_MS (backpressure), lalu event di-drop + dihitung
+di metrics. Saat shutdown sisa antrean di-flush.
+
+Collection `audit_log` = time-series (ts + meta entitas/actor, MongoDB >= 5.0) dengan expireAfterSeconds;
+server lama -> collection biasa + TTL index di `ts`.
+"""
+import time
+import asyncio
+
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from pymongo.errors import CollectionInvalid, OperationFailure
+from app.core.config import settings
+from app.core.metrics import registry
+
+AUDIT_COLLECTION = "audit_log"
+
+# field yang tidak perlu masuk audit (turunan / berubah di setiap write)
+IGNORED_FIELDS = {"_id", "updated_at", "created_at", "version", "name_key", "search_keys", "email_key", "phone_key",
+                  "hashed_password"}
+
+AUDIT_EVENTS = registry.counter(
+    "audit_events_total", "Audit events by outcome (queued, dropped, written, failed)", ("result",))
+AUDIT_QUEUE_SIZE = registry.gauge(
+    "audit_queue_size", "Audit events waiting to be flushed in this worker")
+AUDIT_FLUSH_DURATION = registry.histogram(
+    "audit_flush_duration_seconds", "insert_many time per audit batch")
+
+# actor request aktif, diisi get_current_user
+_current_actor: ContextVar[Optional[dict]] = ContextVar("audit_actor", default=None)
+
+
+def set_actor(user: dict) -> None:
+    _current_actor.set({"_id": user.get("_id"), "role": user.get("role")})
+
+
+def diff_fields(before: Optional[dict], after: dict, fields: Optional[Iterable[str]] = None) -> dict:
+    """
+    {field: {"from": lama, "to": baru}} untuk field yang berubah. before=None (create) -> from None.
+    """
+    before = before or {}
+    keys = fields if fields is not None else after.keys()
+    return {
+        k: {"from": before.get(k), "to": after.get(k)}
+        for k in keys
+        if k not in IGNORED_FIELDS and before.get(k) != after.get(k)
+    }
+
+
+class AuditLog:
+    """
+    Antrean + flusher per worker. record() aman dipanggil walau flusher tidak jalan (no-op).
+    """
+
+    def __init__(self):
+        self.db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._batch: List[dict] = []  # batch yang sedang dikumpulkan (ikut di-flush saat stop)
+
+    def start(self, db) -> None:
+        self.db = db
+        self._queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Hentikan flusher, tunggu batch yang sedang ditulis, lalu flush sisa antrean.
+        """
+        queue, self._queue = self._queue, None
+        if queue is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+        if self._batch:
+            await self._write(self._batch)
+            self._batch = []
+        while not queue.empty():
+            batch = [queue.get_nowait() for _ in range(min(queue.qsize(), settings.AUDIT_BATCH_SIZE))]
+            await self._write(batch)
+        AUDIT_QUEUE_SIZE.set(value=0)
+
+    async def record(self, action: str, entity: str, entity_id, changes: Optional[dict] = None) -> bool:
+        """
+        Antrekan 1 event. Return False kalau audit mati / event di-drop (antrean penuh).
+        """
+        queue = self._queue
+        if queue is None:
+            return False
+        actor = _current_actor.get() or {}
+        event = {
+            "ts": datetime.now(timezone.utc),
+            # actor_id di meta: index sekunder time-series (< 6.0) hanya boleh di metaField/timeField
+            "meta": {"entity": entity, "entity_id": entity_id, "actor_id": actor.get("_id")},
+            "action": action,
+            "actor_role": actor.get("role"),
+            "changes": changes or {},
+        }
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            timeout = settings.AUDIT_ENQUEUE_TIMEOUT_MS / 1000
+            try:
+                if timeout <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(queue.put(event), timeout)
+            except asyncio.TimeoutError:
+                AUDIT_EVENTS.inc("dropped")
+                return False
+        AUDIT_EVENTS.inc("queued")
+        AUDIT_QUEUE_SIZE.set(value=queue.qsize())
+        return True
+
+    async def _next_batch(self) -> List[dict]:
+        queue = self._queue
+        batch = self._batch = [await queue.get()]
+        deadline = time.monotonic() + settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+        while len(batch) < settings.AUDIT_BATCH_SIZE:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            self._batch = []
+            AUDIT_QUEUE_SIZE.set(value=self._queue.qsize() if self._queue else 0)
+            # shield: cancel saat shutdown tidak memotong insert_many yang sedang jalan
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def _write(self, batch: List[dict]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.db[AUDIT_COLLECTION].insert_many(batch, ordered=False)
+            AUDIT_EVENTS.inc("written", amount=len(batch))
+        except Exception as e:
+            AUDIT_EVENTS.inc("failed", amount=len(batch))
+            print(f"[WARN] audit flush failed ({len(batch)} events): {e}")
+        finally:
+            AUDIT_FLUSH_DURATION.observe(time.perf_counter() - start)
+
+
+audit_log = AuditLog()
+
+
+async def record_event(action: str, entity: str, entity_id, changes: Optional[dict] = None) -> bool:
+    return await audit_log.record(action, entity, entity_id, changes)
+
+
+async def ensure_audit_collection(db) -> None:
+    """
+    Buat `audit_log` sebagai time-series dengan TTL (sekali, sebelum index build); kalau server
+    tidak mendukung -> collection biasa + TTL index. Retensi diselaraskan dengan AUDIT_RETENTION_DAYS.
+    """
+    retention = int(settings.AUDIT_RETENTION_DAYS * 86400)
+    try:
+        if AUDIT_COLLECTION not in await db.list_collection_names():
+            try:
+                await db.create_collection(
+                    AUDIT_COLLECTION,
+                    timeseries={"timeField": "ts", "metaField": "meta", "granularity": "seconds"},
+                    expireAfterSeconds=retention,
+                )
+                return
+            except CollectionInvalid:
+                pass  # dibuat worker lain
+            except (OperationFailure, TypeError, NotImplementedError):
+                await db.create_collection(AUDIT_COLLECTION)
+
+        options = await db[AUDIT_COLLECTION].options()
+        if "timeseries" in options:
+            if options.get("expireAfterSeconds") != retention:
+                await db.command({"collMod": AUDIT_COLLECTION, "expireAfterSeconds": retention})
+            return
+        try:
+            await db[AUDIT_COLLECTION].create_index([("ts", 1)], name="ts_ttl", expireAfterSeconds=retention)
+        except OperationFailure:
+            # retensi berubah -> ubah TTL index yang ada
+            await db.command({"collMod": AUDIT_COLLECTION,
+                              "index": {"name": "ts_ttl", "expireAfterSeconds": retention}})
+    except Exception as e:
+        print(f"[WARN] audit collection setup failed: {e}")
@@ -0,0 +1,315 @@
+import json
+import time
+import asyncio
+import hashlib
+
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlparse
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.singleflight import singleflight
+
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Result cache lookups by outcome (hit|coalesced|miss|error|bypass)", ("namespace", "result"))
+CACHE_BYTES = registry.gauge(
+    "cache_memory_bytes", "Bytes held by the in-process cache backend")
+CACHE_EVICTIONS = registry.counter(
+    "cache_evictions_total", "Entries evicted from the in-process cache backend to respect CACHE_MAX_BYTES")
+
+
+def _json_default(obj):
+    # sama dengan jsonable_encoder FastAPI supaya response hit & miss identik
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+class MemoryCache:
+    """
+    LRU in-process dengan batas byte (key + value). Generasi disimpan terpisah (tidak ikut di-evict).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+
+    def _drop(self, key: str) -> None:
+        _, value = self._data.pop(key)
+        self.used -= len(key) + len(value)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return item[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes // 4:
+            return  # 1 entry raksasa tidak boleh mengusir seluruh cache
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self.used += size
+        while self.used > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            CACHE_EVICTIONS.inc()
+        CACHE_BYTES.set(value=self.used)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        if key in self._data:
+            self._drop(key)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache:
+    """
+    Backend Redis (atau server lain yang bicara protokol RESP: KeyDB, Dragonfly, ...).
+    Client RESP minimal di atas asyncio streams + pool koneksi; tanpa dependency tambahan.
+    """
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 0.5):
+        u = urlparse(url)
+        self.host = u.hostname or "localhost"
+        self.port = u.port or 6379
+        self.password = u.password
+        self.db = int(u.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._pool: asyncio.Queue = asyncio.Queue(maxsize=pool_size)
+
+    async def _connect(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        conn = (reader, writer)
+        if self.password:
+            await self._call(conn, "AUTH", self.password)
+        if self.db:
+            await self._call(conn, "SELECT", str(self.db))
+        return conn
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        return b"".join(out)
+
+    async def _read(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise RedisError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else (await reader.readexactly(n + 2))[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [await self._read(reader) for _ in range(n)]
+        raise RedisError(f"bad reply {line!r}")
+
+    async def _call(self, conn, *args):
+        reader, writer = conn
+        writer.write(self._encode(args))
+        await writer.drain()
+        return await self._read(reader)
+
+    async def execute(self, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except asyncio.QueueEmpty:
+            conn = await self._connect()
+        try:
+            reply = await asyncio.wait_for(self._call(conn, *args), self.timeout)
+        except BaseException:
+            # koneksi bisa tertinggal di tengah reply -> jangan dipakai lagi
+            conn[1].close()
+            raise
+        try:
+            self._pool.put_nowait(conn)
+        except asyncio.QueueFull:
+            conn[1].close()
+        return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)), "NX") == "OK"
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", key)
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self.execute("GET", key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+
+class ResultCache:
+    """
+    Cache hasil endpoint (JSON) di atas backend:
+    - key = namespace + generasi namespace + hash parameter ter-normalisasi
+    - write -> bump generasi (O(1)); entry lama tidak terpakai lagi dan habis sendiri oleh TTL/LRU
+    - stampede: 1 proses per key yang menghitung ulang (lock SET NX), sisanya menunggu sebentar
+    - backend error -> dianggap miss (fail-open), request tetap dilayani dari Mongo
+    """
+
+    def __init__(self, backend, ttl: float, prefix: str = "pms", retry_after: float = 5.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self._down_until = 0.0  # backend error -> bypass cache sebentar (tanpa timeout per request)
+
+    def _key(self, namespace: str, generation: int, params: Hashable) -> str:
+        digest = hashlib.sha1(json.dumps(params, default=_json_default, separators=(",", ":")).encode()).hexdigest()
+        return f"{self.prefix}:{namespace}:{generation}:{digest}"
+
+    async def get_or_compute(self, namespace: str, params: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self._down_until > time.monotonic():
+            CACHE_REQUESTS.inc(namespace, "bypass")
+            return await fn()
+        try:
+            generation = await self.backend.get_counter(f"{self.prefix}:gen:{namespace}")
+            key = self._key(namespace, generation, params)
+            raw = await self.backend.get(key)
+        except (OSError, asyncio.TimeoutError, RedisError) as e:
+            CACHE_REQUESTS.inc(namespace, "error")
+            self._down_until = time.monotonic() + self.retry_after
+            print(f"[WARN] cache unavailable, bypassing for {self.retry_after}s: {e}")
+            return await fn()
+
+        if raw is not None:
+            CACHE_REQUESTS.inc(namespace, "hit")
+            return json.loads(raw)
+
+        lock_key = f"{key}:lock"
+        try:
+            locked = await self.backend.add(lock_key, b"1", settings.CACHE_LOCK_TTL_MS / 1000)
+            if not locked:
+                # proses lain sedang menghitung key yang sama -> tunggu hasilnya sebentar
+                deadline = time.monotonic() + settings.CACHE_LOCK_WAIT_MS / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.02)
+                    raw = await self.backend.get(key)
+                    if raw is not None:
+                        CACHE_REQUESTS.inc(namespace, "coalesced")
+                        return json.loads(raw)
+        except (OSError, asyncio.TimeoutError, RedisError):
+            locked = False
+
+        CACHE_REQUESTS.inc(namespace, "miss")
+
+        try:
+            value = await fn()
+            await self._store(key, value)
+        finally:
+            if locked:
+                try:
+                    await self.backend.delete(lock_key)
+                except (OSError, asyncio.TimeoutError, RedisError):
+                    pass  # lock tetap habis sendiri (CACHE_LOCK_TTL_MS)
+        return value
+
+    async def _store(self, key: str, value: Any) -> None:
+        try:
+            await self.backend.set(key, json.dumps(value, default=_json_default, separators=(",", ":")).encode(), self.ttl)
+        except (OSError, asyncio.TimeoutError, RedisError) as e:
+            print(f"[WARN] cache write failed: {e}")
+
+    async def generation(self, namespace: str) -> Optional[int]:
+        """
+        Generasi namespace di backend (bersama antar worker kalau Redis). None = backend error / di-bypass.
+        """
+        if self._down_until > time.monotonic():
+            return None
+        try:
+            return await self.backend.get_counter(f"{self.prefix}:gen:{namespace}")
+        except (OSError, asyncio.TimeoutError, RedisError):
+            return None
+
+    async def bump(self, namespace: str) -> None:
+        try:
+            await self.backend.incr(f"{self.prefix}:gen:{namespace}")
+        except (OSError, asyncio.TimeoutError, RedisError) as e:
+            # gagal bump = entry lama bisa terbaca sampai TTL habis
+            print(f"[WARN] cache invalidation failed for {namespace}: {e}")
+
+
+def _make_backend():
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(settings.CACHE_MAX_BYTES)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL)
+    return None
+
+
+_backend = _make_backend()
+result_cache: Optional[ResultCache] = ResultCache(_backend, settings.CACHE_TTL_SECONDS) if _backend else None
+
+
+async def cached(namespace: str, params: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Single-flight per worker di depan cache bersama: request identik bersamaan -> 1 lookup cache / 1 query.
+    """
+    if result_cache is None:
+        return await singleflight.do(namespace, params, fn)
+    return await singleflight.do(namespace, params, lambda: result_cache.get_or_compute(namespace, params, fn))
+
+
+async def shared_generation(namespace: str) -> Optional[int]:
+    # generasi namespace dari result cache (naik di write worker mana pun); None kalau cache mati
+    if result_cache is None:
+        return None
+    return await result_cache.generation(namespace)
+
+
+async def invalidate_products(product_id=None) -> None:
+    # perubahan produk -> detail produk tsb + semua list produk
+    singleflight.invalidate("product", str(product_id) if product_id is not None else None)
+    singleflight.invalidate("products")
+    if result_cache:
+        await result_cache.bump("product")
+        await result_cache.bump("products")
+
+
+async def invalidate_categories() -> None:
+    # nama kategori ikut tampil di produk (category_name)
+    singleflight.invalidate("categories")
+    if result_cache:
+        await result_cache.bump("categories")
+    await invalidate_products()
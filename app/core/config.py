@@ -13,11 +13,129 @@ class Settings(BaseModel):
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "super-secret-key-change-me")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    # Mode stateless: role/status ada di access token berumur pendek -> otorisasi tanpa query DB.
+    # Perubahan role/status berlaku paling lambat setelah STATELESS_ACCESS_TOKEN_MINUTES (saat refresh).
+    # Logout hanya mencabut refresh token; access token yang sudah terbit berlaku sampai exp.
+    AUTH_STATELESS: bool = os.getenv("AUTH_STATELESS", "false").lower() == "true"
+    STATELESS_ACCESS_TOKEN_MINUTES: int = int(os.getenv("STATELESS_ACCESS_TOKEN_MINUTES", "5"))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
     UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
 
     USER_UPLOAD_SUBDIR: str = "users"
     PRODUCT_UPLOAD_SUBDIR: str = "products"
+    # Pengiriman file /uploads: static (dibaca Python), x-accel (nginx X-Accel-Redirect), x-sendfile (Apache/lighttpd)
+    UPLOAD_DELIVERY: str = os.getenv("UPLOAD_DELIVERY", "static").lower()
+    UPLOAD_ACCEL_PREFIX: str = os.getenv("UPLOAD_ACCEL_PREFIX", "/_protected_uploads/")  # location `internal` nginx
+    # Akses /uploads: public | token (Bearer JWT atau URL bertanda tangan) | signed (hanya URL bertanda tangan)
+    UPLOAD_ACCESS: str = os.getenv("UPLOAD_ACCESS", "public").lower()
+    UPLOAD_URL_SECRET: str = os.getenv("UPLOAD_URL_SECRET", "upload-url-secret-change-me")  # sama dengan config proxy
+    UPLOAD_URL_TTL_SECONDS: int = int(os.getenv("UPLOAD_URL_TTL_SECONDS", "3600"))
+    # Storage file upload: local (UPLOAD_DIR) | gridfs (bucket di MONGODB_DB) | s3 (S3 / MinIO / Ceph RGW, path-style)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local").lower()
+    GRIDFS_BUCKET: str = os.getenv("GRIDFS_BUCKET", "uploads")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "http://localhost:9000")
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "pms-uploads")
+    S3_ACCESS_KEY: str = os.getenv("S3_ACCESS_KEY", "")
+    S3_SECRET_KEY: str = os.getenv("S3_SECRET_KEY", "")
+    S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+
+    # Observability (/metrics). Isi METRICS_MULTIPROC_DIR kalau jalan dengan --worker > 1
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_MULTIPROC_DIR: str | None = os.getenv("METRICS_MULTIPROC_DIR") or None
+    METRICS_DUMP_INTERVAL_SECONDS: float = float(os.getenv("METRICS_DUMP_INTERVAL_SECONDS", "5"))
+
+    # Akuntansi query Mongo per request (Server-Timing, slow log, deteksi N+1)
+    DB_ACCOUNTING_ENABLED: bool = os.getenv("DB_ACCOUNTING_ENABLED", "true").lower() == "true"
+    DB_SERVER_TIMING: bool = os.getenv("DB_SERVER_TIMING", "false").lower() == "true"
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+    # Kompresi response (zstd/br butuh paket zstandard/brotli) & MessagePack (paket msgpack)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_ENCODINGS: str = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")  # urutan preferensi
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    ZSTD_LEVEL: int = int(os.getenv("ZSTD_LEVEL", "3"))
+    MSGPACK_ENABLED: bool = os.getenv("MSGPACK_ENABLED", "true").lower() == "true"
+
+    # Admission control untuk endpoint mahal (auth=PBKDF2, upload=multipart, heavy_list=search/deep page)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    # <class>=<max concurrent>/<max antrean>/<timeout antrean detik>
+    ADMISSION_LIMITS: str = os.getenv("ADMISSION_LIMITS", "auth=8/32/2,upload=4/16/5,heavy_list=8/32/2")
+    # <class>=<token per detik>/<burst>, per user (atau per IP kalau belum login)
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "auth=1/10,upload=2/10")
+    ADMISSION_DEEP_PAGE_OFFSET: int = int(os.getenv("ADMISSION_DEEP_PAGE_OFFSET", "1000"))
+    # IP/CIDR reverse proxy di depan app (mis. nginx untuk UPLOAD_DELIVERY), dipisah koma. Request dari sini:
+    # IP client diambil dari X-Forwarded-For (hop paling kanan yang bukan proxy tepercaya) untuk rate limit
+    # per IP. Kosong = IP koneksi langsung (benar juga kalau uvicorn jalan dengan --proxy-headers).
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+
+    # Single-flight read coalescing per worker (+ micro-TTL, 0 = hanya coalescing)
+    SINGLEFLIGHT_ENABLED: bool = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+    SINGLEFLIGHT_TTL_MS: float = float(os.getenv("SINGLEFLIGHT_TTL_MS", "200"))
+    SINGLEFLIGHT_MAX_KEYS: int = int(os.getenv("SINGLEFLIGHT_MAX_KEYS", "10000"))
+
+    # Job queue persisten (collection `jobs`) untuk kerja yang ditunda (hapus file, dsb.)
+    JOBS_ENABLED: bool = os.getenv("JOBS_ENABLED", "true").lower() == "true"  # worker di proses API
+    JOBS_CONCURRENCY: int = int(os.getenv("JOBS_CONCURRENCY", "2"))
+    JOBS_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOBS_POLL_INTERVAL_SECONDS", "2"))
+    JOBS_VISIBILITY_TIMEOUT_SECONDS: float = float(os.getenv("JOBS_VISIBILITY_TIMEOUT_SECONDS", "60"))
+    JOBS_MAX_ATTEMPTS: int = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+    JOBS_RETRY_BASE_SECONDS: float = float(os.getenv("JOBS_RETRY_BASE_SECONDS", "2"))
+    JOBS_RETRY_MAX_SECONDS: float = float(os.getenv("JOBS_RETRY_MAX_SECONDS", "300"))
+    JOBS_DONE_TTL_SECONDS: int = int(os.getenv("JOBS_DONE_TTL_SECONDS", "86400"))
+
+    # Audit log perubahan katalog & user: antrean in-memory per worker, ditulis per batch (insert_many)
+    AUDIT_ENABLED: bool = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL_MS: float = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "1000"))
+    AUDIT_ENQUEUE_TIMEOUT_MS: float = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT_MS", "0"))  # antrean penuh: 0 = langsung drop
+    AUDIT_RETENTION_DAYS: float = float(os.getenv("AUDIT_RETENTION_DAYS", "180"))
+
+    # GC file upload yatim (tidak direferensikan products.images / users.profile_image)
+    # opt-in: GC terjadwal menghapus file; jalankan `--dry-run` dulu sebelum mengaktifkan
+    UPLOAD_GC_ENABLED: bool = os.getenv("UPLOAD_GC_ENABLED", "false").lower() == "true"
+    UPLOAD_GC_INTERVAL_SECONDS: float = float(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", "21600"))
+    UPLOAD_GC_GRACE_SECONDS: float = float(os.getenv("UPLOAD_GC_GRACE_SECONDS", "3600"))  # umur minimum file
+    UPLOAD_GC_BATCH_SIZE: int = int(os.getenv("UPLOAD_GC_BATCH_SIZE", "500"))
+    UPLOAD_GC_DELETE_RATE: float = float(os.getenv("UPLOAD_GC_DELETE_RATE", "100"))  # file/detik
+
+    # Arsip produk: inactive lebih lama dari ARCHIVE_AFTER_DAYS dipindah ke products_archive (cold tier)
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+    ARCHIVE_AFTER_DAYS: float = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+    # Batch multi-get (/products/batch?ids=..., dst.): maksimal id per request
+    BATCH_GET_MAX_IDS: int = int(os.getenv("BATCH_GET_MAX_IDS", "100"))
+
+    # Stream perubahan produk (SSE /products/events). Fan-out antar worker: mongo (tail capped collection)
+    # atau local (hanya worker yang menerima write; cukup untuk 1 worker)
+    PRODUCT_EVENTS_ENABLED: bool = os.getenv("PRODUCT_EVENTS_ENABLED", "true").lower() == "true"
+    PRODUCT_EVENTS_FANOUT: str = os.getenv("PRODUCT_EVENTS_FANOUT", "mongo").lower()
+    PRODUCT_EVENTS_CAPPED_BYTES: int = int(os.getenv("PRODUCT_EVENTS_CAPPED_BYTES", str(16 * 1024 * 1024)))
+    # tail dibuka ulang -> baca lagi event sejak (ts terbaru - lookback), duplikat dibuang; harus > selisih jam antar host
+    PRODUCT_EVENTS_RESUME_LOOKBACK_SECONDS: float = float(os.getenv("PRODUCT_EVENTS_RESUME_LOOKBACK_SECONDS", "30"))
+    SSE_CLIENT_BUFFER: int = int(os.getenv("SSE_CLIENT_BUFFER", "256"))  # event antre per client, penuh = di-drop
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_REPLAY_SIZE: int = int(os.getenv("SSE_REPLAY_SIZE", "1000"))  # event terakhir untuk resume (Last-Event-ID)
+    SSE_MAX_CLIENTS: int = int(os.getenv("SSE_MAX_CLIENTS", "10000"))  # per worker
+
+    # Faceted search produk: batas bucket harga (naik) + cache nama kategori per worker
+    PRODUCT_PRICE_BUCKETS: str = os.getenv("PRODUCT_PRICE_BUCKETS", "0,100000,500000,1000000,5000000")
+    # batas basi nama kategori antar worker kalau tidak ada result cache bersama (CACHE_BACKEND=redis)
+    CATEGORY_CACHE_TTL_SECONDS: float = float(os.getenv("CATEGORY_CACHE_TTL_SECONDS", "5"))
+
+    # Cache hasil list/detail bersama: none | memory (per worker) | redis (antar worker & node)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "none").lower()
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # backend memory
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_LOCK_TTL_MS: float = float(os.getenv("CACHE_LOCK_TTL_MS", "2000"))  # anti-stampede
+    CACHE_LOCK_WAIT_MS: float = float(os.getenv("CACHE_LOCK_WAIT_MS", "500"))
 
     class Config:
         case_sensitive = True
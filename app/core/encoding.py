@@ -0,0 +1,191 @@
+import gzip
+import importlib.util
+
+from contextvars import ContextVar
+from typing import Optional
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+
+# Dependency opsional: tanpa paket ini encoding terkait otomatis tidak ditawarkan.
+# Cukup cek ketersediaan di sini; import sebenarnya baru saat pertama dipakai (startup lebih cepat).
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Content-type yang sudah terkompresi / streaming -> jangan dikompres lagi
+_SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip",
+                       "application/x-gzip", "application/zstd", "text/event-stream")
+
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+
+
+def _compress_br(body: bytes) -> bytes:
+    import brotli
+    return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+
+
+def _compress_zstd(body: bytes) -> bytes:
+    import zstandard
+    return zstandard.ZstdCompressor(level=settings.ZSTD_LEVEL).compress(body)
+
+
+COMPRESSORS = {"gzip": _compress_gzip}
+if HAS_BROTLI:
+    COMPRESSORS["br"] = _compress_br
+if HAS_ZSTD:
+    COMPRESSORS["zstd"] = _compress_zstd
+
+
+def _parse_qlist(header: str) -> dict:
+    """
+    'gzip;q=0.8, br' -> {"gzip": 0.8, "br": 1.0}
+    """
+    out = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        out[token] = q
+    return out
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pilih encoding terbaik: q tertinggi dari client, seri -> urutan preferensi server (COMPRESSION_ENCODINGS).
+    """
+    if not accept_encoding:
+        return None
+    accepted = _parse_qlist(accept_encoding)
+    best, best_q = None, 0.0
+    for enc in settings.COMPRESSION_ENCODINGS.split(","):
+        enc = enc.strip()
+        if enc not in COMPRESSORS:
+            continue
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def wants_msgpack(accept: str) -> bool:
+    if not HAS_MSGPACK or not settings.MSGPACK_ENABLED or not accept:
+        return False
+    accepted = _parse_qlist(accept)
+    mp = max(accepted.get(t, 0.0) for t in MSGPACK_MEDIA_TYPES)
+    return mp > 0 and mp >= accepted.get("application/json", 0.0)
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    Default response class: konten yang sama (hasil jsonable_encoder FastAPI) di-encode
+    ke MessagePack kalau client minta `Accept: application/msgpack`, selain itu JSON biasa.
+    """
+
+    def render(self, content) -> bytes:
+        if _wants_msgpack.get():
+            import msgpack
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        if HAS_MSGPACK and settings.MSGPACK_ENABLED:
+            self.raw_headers.append((b"vary", b"Accept"))
+
+
+class ResponseEncodingMiddleware:
+    """
+    - set flag msgpack dari header Accept (dibaca NegotiatedResponse)
+    - kompres body (zstd/br/gzip) sesuai Accept-Encoding, minimal COMPRESSION_MIN_SIZE byte
+    - lewati /uploads, content-type yang sudah terkompresi, dan response streaming
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accept_encoding = accept = ""
+        for k, v in scope["headers"]:
+            if k == b"accept-encoding":
+                accept_encoding = v.decode("latin-1")
+            elif k == b"accept":
+                accept = v.decode("latin-1")
+
+        token = _wants_msgpack.set(wants_msgpack(accept))
+        encoding = None
+        if settings.COMPRESSION_ENABLED and not scope["path"].startswith("/uploads"):
+            encoding = choose_encoding(accept_encoding)
+
+        if encoding is None:
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _wants_msgpack.reset(token)
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = {k.lower(): v for k, v in start_message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            skip = (
+                more_body
+                or b"content-encoding" in headers
+                or len(body) < settings.COMPRESSION_MIN_SIZE
+                or content_type.startswith(_SKIP_CONTENT_TYPES)
+            )
+            if skip:
+                # streaming / kecil / sudah terkompresi -> kirim apa adanya
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = COMPRESSORS[encoding](body)
+            new_headers = [
+                (k, v) for k, v in start_message.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary")
+            ]
+            vary = headers.get(b"vary", b"")
+            new_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", (vary + b", Accept-Encoding") if vary else b"Accept-Encoding"),
+            ]
+            start_message["headers"] = new_headers
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _wants_msgpack.reset(token)
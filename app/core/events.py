@@ -0,0 +1,264 @@
+"""
+Stream perubahan produk (stok, harga, status, transisi low-stock) untuk dashboard via SSE,
+pengganti polling GET /products.
+
+Alur: write handler -> publish_product_event() -> capped collection `product_events`
+(PRODUCT_EVENTS_FANOUT=mongo) -> tiap worker men-tail collection itu -> broker in-process ->
+antrean per client (SSE_CLIENT_BUFFER). Mode `local` melewati Mongo (hanya untuk 1 worker).
+
+- Frame SSE di-encode sekali per event, bukan per client -> fan-out ke ribuan koneksi murah.
+- Client lambat (antrean penuh) diputus; EventSource reconnect otomatis dengan Last-Event-ID.
+- Resume dari ring buffer SSE_REPLAY_SIZE event terakhir (urutan insert capped collection, sama di semua
+  worker); id terlalu lama -> event `reset` (client ambil ulang data penuh).
+- Tail yang dibuka ulang melanjutkan dari `ts` (bukan _id: ObjectId dari proses/host berbeda tidak urut
+  insert) dengan jendela PRODUCT_EVENTS_RESUME_LOOKBACK_SECONDS + buang _id yang sudah di-dispatch.
+- Koneksi idle hanya menunggu antrean + heartbeat komentar tiap SSE_HEARTBEAT_SECONDS.
+"""
+import json
+import asyncio
+
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.audit import diff_fields
+
+EVENTS_COLLECTION = "product_events"
+# field yang memicu event update (perubahan lain, mis. gambar/deskripsi, tidak di-stream)
+TRACKED_FIELDS = ("name", "price", "stock", "low_stock_threshold", "status")
+
+PRODUCT_EVENTS = registry.counter(
+    "product_events_total", "Product change events dispatched to SSE subscribers", ("type",))
+SSE_CLIENTS = registry.gauge(
+    "sse_clients", "Open SSE connections in this worker")
+SSE_DROPPED = registry.counter(
+    "sse_clients_dropped_total", "SSE clients disconnected because their buffer was full")
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)  # ObjectId
+
+
+def _is_low_stock(doc: Optional[dict]) -> Optional[bool]:
+    # sama dengan is_low_stock di response produk
+    if not doc:
+        return None
+    return bool(doc.get("stock", 0) <= doc.get("low_stock_threshold", 0))
+
+
+class _Frame:
+    __slots__ = ("id", "product_id", "data")
+
+    def __init__(self, event: dict):
+        self.id = str(event["_id"])
+        self.product_id = str(event["product_id"])
+        payload = {k: v for k, v in event.items() if k != "_id"}
+        payload["id"] = self.id
+        body = json.dumps(payload, default=_json_default, separators=(",", ":"))
+        self.data = f"id: {self.id}\nevent: {event['type']}\ndata: {body}\n\n".encode()
+
+
+class Subscriber:
+    __slots__ = ("queue", "product_ids", "dropped")
+
+    def __init__(self, product_ids: Optional[Set[str]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_CLIENT_BUFFER)
+        self.product_ids = product_ids
+        self.dropped = False
+
+    def wants(self, frame: _Frame) -> bool:
+        return self.product_ids is None or frame.product_id in self.product_ids
+
+    def offer(self, frame: _Frame) -> None:
+        if self.dropped or not self.wants(frame):
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            SSE_DROPPED.inc()
+            self.close()
+
+    def close(self) -> None:
+        # kosongkan antrean lalu sentinel None -> generator stream selesai
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ProductEventBroker:
+    """
+    Pub/sub in-process per worker + ring buffer event terakhir untuk resume.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._recent: deque = deque(maxlen=settings.SSE_REPLAY_SIZE)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def dispatch(self, event: dict) -> None:
+        frame = _Frame(event)
+        self._recent.append(frame)
+        PRODUCT_EVENTS.inc(event["type"])
+        for sub in list(self._subscribers):
+            sub.offer(frame)
+
+    def _backlog(self, last_event_id: Optional[str], sub: Subscriber) -> List[bytes]:
+        if not last_event_id:
+            return []
+        frames = list(self._recent)
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i].id == last_event_id:
+                return [f.data for f in frames[i + 1:] if sub.wants(f)]
+        # sudah keluar dari ring buffer -> client harus ambil ulang state penuh
+        return [b"event: reset\ndata: {}\n\n"]
+
+    async def stream(self, last_event_id: Optional[str] = None,
+                     product_ids: Optional[Set[str]] = None) -> AsyncIterator[bytes]:
+        """
+        Generator body SSE. Subscribe & backlog diambil tanpa await di antaranya -> tidak ada event
+        yang hilang / dobel antara replay dan live.
+        """
+        sub = Subscriber(product_ids)
+        self._subscribers.add(sub)
+        SSE_CLIENTS.set(value=len(self._subscribers))
+        backlog = self._backlog(last_event_id, sub)
+        try:
+            yield b"retry: 3000\n\n"
+            for data in backlog:
+                yield data
+            while True:
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if frame is None:
+                    return  # client lambat di-drop / shutdown
+                yield frame.data
+        finally:
+            self._subscribers.discard(sub)
+            SSE_CLIENTS.set(value=len(self._subscribers))
+
+    def start(self, db) -> None:
+        if settings.PRODUCT_EVENTS_FANOUT == "mongo":
+            self._task = asyncio.create_task(self._tail(db))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for sub in list(self._subscribers):
+            sub.close()
+
+    async def _tail(self, db) -> None:
+        """
+        Tail capped collection (tailable await cursor): event dari semua worker masuk ke broker
+        ini dengan urutan insert yang sama. Cursor mati -> buka lagi dari ts terbaru - lookback;
+        `seen` (_id -> ts dalam jendela lookback) mencegah event di-dispatch dua kali.
+        """
+        coll = db[EVENTS_COLLECTION]
+        lookback = timedelta(seconds=settings.PRODUCT_EVENTS_RESUME_LOOKBACK_SECONDS)
+        seen: Dict[ObjectId, datetime] = {}
+        newest: Optional[datetime] = None
+
+        def prune():
+            horizon = newest - lookback
+            for _id in [k for k, ts in seen.items() if ts < horizon]:
+                del seen[_id]
+
+        try:
+            recent = await coll.find({}).sort("$natural", -1).limit(settings.SSE_REPLAY_SIZE).to_list(length=None)
+            for doc in reversed(recent):
+                self._recent.append(_Frame(doc))
+                seen[doc["_id"]] = doc["ts"]
+                newest = doc["ts"] if newest is None else max(newest, doc["ts"])
+        except Exception as e:
+            print(f"[WARN] product events: replay buffer load failed: {e}")
+
+        while True:
+            try:
+                cond = {}
+                if newest is not None:
+                    prune()
+                    cond = {"ts": {"$gte": newest - lookback}}
+                cursor = coll.find(cond, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for doc in cursor:
+                    if doc["_id"] in seen:
+                        continue
+                    seen[doc["_id"]] = doc["ts"]
+                    newest = doc["ts"] if newest is None else max(newest, doc["ts"])
+                    if len(seen) % 1000 == 0:
+                        prune()
+                    self.dispatch(doc)
+                # collection kosong / cursor mati -> buka lagi
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[WARN] product events tail failed: {e}")
+                await asyncio.sleep(5)
+
+
+broker = ProductEventBroker()
+
+
+async def ensure_events_collection(db) -> None:
+    """
+    Capped collection `product_events` (PRODUCT_EVENTS_CAPPED_BYTES), dibutuhkan tailable cursor.
+    """
+    if settings.PRODUCT_EVENTS_FANOUT != "mongo":
+        return
+    try:
+        await db.create_collection(EVENTS_COLLECTION, capped=True, size=settings.PRODUCT_EVENTS_CAPPED_BYTES)
+    except CollectionInvalid:
+        pass  # sudah ada
+    except Exception as e:
+        print(f"[WARN] product events collection setup failed: {e}")
+
+
+async def publish_product_event(db, event_type: str, product_id: ObjectId,
+                                before: Optional[dict] = None, after: Optional[dict] = None) -> None:
+    """
+    Event perubahan produk. Update yang tidak menyentuh TRACKED_FIELDS tidak di-publish.
+    Gagal publish tidak menggagalkan write (hanya [WARN]).
+    """
+    if not settings.PRODUCT_EVENTS_ENABLED:
+        return
+    changes = diff_fields(before, after or {}, TRACKED_FIELDS)
+    if event_type == "product.update" and not changes:
+        return
+    low_before, low_after = _is_low_stock(before), _is_low_stock(after)
+    transition = None
+    if low_after and not low_before:
+        transition = "entered"
+    elif low_before and low_after is False:
+        transition = "cleared"
+    event = {
+        "_id": ObjectId(),
+        "type": event_type,
+        "product_id": product_id,
+        "ts": datetime.now(timezone.utc),
+        "changes": changes,
+        "stock": (after or {}).get("stock"),
+        "low_stock": low_after,
+        "low_stock_transition": transition,
+    }
+    if settings.PRODUCT_EVENTS_FANOUT != "mongo":
+        broker.dispatch(event)
+        return
+    try:
+        await db[EVENTS_COLLECTION].insert_one(event)
+    except Exception as e:
+        print(f"[WARN] product event publish failed: {e}")
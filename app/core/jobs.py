@@ -0,0 +1,276 @@
+import os
+import uuid
+import random
+import socket
+import asyncio
+import logging
+import time
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger("app.jobs")
+
+JOBS_COLLECTION = "jobs"
+
+JOBS_ENQUEUED = registry.counter(
+    "jobs_enqueued_total", "Jobs added to the queue", ("type",))
+JOBS_PROCESSED = registry.counter(
+    "jobs_processed_total", "Job attempts by outcome", ("type", "result"))
+JOBS_IN_FLIGHT = registry.gauge(
+    "jobs_in_flight", "Jobs currently running in this worker", ("type",))
+JOB_DURATION = registry.histogram(
+    "job_duration_seconds", "Handler run time per attempt", ("type",))
+JOB_QUEUE_LATENCY = registry.histogram(
+    "job_queue_latency_seconds", "Time between a job becoming due and being claimed", ("type",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+_handlers: Dict[str, JobHandler] = {}
+
+# dibangunkan oleh enqueue() di proses yang sama supaya tidak menunggu poll berikutnya
+_wakeup: Optional[asyncio.Event] = None
+
+
+def job_handler(job_type: str):
+    """
+    Daftarkan handler untuk 1 tipe job. Handler harus idempotent: job bisa dijalankan
+    ulang (retry / visibility timeout habis saat worker mati).
+    """
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+async def enqueue(db, job_type: str, payload: dict, delay: float = 0,
+                  max_attempts: Optional[int] = None) -> str:
+    now = datetime.now(timezone.utc)
+    res = await db[JOBS_COLLECTION].insert_one({
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+        "updated_at": now,
+    })
+    JOBS_ENQUEUED.inc(job_type)
+    if _wakeup is not None and delay <= 0:
+        _wakeup.set()
+    return str(res.inserted_id)
+
+
+def _attempts_left(left: bool) -> dict:
+    # attempts vs max_attempts per dokumen (job lama tanpa max_attempts -> JOBS_MAX_ATTEMPTS)
+    limit = {"$ifNull": ["$max_attempts", settings.JOBS_MAX_ATTEMPTS]}
+    return {"$expr": {"$lt" if left else "$gte": ["$attempts", limit]}}
+
+
+def retry_delay(attempts: int) -> float:
+    # exponential backoff + jitter penuh, dibatasi JOBS_RETRY_MAX_SECONDS
+    cap = min(settings.JOBS_RETRY_MAX_SECONDS, settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(cap / 2, cap)
+
+
+class JobWorker:
+    """
+    Pool worker async di atas collection `jobs`:
+    - claim atomik via find_one_and_update (aman untuk banyak proses uvicorn)
+    - job `running` yang lease-nya habis (worker mati) bisa di-claim ulang selama attempts belum habis;
+      yang sudah habis (handler terus membuat worker crash) -> `dead`, tidak di-claim lagi
+    - gagal -> retry dengan backoff; attempts habis -> status `dead` (dead-letter)
+    - lease token di setiap update hasil supaya worker lama tidak menimpa claim baru
+    """
+
+    def __init__(self, db, concurrency: int = None, poll_interval: float = None,
+                 visibility_timeout: float = None):
+        self.db = db
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOBS_POLL_INTERVAL_SECONDS
+        self.visibility_timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self._reaped_at = 0.0
+
+    @property
+    def coll(self):
+        return self.db[JOBS_COLLECTION]
+
+    def start(self) -> None:
+        global _wakeup
+        _wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+
+    async def stop(self, grace: float = 10) -> None:
+        """
+        Berhenti claim job baru, tunggu job yang sedang jalan (maks `grace` detik).
+        Job yang terpotong akan di-claim ulang setelah visibility timeout.
+        """
+        global _wakeup
+        self._stopping = True
+        if _wakeup is not None:
+            _wakeup.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=grace)
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        _wakeup = None
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.coll.find_one_and_update(
+            {
+                "type": {"$in": list(_handlers)},
+                "$or": [
+                    {"status": "queued", "run_at": {"$lte": now}},
+                    {"status": "running", "locked_until": {"$lte": now}, **_attempts_left(True)},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease": uuid.uuid4().hex,
+                    "worker": self.worker_id,
+                    "locked_until": now + timedelta(seconds=self.visibility_timeout),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def reap_expired(self) -> int:
+        """
+        Lease habis & attempts sudah habis -> dead-letter (worker crash di setiap attempt, jadi _fail
+        tidak pernah sempat jalan). Return jumlah job yang dipindah ke `dead`.
+        """
+        reaped = 0
+        while True:
+            now = datetime.now(timezone.utc)
+            job = await self.coll.find_one_and_update(
+                {"status": "running", "locked_until": {"$lte": now}, **_attempts_left(False)},
+                {"$set": {"status": "dead", "updated_at": now,
+                          "last_error": "lease expired on final attempt (worker crashed or timed out)"},
+                 "$unset": {"lease": "", "locked_until": ""}},
+            )
+            if job is None:
+                return reaped
+            reaped += 1
+            JOBS_PROCESSED.inc(job["type"], "dead")
+            logger.error("job %s (%s) dead: lease expired after %s attempts", job["_id"], job["type"],
+                         job["attempts"])
+
+    async def run_once(self) -> bool:
+        """
+        Claim & jalankan 1 job. Return False kalau antrean kosong.
+        """
+        job = await self.claim()
+        if not job:
+            # antrean kosong: sesekali bersihkan lease habis yang tidak boleh di-claim lagi
+            if time.monotonic() - self._reaped_at >= self.visibility_timeout:
+                self._reaped_at = time.monotonic()
+                await self.reap_expired()
+            return False
+
+        job_type = job["type"]
+        run_at = job["run_at"]
+        if run_at.tzinfo is None:  # client Motor default tidak tz-aware
+            run_at = run_at.replace(tzinfo=timezone.utc)
+        JOB_QUEUE_LATENCY.observe(max(0.0, (datetime.now(timezone.utc) - run_at).total_seconds()), job_type)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        JOBS_IN_FLIGHT.inc(job_type)
+        start = time.perf_counter()
+        try:
+            await _handlers[job_type](job.get("payload") or {})
+        except Exception as e:
+            await self._fail(job, e)
+        else:
+            await self._finish(job, {
+                "status": "done",
+                "expire_at": datetime.now(timezone.utc) + timedelta(seconds=settings.JOBS_DONE_TTL_SECONDS),
+            })
+            JOBS_PROCESSED.inc(job_type, "done")
+        finally:
+            heartbeat.cancel()
+            JOBS_IN_FLIGHT.dec(job_type)
+            JOB_DURATION.observe(time.perf_counter() - start, job_type)
+        return True
+
+    async def _finish(self, job: dict, fields: dict) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc)
+        res = await self.coll.update_one(
+            {"_id": job["_id"], "lease": job["lease"]},
+            {"$set": fields, "$unset": {"lease": "", "locked_until": ""}},
+        )
+        if res.modified_count == 0:
+            # lease sudah diambil worker lain (job terlalu lama) -> hasil kita diabaikan
+            logger.warning("job %s lost its lease before completion", job["_id"])
+
+    async def _fail(self, job: dict, error: Exception) -> None:
+        job_type = job["type"]
+        last_error = f"{type(error).__name__}: {error}"[:1000]
+        if job["attempts"] >= job.get("max_attempts", settings.JOBS_MAX_ATTEMPTS):
+            await self._finish(job, {"status": "dead", "last_error": last_error})
+            JOBS_PROCESSED.inc(job_type, "dead")
+            logger.error("job %s (%s) dead after %s attempts: %s", job["_id"], job_type, job["attempts"], last_error)
+            return
+        delay = retry_delay(job["attempts"])
+        await self._finish(job, {
+            "status": "queued",
+            "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+            "last_error": last_error,
+        })
+        JOBS_PROCESSED.inc(job_type, "retry")
+        logger.warning("job %s (%s) failed, retry in %.1fs: %s", job["_id"], job_type, delay, last_error)
+
+    async def _heartbeat(self, job: dict) -> None:
+        # perpanjang lease selama handler masih jalan
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 2)
+            await self.coll.update_one(
+                {"_id": job["_id"], "lease": job["lease"]},
+                {"$set": {"locked_until": datetime.now(timezone.utc) + timedelta(seconds=self.visibility_timeout)}},
+            )
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Mongo putus, dsb. -> jangan matikan loop
+                print(f"[WARN] job worker error: {e}")
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def requeue_dead(db, job_type: Optional[str] = None) -> int:
+    """
+    Kembalikan job dead-letter ke antrean (attempts direset), mis. setelah bug handler diperbaiki.
+    """
+    cond = {"status": "dead"}
+    if job_type:
+        cond["type"] = job_type
+    now = datetime.now(timezone.utc)
+    res = await db[JOBS_COLLECTION].update_many(
+        cond, {"$set": {"status": "queued", "attempts": 0, "run_at": now, "updated_at": now}}
+    )
+    return res.modified_count
+
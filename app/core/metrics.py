@@ -0,0 +1,264 @@
+import os
+import glob
+import json
+import time
+import asyncio
+import threading
+
+from bisect import bisect_left
+from typing import Dict, Tuple, Sequence, Optional
+from app.core.config import settings
+
+# Bucket default (detik) — cukup rapat di bawah 100ms karena mayoritas endpoint cepat
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        # listener Mongo dipanggil dari thread executor Motor, jadi update perlu lock
+        self._lock = threading.Lock()
+
+    def samples(self) -> dict:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {"|".join(k): v for k, v in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label: [count per bucket (+Inf terakhir)..., sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[idx] += 1
+            row[-1] += value
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {"|".join(k): list(v) for k, v in self._values.items()}
+
+
+class Registry:
+    """
+    Registry metrik in-process (tanpa dependency tambahan) + render format text Prometheus.
+    Mode multi-worker: tiap worker dump snapshot ke METRICS_MULTIPROC_DIR/<pid>.json,
+    lalu /metrics menjumlahkan semua file di folder tsb.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, doc, labelnames))
+
+    def gauge(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, doc, labelnames))
+
+    def histogram(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, doc, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        return {name: m.samples() for name, m in self._metrics.items()}
+
+    # ---------- multi-worker ----------
+    def _snapshot_path(self) -> Optional[str]:
+        if not settings.METRICS_MULTIPROC_DIR:
+            return None
+        return os.path.join(settings.METRICS_MULTIPROC_DIR, f"{os.getpid()}.json")
+
+    def dump(self, zero_gauges: bool = False) -> None:
+        path = self._snapshot_path()
+        if not path:
+            return
+        snap = self.snapshot()
+        if zero_gauges:
+            for name, m in self._metrics.items():
+                if m.kind == "gauge":
+                    snap[name] = {}
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        os.replace(tmp, path)  # atomic supaya reader tidak baca file setengah jadi
+
+    def collect(self) -> dict:
+        """
+        Gabungkan snapshot semua worker (jumlah per label). Tanpa multiproc dir = snapshot lokal.
+        """
+        if not settings.METRICS_MULTIPROC_DIR:
+            return self.snapshot()
+        self.dump()
+        merged: Dict[str, dict] = {}
+        for fp in glob.glob(os.path.join(settings.METRICS_MULTIPROC_DIR, "*.json")):
+            try:
+                with open(fp) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in snap.items():
+                dst = merged.setdefault(name, {})
+                for key, val in samples.items():
+                    if isinstance(val, list):
+                        cur = dst.get(key)
+                        dst[key] = val if cur is None else [a + b for a, b in zip(cur, val)]
+                    else:
+                        dst[key] = dst.get(key, 0.0) + val
+        return merged
+
+    def render(self) -> str:
+        data = self.collect()
+        lines = []
+        for name, m in self._metrics.items():
+            lines.append(f"# HELP {name} {m.doc}")
+            lines.append(f"# TYPE {name} {m.kind}")
+            for key, val in data.get(name, {}).items():
+                labels = list(zip(m.labelnames, key.split("|"))) if m.labelnames else []
+                if m.kind == "histogram":
+                    acc = 0
+                    for le, cnt in zip(list(m.buckets) + ["+Inf"], val[:-1]):
+                        acc += cnt
+                        lines.append(f"{name}_bucket{_fmt_labels(labels + [('le', str(le))])} {acc}")
+                    lines.append(f"{name}_sum{_fmt_labels(labels)} {val[-1]}")
+                    lines.append(f"{name}_count{_fmt_labels(labels)} {acc}")
+                else:
+                    lines.append(f"{name}{_fmt_labels(labels)} {val}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "Total HTTP requests", ("method", "route", "status"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",))
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+MONGO_LATENCY = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command", "outcome"))
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", "<unknown>")
+    if scope.get("root_path", "").endswith("/uploads") or scope.get("path", "").startswith("/uploads/"):
+        return "/uploads"
+    return "<unmatched>"
+
+
+def is_event_stream(message: dict) -> bool:
+    """
+    http.response.start untuk SSE: durasinya = umur koneksi, bukan latency request.
+    """
+    return any(k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+               for k, v in message.get("headers", []))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware murni (bukan BaseHTTPMiddleware) supaya overhead per request kecil.
+    Label route memakai template path (mis. /api/v1/products/{product_id}), bukan path asli.
+    Response SSE (text/event-stream) tetap dihitung tapi tidak masuk histogram latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_holder = [500]
+        streaming = [False]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                streaming[0] = is_event_stream(message)
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            route = _route_label(scope)
+            status = str(status_holder[0])
+            HTTP_REQUESTS.inc(method, route, status)
+            if not streaming[0]:
+                HTTP_LATENCY.observe(elapsed, method, route, status)
+
+
+async def dump_periodically(interval: float) -> None:
+    """
+    Background task (dipanggil dari lifespan) untuk refresh snapshot worker ini.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            registry.dump()
+        except OSError as e:
+            print(f"[WARN] Failed to dump metrics snapshot: {e}")
@@ -0,0 +1,65 @@
+import re
+import unicodedata
+
+from typing import List, Optional
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_key(value: Optional[str]) -> str:
+    """
+    Kunci pencarian: '  Kursi  CAFÉ ' -> 'kursi cafe' (casefold, tanpa aksen, spasi dirapikan).
+    Disimpan di field *_key ber-index supaya prefix search bisa pakai index (tanpa regex /i).
+    """
+    if not value:
+        return ""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SPACE_RE.sub(" ", text).strip().casefold()
+
+
+def prefix_filter(prefix: str) -> dict:
+    # regex ter-anchor & case-sensitive pada field ter-normalisasi -> index range scan
+    return {"$regex": "^" + re.escape(normalize_key(prefix))}
+
+
+_DIGITS_RE = re.compile(r"\D+")
+
+
+def digits(value: Optional[str]) -> str:
+    return _DIGITS_RE.sub("", value or "")
+
+
+# field pencarian user (tidak pernah ikut ke response)
+USER_SEARCH_FIELDS = ("search_keys", "email_key", "phone_key")
+
+
+def name_keys(full_name: Optional[str]) -> List[str]:
+    # nama lengkap + tiap katanya
+    name = normalize_key(full_name)
+    if not name:
+        return []
+    return sorted({name, *name.split(" ")})
+
+
+def user_search_fields(full_name: Optional[str], email: Optional[str], phone_number: Optional[str]) -> dict:
+    """
+    Kunci prefix search user, masing-masing dari 1 field sumber -> update nama/telepon cukup $set
+    kuncinya sendiri di write yang sama (tanpa perlu email/telepon tersimpan):
+    search_keys (multikey, nama), email_key, phone_key (digit saja).
+    """
+    return {"search_keys": name_keys(full_name), "email_key": normalize_key(email), "phone_key": digits(phone_number)}
+
+
+def user_search_filter(term: str) -> dict:
+    """
+    Prefix match ke nama / email / telepon ($or, tiap cabang pakai index-nya sendiri); kalau term mirip
+    nomor telepon ('0812-33') cocokkan juga versi digitnya.
+    """
+    text = normalize_key(term)
+    pattern = re.compile("^" + re.escape(text))
+    phones = [pattern]
+    phone = digits(term)
+    if len(phone) >= 3 and phone != text:
+        phones.append(re.compile("^" + re.escape(phone)))
+    return {"$or": [{"search_keys": pattern}, {"email_key": pattern}, {"phone_key": {"$in": phones}}]}
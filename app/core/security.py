@@ -12,17 +12,41 @@ def hash_password(plain_password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pbkdf2_sha256.verify(plain_password, hashed_password)
 
-def create_access_token(subject: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES) -> dict:
+def create_access_token(subject: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+                        claims: Optional[dict] = None) -> dict:
     now = int(time.time())
     exp = now + expires_minutes * 60
     jti = str(uuid.uuid4())
-    payload = {"sub": subject, "iat": now, "exp": exp, "jti": jti}
+    # claims tambahan (mode stateless): role & status user saat token dibuat
+    payload = {**(claims or {}), "sub": subject, "iat": now, "exp": exp, "jti": jti}
     token = jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return {"access_token": token, "token_type": "bearer", "exp": exp, "jti": jti}
 
-def decode_token(token: str) -> Optional[dict]:
+def create_refresh_token(subject: str, expires_days: int = settings.REFRESH_TOKEN_EXPIRE_DAYS) -> dict:
+    now = int(time.time())
+    exp = now + expires_days * 86400
+    jti = str(uuid.uuid4())
+    payload = {"sub": subject, "iat": now, "exp": exp, "jti": jti, "typ": "refresh"}
+    token = jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return {"refresh_token": token, "refresh_exp": exp}
+
+def decode_token(token: str, token_type: str = "access") -> Optional[dict]:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return payload
     except jwt.PyJWTError:
         return None
+    # token lama tanpa "typ" = access token; refresh token tidak boleh dipakai sebagai access (dan sebaliknya)
+    if payload.get("typ", "access") != token_type:
+        return None
+    return payload
+
+def issue_tokens(user: dict) -> dict:
+    """
+    Token untuk login/refresh. Mode stateless: access token pendek + claim role/status, plus refresh token.
+    """
+    if not settings.AUTH_STATELESS:
+        return create_access_token(str(user["_id"]))
+    claims = {"role": user.get("role", "user"), "status": user.get("status", "active")}
+    data = create_access_token(str(user["_id"]), settings.STATELESS_ACCESS_TOKEN_MINUTES, claims)
+    data.update(create_refresh_token(str(user["_id"])))
+    return data
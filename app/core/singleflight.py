@@ -0,0 +1,84 @@
+import time
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import registry
+
+SINGLEFLIGHT_REQUESTS = registry.counter(
+    "singleflight_requests_total", "Reads served by the single-flight layer", ("namespace", "result"))
+
+
+class SingleFlight:
+    """
+    Coalescing read per worker: request identik yang datang bersamaan berbagi 1 fetch DB
+    (dan hasilnya disimpan sebentar / micro-TTL). Write memanggil invalidate().
+
+    Hasil dibagi ke banyak request -> pemanggil TIDAK boleh memodifikasi object hasilnya.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._cache: Dict[str, Dict[Hashable, Tuple[float, Any]]] = {}
+        self._generation: Dict[str, int] = {}
+
+    async def do(self, namespace: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await fn()
+
+        cached = self._cache.get(namespace, {}).get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            SINGLEFLIGHT_REQUESTS.inc(namespace, "cached")
+            return cached[1]
+
+        full_key = (namespace, key)
+        task = self._inflight.get(full_key)
+        if task is not None:
+            SINGLEFLIGHT_REQUESTS.inc(namespace, "coalesced")
+            return await asyncio.shield(task)
+
+        SINGLEFLIGHT_REQUESTS.inc(namespace, "leader")
+        # fetch jalan di task sendiri: kalau client leader disconnect, waiter lain tidak ikut batal
+        task = asyncio.ensure_future(self._run(namespace, key, fn, self._generation.get(namespace, 0)))
+        self._inflight[full_key] = task
+        return await asyncio.shield(task)
+
+    async def _run(self, namespace: str, key: Hashable, fn, generation: int) -> Any:
+        try:
+            value = await fn()
+            # write terjadi selama fetch -> hasil boleh dibagi ke waiter, tapi jangan di-cache
+            if self.ttl > 0 and self._generation.get(namespace, 0) == generation:
+                entries = self._cache.setdefault(namespace, {})
+                now = time.monotonic()
+                if len(entries) >= settings.SINGLEFLIGHT_MAX_KEYS:
+                    # buang yang sudah kadaluarsa; kalau masih penuh, kosongkan saja (TTL-nya cuma ms)
+                    for k in [k for k, (exp, _) in entries.items() if exp <= now]:
+                        del entries[k]
+                    if len(entries) >= settings.SINGLEFLIGHT_MAX_KEYS:
+                        entries.clear()
+                entries[key] = (now + self.ttl, value)
+            return value
+        finally:
+            self._inflight.pop((namespace, key), None)
+
+    def generation(self, namespace: str) -> int:
+        # naik setiap invalidate(); dipakai cache lain untuk tahu datanya sudah basi
+        return self._generation.get(namespace, 0)
+
+    def invalidate(self, namespace: str, key: Optional[Hashable] = None) -> None:
+        """
+        Hapus cache 1 key atau seluruh namespace (mis. semua list produk).
+        Key tuple dengan elemen pertama == `key` ikut terhapus, mis. (product_id, fields).
+        """
+        self._generation[namespace] = self._generation.get(namespace, 0) + 1
+        if key is None:
+            self._cache.pop(namespace, None)
+            return
+        entries = self._cache.get(namespace, {})
+        for k in [k for k in entries if k == key or (isinstance(k, tuple) and k and k[0] == key)]:
+            del entries[k]
+
+
+singleflight = SingleFlight(settings.SINGLEFLIGHT_TTL_MS / 1000)
+
@@ -0,0 +1,480 @@
+"""
+Storage file upload yang bisa diganti (STORAGE_BACKEND): local filesystem, GridFS, atau S3-compatible.
+Semua operasi streaming (chunk), jadi file besar tidak pernah dibaca utuh ke memori.
+
+Key = path relatif di bawah /uploads, mis. "products/product_<id>_<ts>.png" (DB tetap menyimpan '/uploads/<key>').
+
+Pindah backend (copy paralel, file yang sudah ada dengan ukuran sama dilewati):
+    python -m app.core.storage --from local --to gridfs
+    python -m app.core.storage --from local --to s3 --prefix products/ --concurrency 16
+"""
+import os
+import re
+import hmac
+import uuid
+import asyncio
+import hashlib
+import argparse
+import mimetypes
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, List, NamedTuple, Optional
+from urllib.parse import quote, urlparse
+from xml.etree import ElementTree
+from app.core.config import settings
+
+CHUNK_SIZE = 256 * 1024
+S3_PART_SIZE = 8 * 1024 * 1024  # minimal part multipart S3 = 5 MB
+
+
+class StoredFile(NamedTuple):
+    key: str
+    size: int
+    mtime: float
+    content_type: Optional[str] = None
+
+
+class StorageError(Exception):
+    pass
+
+
+def key_from_path(public_path: Optional[str]) -> Optional[str]:
+    """
+    '/uploads/products/x.png' -> 'products/x.png'. None kalau bukan path upload / mencoba keluar folder.
+    """
+    if not public_path or not public_path.startswith("/uploads/"):
+        return None
+    key = public_path[len("/uploads/"):]
+    if "\\" in key or any(part in ("", ".", "..") for part in key.split("/")):
+        return None
+    return key
+
+
+def public_path(key: str) -> str:
+    return f"/uploads/{key}"
+
+
+def guess_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class LocalStorage:
+    """
+    Folder lokal (default settings.UPLOAD_DIR). Tulis ke file sementara lalu rename -> pembaca tidak
+    pernah melihat file setengah jadi. I/O disk jalan di thread.
+    """
+    name = "local"
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self._base_dir = base_dir
+
+    @property
+    def base(self) -> Path:
+        return Path(self._base_dir or settings.UPLOAD_DIR).resolve()
+
+    def local_path(self, key: str) -> Optional[Path]:
+        base = self.base
+        path = (base / key).resolve()
+        if path != base and base not in path.parents:
+            return None
+        return path
+
+    def _require_path(self, key: str) -> Path:
+        path = self.local_path(key)
+        if path is None:
+            raise StorageError(f"invalid key {key!r}")
+        return path
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        path = self._require_path(key)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        f = await asyncio.to_thread(open, tmp, "wb")
+        size = 0
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.replace, tmp, path)
+        except BaseException:
+            f.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        return size
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Isi file [start, end) per chunk. FileNotFoundError kalau tidak ada.
+        """
+        f = await asyncio.to_thread(open, self._require_path(key), "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                data = await asyncio.to_thread(f.read, CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                if remaining is not None:
+                    remaining -= len(data)
+                yield data
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def stat(self, key: str) -> Optional[StoredFile]:
+        try:
+            st = await asyncio.to_thread(os.stat, self._require_path(key))
+        except FileNotFoundError:
+            return None
+        return StoredFile(key, st.st_size, st.st_mtime, guess_type(key))
+
+    async def delete(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(os.unlink, self._require_path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _scan(self, prefix: str):
+        base = self.base
+        stack = [base / prefix.rsplit("/", 1)[0]] if "/" in prefix else [base]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(".tmp"):
+                        key = os.path.relpath(entry.path, base).replace(os.sep, "/")
+                        if key.startswith(prefix):
+                            st = entry.stat(follow_symlinks=False)
+                            yield StoredFile(key, st.st_size, st.st_mtime, guess_type(key))
+
+    async def list(self, prefix: str = "", batch_size: int = 1000) -> AsyncIterator[StoredFile]:
+        # scandir blocking -> per batch di thread
+        it = self._scan(prefix)
+        while True:
+            batch = await asyncio.to_thread(lambda: [f for _, f in zip(range(batch_size), it)])
+            if not batch:
+                break
+            for f in batch:
+                yield f
+
+
+class GridFSStorage:
+    """
+    GridFS (Motor) di database aplikasi: file dipecah per chunk 255 KB di <bucket>.chunks,
+    jadi semua node API cukup berbagi MongoDB. Range read hanya mengambil chunk yang perlu (seek).
+    """
+    name = "gridfs"
+
+    def __init__(self, db=None, bucket: Optional[str] = None):
+        self._db = db
+        self.bucket_name = bucket or settings.GRIDFS_BUCKET
+        self._bucket = None
+
+    async def _get_bucket(self):
+        if self._bucket is None:
+            from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+            if self._db is None:
+                from app.db.mongodb_config import get_db
+                self._db = await get_db()
+            self._bucket = AsyncIOMotorGridFSBucket(self._db, bucket_name=self.bucket_name)
+        return self._bucket
+
+    @property
+    def _files(self):
+        return self._db[f"{self.bucket_name}.files"]
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        bucket = await self._get_bucket()
+        stream = bucket.open_upload_stream(key, metadata={"contentType": content_type or guess_type(key)})
+        size = 0
+        try:
+            async for chunk in chunks:
+                await stream.write(chunk)
+                size += len(chunk)
+            await stream.close()
+        except BaseException:
+            await stream.abort()
+            raise
+        # revisi lama dengan nama sama dibuang (semantik overwrite seperti filesystem)
+        async for old in self._files.find({"filename": key, "_id": {"$ne": stream._id}}, {"_id": 1}):
+            await bucket.delete(old["_id"])
+        return size
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        from gridfs.errors import NoFile
+        bucket = await self._get_bucket()
+        try:
+            grid_out = await bucket.open_download_stream_by_name(key)
+        except NoFile:
+            raise FileNotFoundError(key)
+        end = grid_out.length if end is None else min(end, grid_out.length)
+        grid_out.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    @staticmethod
+    def _stored(doc: dict) -> StoredFile:
+        uploaded = doc["uploadDate"]
+        if uploaded.tzinfo is None:
+            uploaded = uploaded.replace(tzinfo=timezone.utc)
+        content_type = (doc.get("metadata") or {}).get("contentType") or guess_type(doc["filename"])
+        return StoredFile(doc["filename"], doc["length"], uploaded.timestamp(), content_type)
+
+    async def stat(self, key: str) -> Optional[StoredFile]:
+        await self._get_bucket()
+        doc = await self._files.find_one({"filename": key}, sort=[("uploadDate", -1)])
+        return self._stored(doc) if doc else None
+
+    async def delete(self, key: str) -> bool:
+        bucket = await self._get_bucket()
+        ids = [d["_id"] async for d in self._files.find({"filename": key}, {"_id": 1})]
+        for file_id in ids:
+            await bucket.delete(file_id)
+        return bool(ids)
+
+    async def list(self, prefix: str = "", batch_size: int = 1000) -> AsyncIterator[StoredFile]:
+        await self._get_bucket()
+        # index filename_1_uploadDate_1 (dibuat driver GridFS) -> prefix regex jadi range scan
+        cursor = self._files.find({"filename": {"$regex": f"^{re.escape(prefix)}"}}).batch_size(batch_size)
+        async for doc in cursor:
+            yield self._stored(doc)
+
+
+class S3Storage:
+    """
+    S3-compatible (AWS S3, MinIO, Ceph RGW, ...) dengan signature V4, path-style URL.
+    Client HTTP: httpx (opsional, `pip install httpx`). File > S3_PART_SIZE di-upload multipart.
+    """
+    name = "s3"
+
+    def __init__(self, endpoint_url: Optional[str] = None, bucket: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 region: Optional[str] = None, client=None):
+        self.endpoint_url = (endpoint_url or settings.S3_ENDPOINT_URL).rstrip("/")
+        self.host = urlparse(self.endpoint_url).netloc
+        self.bucket = bucket or settings.S3_BUCKET
+        self.access_key = access_key if access_key is not None else settings.S3_ACCESS_KEY
+        self.secret_key = secret_key if secret_key is not None else settings.S3_SECRET_KEY
+        self.region = region or settings.S3_REGION
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx  # dependency opsional, hanya untuk backend s3
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+
+    def _signed(self, method: str, key: str, query: Optional[dict] = None, headers: Optional[dict] = None):
+        """
+        URL + header ber-Authorization AWS SigV4 (payload tidak di-hash: UNSIGNED-PAYLOAD).
+        """
+        now = datetime.now(timezone.utc)
+        amz_date, day = now.strftime("%Y%m%dT%H%M%SZ"), now.strftime("%Y%m%d")
+        path = f"/{self.bucket}/{quote(key, safe='/~')}" if key else f"/{self.bucket}"
+        canonical_query = "&".join(
+            f"{quote(str(k), safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in sorted((query or {}).items())
+        )
+        signed = {"host": self.host, "x-amz-content-sha256": "UNSIGNED-PAYLOAD", "x-amz-date": amz_date}
+        names = ";".join(sorted(signed))
+        canonical = "\n".join([
+            method, path, canonical_query,
+            "".join(f"{k}:{signed[k]}\n" for k in sorted(signed)), names, "UNSIGNED-PAYLOAD",
+        ])
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+        k = ("AWS4" + self.secret_key).encode()
+        for part in (day, self.region, "s3", "aws4_request"):
+            k = hmac.new(k, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(k, to_sign.encode(), hashlib.sha256).hexdigest()
+        out = {**(headers or {}), **signed}
+        out["authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                f"SignedHeaders={names}, Signature={signature}")
+        url = f"{self.endpoint_url}{path}" + (f"?{canonical_query}" if canonical_query else "")
+        return url, out
+
+    async def _request(self, method: str, key: str, query: Optional[dict] = None,
+                       headers: Optional[dict] = None, content: Optional[bytes] = None, ok=(200, 204)):
+        url, hdrs = self._signed(method, key, query, headers)
+        resp = await self.client.request(method, url, headers=hdrs, content=content)
+        if resp.status_code not in ok:
+            raise StorageError(f"S3 {method} {key or self.bucket}: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp
+
+    @staticmethod
+    def _xml_find(xml: bytes, tag: str) -> Optional[str]:
+        for el in ElementTree.fromstring(xml).iter():
+            if el.tag.rsplit("}", 1)[-1] == tag:
+                return el.text
+        return None
+
+    @staticmethod
+    async def _read_part(it, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            try:
+                buf += await it.__anext__()
+            except StopAsyncIteration:
+                break
+        return bytes(buf)
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        content_type = content_type or guess_type(key)
+        it = chunks.__aiter__()
+        first = await self._read_part(it, S3_PART_SIZE)
+        if len(first) < S3_PART_SIZE:
+            await self._request("PUT", key, headers={"content-type": content_type}, content=first)
+            return len(first)
+
+        resp = await self._request("POST", key, query={"uploads": ""}, headers={"content-type": content_type})
+        upload_id = self._xml_find(resp.content, "UploadId")
+        etags: List[str] = []
+        size, data = 0, first
+        try:
+            while data:
+                part = await self._request("PUT", key, query={"partNumber": len(etags) + 1, "uploadId": upload_id},
+                                           content=data)
+                etags.append(part.headers["etag"])
+                size += len(data)
+                data = await self._read_part(it, S3_PART_SIZE)
+            body = "".join(f"<Part><PartNumber>{i}</PartNumber><ETag>{etag}</ETag></Part>"
+                           for i, etag in enumerate(etags, 1))
+            await self._request("POST", key, query={"uploadId": upload_id},
+                                content=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode())
+        except BaseException:
+            await self._request("DELETE", key, query={"uploadId": upload_id}, ok=(200, 204, 404))
+            raise
+        return size
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        url, hdrs = self._signed("GET", key, headers=headers)
+        async with self.client.stream("GET", url, headers=hdrs) as resp:
+            if resp.status_code == 404:
+                raise FileNotFoundError(key)
+            if resp.status_code not in (200, 206):
+                raise StorageError(f"S3 GET {key}: HTTP {resp.status_code}")
+            async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+
+    async def stat(self, key: str) -> Optional[StoredFile]:
+        resp = await self._request("HEAD", key, ok=(200, 404))
+        if resp.status_code == 404:
+            return None
+        modified = resp.headers.get("last-modified")
+        mtime = parsedate_to_datetime(modified).timestamp() if modified else 0.0
+        return StoredFile(key, int(resp.headers.get("content-length", 0)), mtime, resp.headers.get("content-type"))
+
+    async def delete(self, key: str) -> bool:
+        # S3 tidak membedakan hapus file yang ada / tidak (selalu 204)
+        await self._request("DELETE", key)
+        return True
+
+    async def list(self, prefix: str = "", batch_size: int = 1000) -> AsyncIterator[StoredFile]:
+        query = {"list-type": "2", "prefix": prefix, "max-keys": str(batch_size)}
+        while True:
+            resp = await self._request("GET", "", query=query)
+            root = ElementTree.fromstring(resp.content)
+            token = None
+            for el in root:
+                tag = el.tag.rsplit("}", 1)[-1]
+                if tag == "Contents":
+                    item = {c.tag.rsplit("}", 1)[-1]: c.text for c in el}
+                    mtime = datetime.fromisoformat(item["LastModified"].replace("Z", "+00:00")).timestamp()
+                    yield StoredFile(item["Key"], int(item["Size"]), mtime, guess_type(item["Key"]))
+                elif tag == "NextContinuationToken":
+                    token = el.text
+            if not token:
+                break
+            query["continuation-token"] = token
+
+
+def make_storage(name: str):
+    if name == "local":
+        return LocalStorage()
+    if name == "gridfs":
+        return GridFSStorage()
+    if name == "s3":
+        return S3Storage()
+    raise ValueError(f"unknown storage backend {name!r} (local|gridfs|s3)")
+
+
+_storage = None
+
+
+def get_storage():
+    """
+    Backend aktif (STORAGE_BACKEND), dibuat sekali per proses.
+    """
+    global _storage
+    if _storage is None:
+        _storage = make_storage(settings.STORAGE_BACKEND)
+    return _storage
+
+
+async def copy_storage(src, dst, prefix: str = "", concurrency: int = 8, overwrite: bool = False) -> dict:
+    """
+    Salin semua file `prefix*` dari src ke dst, maksimal `concurrency` file sekaligus (streaming,
+    tanpa file sementara). File yang sudah ada di dst dengan ukuran sama dilewati (bisa diulang).
+    """
+    report = {"copied": 0, "skipped": 0, "errors": 0, "bytes": 0}
+    sem = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def _copy(f: StoredFile):
+        try:
+            if not overwrite:
+                existing = await dst.stat(f.key)
+                if existing and existing.size == f.size:
+                    report["skipped"] += 1
+                    return
+            size = await dst.put(f.key, src.get(f.key), f.content_type)
+            report["bytes"] += size
+            report["copied"] += 1
+        except Exception as e:
+            report["errors"] += 1
+            print(f"[WARN] storage copy {f.key}: {e}")
+        finally:
+            sem.release()
+
+    async for f in src.list(prefix):
+        await sem.acquire()
+        task = asyncio.create_task(_copy(f))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return report
+
+
+async def main(args) -> None:
+    src, dst = make_storage(args.source), make_storage(args.target)
+    print(f"📦 Copy uploads {args.source} -> {args.target} (prefix={args.prefix!r}, concurrency={args.concurrency})")
+    report = await copy_storage(src, dst, args.prefix, args.concurrency, args.overwrite)
+    print(f"✅ {report['copied']:,} copied ({report['bytes'] / 1024 / 1024:,.2f} MB), "
+          f"{report['skipped']:,} skipped, {report['errors']:,} errors")
+
+
+if __name__ == "__main__":
+    argp = argparse.ArgumentParser(description="Salin file upload antar storage backend")
+    argp.add_argument("--from", dest="source", required=True, choices=["local", "gridfs", "s3"])
+    argp.add_argument("--to", dest="target", required=True, choices=["local", "gridfs", "s3"])
+    argp.add_argument("--prefix", default="", help="mis. products/")
+    argp.add_argument("--concurrency", type=int, default=8)
+    argp.add_argument("--overwrite", action="store_true", help="salin ulang walau sudah ada")
+    asyncio.run(main(argp.parse_args()))
@@ -0,0 +1,43 @@
+"""
+URL upload bertanda tangan (HMAC-SHA256) yang kadaluarsa.
+
+Format sama dengan ngx_http_hmac_secure_link_module, jadi nginx bisa memverifikasi sendiri
+tanpa memanggil app:
+    /uploads/products/x.png?st=<token>&ts=<unix time>&e=<umur detik>
+    token = base64url(HMAC-SHA256(UPLOAD_URL_SECRET, "<path>|<ts>|<e>")) tanpa padding '='
+"""
+import hmac
+import time
+import base64
+import hashlib
+
+from typing import Optional
+from urllib.parse import urlencode
+from app.core.config import settings
+
+
+def _token(path: str, ts: int, e: int) -> str:
+    digest = hmac.new(settings.UPLOAD_URL_SECRET.encode(), f"{path}|{ts}|{e}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_params(path: str, ttl: Optional[int] = None, now: Optional[int] = None) -> dict:
+    ts = int(time.time()) if now is None else now
+    e = settings.UPLOAD_URL_TTL_SECONDS if ttl is None else ttl
+    return {"st": _token(path, ts, e), "ts": ts, "e": e}
+
+
+def signed_url(path: str, ttl: Optional[int] = None, now: Optional[int] = None) -> str:
+    """
+    '/uploads/...' -> '/uploads/...?st=..&ts=..&e=..' (berlaku `ttl` detik).
+    """
+    return f"{path}?{urlencode(sign_params(path, ttl, now))}"
+
+
+def verify(path: str, st: Optional[str], ts: Optional[int], e: Optional[int], now: Optional[float] = None) -> bool:
+    if not st or ts is None or e is None:
+        return False
+    now = time.time() if now is None else now
+    if ts > now + 60 or now > ts + e:
+        return False  # belum berlaku (toleransi clock skew 60 detik) / kadaluarsa
+    return hmac.compare_digest(st, _token(path, ts, e))
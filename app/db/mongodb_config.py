@@ -1,29 +1,173 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import hashlib
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from app.core.config import settings
+from app.db.monitoring import get_event_listeners
 
 _client: AsyncIOMotorClient | None = None
 
 async def get_client() -> AsyncIOMotorClient:
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(settings.MONGODB_URI)
+        _client = AsyncIOMotorClient(settings.MONGODB_URI, event_listeners=get_event_listeners())
     return _client
 
 async def get_db():
     client = await get_client()
     return client[settings.MONGODB_DB]
 
-async def init_indexes(db):
-    # Users
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("status")
-    await db.users.create_index("phone_number")  # agar filter phone cepat
+# Perbandingan string case-insensitive (a@x.com == A@X.com); query yang mau pakai index
+# ber-collation ini harus mengirim collation yang sama.
+CI_COLLATION = {"locale": "en", "strength": 2}
 
+# Manifest index: (collection, keys, options). Versi dihitung dari isi manifest, jadi
+# setiap perubahan manifest otomatis memicu rebuild sekali oleh 1 worker.
+INDEX_MANIFEST = [
+    # Users
+    ("users", [("email", 1)], {"unique": True, "collation": CI_COLLATION, "name": "email_ci_unique"}),
+    ("users", [("status", 1)], {}),
+    ("users", [("phone_number", 1)], {}),  # agar filter phone cepat
+    ("users", [("search_keys", 1)], {}),  # prefix search nama (lengkap / per kata)
+    ("users", [("email_key", 1)], {}),  # prefix search email
+    ("users", [("phone_key", 1)], {}),  # prefix search telepon (digit)
+    # Categories
+    ("categories", [("name", 1)], {"unique": True, "collation": CI_COLLATION, "name": "name_ci_unique"}),
     # Revoked tokens TTL
-    await db.revoked_tokens.create_index("expiresAt", expireAfterSeconds=0)
-
+    ("revoked_tokens", [("expiresAt", 1)], {"expireAfterSeconds": 0}),
     # Products
-    await db.products.create_index("name")
-    await db.products.create_index("category")
-    await db.products.create_index("price")
+    ("products", [("name", 1)], {}),
+    ("products", [("name_key", 1)], {}),  # autocomplete prefix (anchored regex -> index range)
+    ("products", [("category_id", 1), ("price", 1)], {}),  # filter kategori (+ range harga)
+    ("products", [("status", 1), ("price", 1)], {}),
+    ("products", [("price", 1)], {}),
+    ("products", [("stock", 1)], {}),  # in_stock
+    ("products", [("images", 1)], {}),  # reconciler upload: cek referensi file via $in
+    ("products", [("status", 1), ("updated_at", 1)], {}),  # kandidat arsip (inactive lama)
+    ("products_archive", [("images", 1)], {}),  # gambar produk arsip tetap direferensikan
+    ("products_archive", [("category_id", 1)], {}),  # kategori masih dipakai produk arsip
+    ("users", [("profile_image", 1)], {}),
+    # Job queue: claim (queued & due / lease habis) + TTL untuk job selesai
+    ("jobs", [("status", 1), ("run_at", 1)], {}),
+    ("jobs", [("status", 1), ("locked_until", 1)], {}),
+    ("jobs", [("expire_at", 1)], {"expireAfterSeconds": 0}),
+    # Audit trail per entitas / per actor (TTL diatur ensure_audit_collection, bukan di sini).
+    # Time-series < MongoDB 6.0 hanya mengizinkan index sekunder di metaField/timeField -> actor_id ada di meta.
+    ("audit_log", [("meta.entity", 1), ("meta.entity_id", 1), ("ts", -1)], {}),
+    ("audit_log", [("meta.actor_id", 1), ("ts", -1)], {}),
+]
+INDEX_VERSION = hashlib.sha1(json.dumps(INDEX_MANIFEST, sort_keys=True).encode()).hexdigest()[:12]
+
+META_COLLECTION = "_meta"
+INDEX_LOCK_LEASE = timedelta(minutes=10)
+
+
+async def build_indexes(db):
+    # create_index per index jalan bersamaan, bukan serial
+    await asyncio.gather(*(db[coll].create_index(keys, **opts) for coll, keys, opts in INDEX_MANIFEST))
+
+
+async def init_indexes(db):
+    """
+    Build semua index di manifest lalu simpan versinya (dipakai juga oleh seeder / CLI).
+    """
+    await build_indexes(db)
+    await db[META_COLLECTION].update_one(
+        {"_id": "indexes"},
+        {"$set": {"version": INDEX_VERSION, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def acquire_lock(db, name: str, owner: str, lease: timedelta) -> bool:
+    """
+    Lock antar proses/worker berbasis 1 dokumen di _meta, otomatis lepas setelah `lease`.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        # lock belum ada -> upsert insert; lock kadaluarsa -> update; lock aktif -> duplicate key
+        await db[META_COLLECTION].update_one(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + lease}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+# index unik yang sudah pasti ada (per worker). Sebelum itu (build background belum selesai /
+# gagal, mis. migrasi 0003 menemukan duplikat) endpoint tetap cek duplikat sendiri.
+UNIQUE_INDEX_RECHECK_SECONDS = 5.0
+_unique_ready: set = set()
+_unique_checked_at: dict = {}
+
+
+async def unique_index_ready(db, collection: str, name: str) -> bool:
+    """
+    True kalau index `name` sudah ada di `collection`. Hasil negatif dicek ulang maks tiap
+    UNIQUE_INDEX_RECHECK_SECONDS (1 listIndexes), hasil positif di-cache permanen.
+    """
+    key = (db.name, collection, name)
+    if key in _unique_ready:
+        return True
+    now = time.monotonic()
+    if key in _unique_checked_at and now - _unique_checked_at[key] < UNIQUE_INDEX_RECHECK_SECONDS:
+        return False
+    _unique_checked_at[key] = now
+    try:
+        if name in await db[collection].index_information():
+            _unique_ready.add(key)
+            return True
+    except Exception as e:
+        print(f"[WARN] index check {collection}.{name} failed: {e}")
+    return False
+
+
+async def exists_case_insensitive(db, collection: str, index_name: str, cond: dict) -> bool:
+    """
+    Cek duplikat (collation case-insensitive) hanya selama index unik `index_name` belum ada;
+    setelah ada, DuplicateKeyError dari insert/update yang menjaga keunikan.
+    """
+    if await unique_index_ready(db, collection, index_name):
+        return False
+    return await db[collection].find_one(cond, {"_id": 1}, collation=CI_COLLATION) is not None
+
+
+async def _acquire_index_lock(db, owner: str) -> bool:
+    return await acquire_lock(db, "indexes_lock", owner, INDEX_LOCK_LEASE)
+
+
+async def _build_and_release(db, owner: str):
+    started = time.perf_counter()
+    try:
+        await init_indexes(db)
+        print(f"✅ MongoDB indexes built (version {INDEX_VERSION}) in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"[WARN] Index build failed: {e}")
+    finally:
+        await db[META_COLLECTION].delete_one({"_id": "indexes_lock", "owner": owner})
+
 
+async def ensure_indexes(db) -> Optional[asyncio.Task]:
+    """
+    Dipanggil tiap worker saat startup:
+    - versi tersimpan == INDEX_VERSION -> skip (1 query)
+    - beda -> 1 worker terpilih (lock document) build index di background,
+      worker lain langsung jalan tanpa menunggu.
+    """
+    meta = await db[META_COLLECTION].find_one({"_id": "indexes"})
+    if meta and meta.get("version") == INDEX_VERSION:
+        return None
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not await _acquire_index_lock(db, owner):
+        return None
+    return asyncio.create_task(_build_and_release(db, owner))
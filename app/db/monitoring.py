@@ -0,0 +1,211 @@
+import json
+import time
+import logging
+import threading
+
+from contextvars import ContextVar
+from typing import Optional
+from pymongo import monitoring
+from app.core.config import settings
+from app.core.metrics import MONGO_LATENCY, is_event_stream
+
+logger = logging.getLogger(__name__)
+
+# getMore / killCursors tidak menyimpan nama collection di key command-nya
+_COLLECTION_KEYS = {"getMore": "collection", "killCursors": "killCursors"}
+
+
+def command_collection(event: monitoring.CommandStartedEvent) -> str:
+    """
+    Ambil nama collection dari command Mongo (find/insert/update/aggregate/...).
+    """
+    cmd = event.command
+    key = _COLLECTION_KEYS.get(event.command_name, event.command_name)
+    value = cmd.get(key)
+    return value if isinstance(value, str) else "<none>"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Catat latency tiap command Mongo ke histogram per collection & nama command.
+    Dipanggil dari thread executor Motor -> state cukup dict request_id -> collection.
+    """
+
+    def __init__(self):
+        self._pending: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self._pending[(event.connection_id, event.request_id)] = command_collection(event)
+
+    def _finish(self, event, outcome: str) -> None:
+        coll = self._pending.pop((event.connection_id, event.request_id), "<none>")
+        MONGO_LATENCY.observe(event.duration_micros / 1_000_000, coll, event.command_name, outcome)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "failure")
+
+
+# Field filter per command (untuk shape); command lain cukup collection + nama command
+_FILTER_KEYS = {"find": "filter", "count": "query", "findAndModify": "query", "distinct": "query"}
+
+
+def _keys_shape(value):
+    # Nilai diganti None -> {"_id": ObjectId(a)} dan {"_id": ObjectId(b)} punya shape sama
+    if isinstance(value, dict):
+        return tuple((k, _keys_shape(v)) for k, v in value.items())
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return (_keys_shape(value[0]),)
+    return None
+
+
+def command_shape(event: monitoring.CommandStartedEvent, collection: str) -> tuple:
+    key = _FILTER_KEYS.get(event.command_name)
+    filt = event.command.get(key) if key else None
+    return collection, event.command_name, _keys_shape(filt)
+
+
+class RequestDbStats:
+    """
+    Ringkasan command Mongo dalam 1 request: jumlah, total waktu & hitungan per shape.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_micros = 0
+        self.shapes: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, shape: tuple, duration_micros: int) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_micros += duration_micros
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> list:
+        return [(shape, n) for shape, n in self.shapes.items() if n > threshold]
+
+
+_request_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def begin_request_stats() -> tuple:
+    stats = RequestDbStats()
+    return stats, _request_stats.set(stats)
+
+
+def end_request_stats(token) -> None:
+    _request_stats.reset(token)
+
+
+def current_request_stats() -> Optional[RequestDbStats]:
+    return _request_stats.get()
+
+
+class RequestAccountingListener(monitoring.CommandListener):
+    """
+    Catat command ke RequestDbStats milik request aktif (contextvar).
+    Motor meng-copy context ke thread executor, jadi contextvar tetap terbaca di sini.
+    """
+
+    def __init__(self):
+        self._pending: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        stats = _request_stats.get()
+        if stats is None:
+            return
+        shape = command_shape(event, command_collection(event))
+        self._pending[(event.connection_id, event.request_id)] = (stats, shape)
+
+    def _finish(self, event) -> None:
+        item = self._pending.pop((event.connection_id, event.request_id), None)
+        if item is not None:
+            stats, shape = item
+            stats.record(shape, event.duration_micros)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event)
+
+
+def get_event_listeners() -> list:
+    listeners = []
+    if settings.METRICS_ENABLED:
+        listeners.append(CommandMetricsListener())
+    if settings.DB_ACCOUNTING_ENABLED:
+        listeners.append(RequestAccountingListener())
+    return listeners
+
+
+class DbAccountingMiddleware:
+    """
+    Pasang RequestDbStats per request. Hasil:
+    - header Server-Timing (jika DB_SERVER_TIMING=true)
+    - log JSON untuk request lebih lambat dari SLOW_REQUEST_MS
+    - warning N+1 jika shape command yang sama berulang > N_PLUS_ONE_THRESHOLD kali
+    Response SSE (text/event-stream) tidak dilaporkan: durasi & command-nya milik koneksi panjang, bukan request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats, token = begin_request_stats()
+        start = time.perf_counter()
+        status_holder = [500]
+        streaming = [False]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                streaming[0] = is_event_stream(message)
+                if settings.DB_SERVER_TIMING:
+                    app_ms = (time.perf_counter() - start) * 1000
+                    value = (
+                        f'db;dur={stats.total_micros / 1000:.2f};desc="{stats.count} queries", '
+                        f"app;dur={app_ms:.2f}"
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", value.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request_stats(token)
+            if not streaming[0]:
+                self._report(scope, stats, (time.perf_counter() - start) * 1000, status_holder[0])
+
+    @staticmethod
+    def _report(scope, stats: RequestDbStats, elapsed_ms: float, status: int) -> None:
+        route = scope.get("route")
+        route_path = getattr(route, "path_format", None) or scope.get("path")
+        if elapsed_ms > settings.SLOW_REQUEST_MS:
+            logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": scope.get("method"),
+                "route": route_path,
+                "status": status,
+                "duration_ms": round(elapsed_ms, 2),
+                "db_commands": stats.count,
+                "db_ms": round(stats.total_micros / 1000, 2),
+            }))
+        for (coll, cmd, filter_shape), n in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+            logger.warning(json.dumps({
+                "event": "n_plus_one",
+                "method": scope.get("method"),
+                "route": route_path,
+                "collection": coll,
+                "command": cmd,
+                "filter_keys": [k for k, _ in filter_shape] if filter_shape else [],
+                "repeats": n,
+            }))
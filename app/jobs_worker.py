@@ -0,0 +1,43 @@
+"""
+Job worker terpisah dari proses API (registry handler sama dengan app.core.jobs).
+
+Contoh:
+    python -m app.jobs_worker
+    python -m app.jobs_worker --concurrency 8
+    python -m app.jobs_worker --requeue-dead   # pindahkan job dead ke antrean lalu keluar
+"""
+import asyncio
+import argparse
+
+import app.api.v1.api  # noqa: F401  (registrasi handler via @job_handler)
+from app.core.config import settings
+from app.core.jobs import JobWorker, requeue_dead
+from app.db.mongodb_config import get_db
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="Job worker")
+    argp.add_argument("--concurrency", type=int, default=settings.JOBS_CONCURRENCY)
+    argp.add_argument("--requeue-dead", dest="requeue_dead", action="store_true",
+                      help="pindahkan job dead ke antrean lalu keluar")
+    return argp.parse_args(argv)
+
+
+async def main(args) -> None:
+    db = await get_db()
+    if args.requeue_dead:
+        print(f"requeued {await requeue_dead(db)} job(s)")
+        return
+    worker = JobWorker(db, concurrency=args.concurrency)
+    worker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
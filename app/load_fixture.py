@@ -0,0 +1,200 @@
+"""
+Loader cepat untuk dump bawaan database.zip (hasil mongodump: pms/*.bson.gz + *.metadata.json.gz),
+tanpa mongorestore dan tanpa unzip: file .bson.gz di-stream langsung dari zip lalu
+di-decode bertahap (bson.decode_file_iter) dan di-insert per batch paralel.
+
+Contoh:
+    python -m app.load_fixture --drop                    # restore apa adanya ke settings.MONGODB_DB
+    python -m app.load_fixture --drop --scale 100        # 100x data (id di-remap) untuk load test
+    python -m app.load_fixture --collections products,categories --raw
+
+Setelah load: index dari metadata dibuat ulang, lalu migrasi + index manifest aplikasi
+dijalankan (kecuali --raw), sama seperti yang dilakukan startup.
+"""
+import gzip
+import time
+import asyncio
+import hashlib
+import argparse
+import zipfile
+
+from typing import Iterator, List, Optional, Set
+from bson import ObjectId, decode_file_iter, json_util
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+from app.db.mongodb_config import META_COLLECTION, INDEX_MANIFEST, get_db, init_indexes
+from app.migrations import run_migrations
+from app.seed_data import bulk_insert
+
+DEFAULT_ARCHIVE = "database.zip"
+
+
+def dump_collections(zf: zipfile.ZipFile) -> List[str]:
+    """
+    Nama collection di dump: <db>/<collection>.bson.gz
+    """
+    return sorted(
+        name.rsplit("/", 1)[-1][:-len(".bson.gz")]
+        for name in zf.namelist() if name.endswith(".bson.gz")
+    )
+
+
+def _member(zf: zipfile.ZipFile, collection: str, suffix: str) -> Optional[str]:
+    for name in zf.namelist():
+        if name.rsplit("/", 1)[-1] == f"{collection}{suffix}":
+            return name
+    return None
+
+
+def read_metadata(zf: zipfile.ZipFile, collection: str) -> dict:
+    name = _member(zf, collection, ".metadata.json.gz")
+    if not name:
+        return {}
+    # extended JSON ({"$numberInt": "1"}) -> tipe Python
+    return json_util.loads(gzip.decompress(zf.read(name)))
+
+
+def iter_documents(zf: zipfile.ZipFile, collection: str) -> Iterator[dict]:
+    """
+    Stream dokumen: zip member -> gunzip -> decode BSON satu per satu (memori konstan).
+    """
+    with zf.open(_member(zf, collection, ".bson.gz")) as raw, gzip.GzipFile(fileobj=raw) as fp:
+        yield from decode_file_iter(fp)
+
+
+def remap_id(oid: ObjectId, copy: int) -> ObjectId:
+    # deterministik & tanpa tabel mapping: 4 byte timestamp asli + 8 byte hash(id, copy),
+    # jadi referensi (category_id, dst.) di copy yang sama ikut menunjuk dokumen hasil remap
+    if copy == 0:
+        return oid
+    digest = hashlib.blake2b(oid.binary + copy.to_bytes(4, "big"), digest_size=8).digest()
+    return ObjectId(oid.binary[:4] + digest)
+
+
+def _remap(value, copy: int):
+    if isinstance(value, ObjectId):
+        return remap_id(value, copy)
+    if isinstance(value, dict):
+        return {k: _remap(v, copy) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_remap(v, copy) for v in value]
+    return value
+
+
+def _uniquify(value, copy: int):
+    if not isinstance(value, str) or copy == 0:
+        return value
+    if "@" in value:
+        local, domain = value.rsplit("@", 1)
+        return f"{local}+{copy}@{domain}"
+    return f"{value} {copy}"
+
+
+def unique_fields(collection: str, metadata: dict) -> Set[str]:
+    """
+    Field dengan index unik (dari dump maupun INDEX_MANIFEST) -> nilainya dibedakan per copy.
+    """
+    fields = set()
+    for idx in metadata.get("indexes", []):
+        if idx.get("unique") and len(idx["key"]) == 1 and idx["name"] != "_id_":
+            fields.update(idx["key"])
+    for coll, keys, opts in INDEX_MANIFEST:
+        if coll == collection and opts.get("unique") and len(keys) == 1:
+            fields.add(keys[0][0])
+    return fields
+
+
+def scaled_documents(zf: zipfile.ZipFile, collection: str, scale: int, unique: Set[str]) -> Iterator[dict]:
+    for copy in range(scale):
+        for doc in iter_documents(zf, collection):
+            if copy:
+                doc = _remap(doc, copy)
+                for field in unique:
+                    if field in doc:
+                        doc[field] = _uniquify(doc[field], copy)
+            yield doc
+
+
+async def create_dump_indexes(db, collection: str, metadata: dict) -> int:
+    models = []
+    for idx in metadata.get("indexes", []):
+        if idx["name"] == "_id_":
+            continue
+        opts = {k: v for k, v in idx.items() if k not in ("v", "key", "ns")}
+        models.append(IndexModel(list(idx["key"].items()), **opts))
+    if not models:
+        return 0
+    try:
+        await db[collection].create_indexes(models)
+    except OperationFailure as e:
+        # mis. index bernama sama dengan opsi beda dari manifest aplikasi
+        print(f"[WARN] {collection}: index dari metadata gagal dibuat: {e}")
+        return 0
+    return len(models)
+
+
+async def load(db, archive: str = DEFAULT_ARCHIVE, collections: Optional[List[str]] = None,
+               scale: int = 1, batch_size: int = 5000, parallel: int = 4,
+               drop: bool = False, raw: bool = False) -> dict:
+    """
+    Restore (dan opsional perbanyak `scale` kali) isi dump ke `db`. Return jumlah dokumen per collection.
+    """
+    counts = {}
+    started = time.perf_counter()
+    with zipfile.ZipFile(archive) as zf:
+        available = dump_collections(zf)
+        wanted = collections or available
+        missing = [c for c in wanted if c not in available]
+        if missing:
+            raise ValueError(f"collection tidak ada di {archive}: {', '.join(missing)}")
+
+        for name in wanted:
+            if drop:
+                await db[name].drop()
+            elif await db[name].estimated_document_count():
+                raise ValueError(f"collection {name} tidak kosong; pakai --drop")
+        if drop:
+            # data baru belum dimigrasi & index manifest ikut ter-drop -> versi di _meta harus diulang
+            await db[META_COLLECTION].delete_many({"_id": {"$in": ["indexes", "migrations"]}})
+
+        for name in wanted:
+            metadata = read_metadata(zf, name)
+            docs = scaled_documents(zf, name, scale, unique_fields(name, metadata))
+            counts[name] = await bulk_insert(db[name], docs, None, batch_size, parallel, name)
+            n_indexes = await create_dump_indexes(db, name, metadata)
+            print(f"   {name}: {counts[name]:,} docs, {n_indexes} index dari metadata")
+
+    if not raw:
+        await run_migrations(db)
+        await init_indexes(db)
+        print("✅ Migrations & MongoDB indexes initialized.")
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"✅ Loaded {total:,} docs in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} docs/s)")
+    return counts
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="Load database.zip (mongodump) tanpa mongorestore")
+    argp.add_argument("--archive", default=DEFAULT_ARCHIVE)
+    argp.add_argument("--collections", default=None, help="daftar dipisah koma (default semua di dump)")
+    argp.add_argument("--scale", type=int, default=1, help="perbanyak data N kali (id & field unik di-remap)")
+    argp.add_argument("--batch-size", dest="batch_size", type=int, default=5000)
+    argp.add_argument("--parallel", type=int, default=4, help="jumlah batch insert_many in-flight")
+    argp.add_argument("--drop", action="store_true", help="drop collection tujuan dulu")
+    argp.add_argument("--raw", action="store_true", help="lewati migrasi & index manifest aplikasi")
+    return argp.parse_args(argv)
+
+
+async def main(args) -> None:
+    db = await get_db()
+    collections = [c.strip() for c in args.collections.split(",") if c.strip()] if args.collections else None
+    print(f"📦 Loading {args.archive} -> {settings.MONGODB_DB} (scale={args.scale})")
+    await load(db, args.archive, collections, max(1, args.scale), args.batch_size, args.parallel,
+               drop=args.drop, raw=args.raw)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
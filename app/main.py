@@ -1,40 +1,95 @@
 import os
-import uvicorn
-import argparse
+import asyncio
 
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db.mongodb_config import get_db, init_indexes
+from app.api.v1.endpoints.uploads import files_router
+from app.db.mongodb_config import get_db, ensure_indexes
+from app.core.metrics import MetricsMiddleware, registry, dump_periodically
+from app.db.monitoring import DbAccountingMiddleware
+from app.core.encoding import NegotiatedResponse, ResponseEncodingMiddleware
+from app.core.admission import AdmissionControlMiddleware
+from app.core.jobs import JobWorker
+from app.core.audit import audit_log, ensure_audit_collection
+from app.core.events import broker as product_events, ensure_events_collection
+from app.upload_gc import run_periodically as upload_gc_periodically
+from app.archive import run_periodically as archive_periodically
+from app.migrations import ensure_migrations
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup ---
     db = await get_db()
-    await init_indexes(db)
-    print("✅ MongoDB indexes initialized.")
-
-    # init folder uploads
-    os.makedirs(os.path.join(settings.UPLOAD_DIR, settings.PRODUCT_UPLOAD_SUBDIR), exist_ok=True)
-    os.makedirs(os.path.join(settings.UPLOAD_DIR, settings.USER_UPLOAD_SUBDIR), exist_ok=True)
-    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+    # audit_log time-series harus dibuat sebelum index build (yang akan membuat collection biasa)
+    await ensure_audit_collection(db)
+    # skip kalau versi index sama; kalau beda, 1 worker build di background
+    index_task = await ensure_indexes(db)
+    print("✅ MongoDB indexes checked.")
+    # migrasi data pending (mis. backfill kunci pencarian) juga di background, 1 worker
+    migration_task = await ensure_migrations(db)
+
+    # init folder uploads (mount /uploads sudah dilakukan sekali di level module)
+    if settings.STORAGE_BACKEND == "local":
+        os.makedirs(os.path.join(settings.UPLOAD_DIR, settings.PRODUCT_UPLOAD_SUBDIR), exist_ok=True)
+        os.makedirs(os.path.join(settings.UPLOAD_DIR, settings.USER_UPLOAD_SUBDIR), exist_ok=True)
 
     print("✅ Application Folders initialized.")
 
+    metrics_task = None
+    if settings.METRICS_ENABLED and settings.METRICS_MULTIPROC_DIR:
+        metrics_task = asyncio.create_task(dump_periodically(settings.METRICS_DUMP_INTERVAL_SECONDS))
+
+    # worker job queue (hapus file, dsb.); claim atomik jadi aman di banyak worker uvicorn
+    job_worker = None
+    if settings.JOBS_ENABLED:
+        job_worker = JobWorker(db)
+        job_worker.start()
+
+    # flusher audit log (batch insert_many), 1 per worker
+    if settings.AUDIT_ENABLED:
+        audit_log.start(db)
+
+    # stream perubahan produk (SSE): tiap worker tail capped collection product_events
+    if settings.PRODUCT_EVENTS_ENABLED:
+        await ensure_events_collection(db)
+        product_events.start(db)
+
+    gc_task = None
+    if settings.UPLOAD_GC_ENABLED:
+        gc_task = asyncio.create_task(upload_gc_periodically(db))
+
+    archive_task = None
+    if settings.ARCHIVE_ENABLED:
+        archive_task = asyncio.create_task(archive_periodically(db))
+
     app.state.db = db  # bisa panggil db
     yield  # <-- di sini aplikasi berjalan
+    for task in (gc_task, archive_task):
+        if task:
+            task.cancel()
+    if job_worker:
+        await job_worker.stop()
+    await audit_log.stop()  # flush sisa event sebelum koneksi ditutup
+    await product_events.stop()
+    for task in (index_task, migration_task):
+        if task and not task.done():
+            task.cancel()
+    if metrics_task:
+        metrics_task.cancel()
+        registry.dump(zero_gauges=True)
     app.state.db.client.close()
     # --- Shutdown ---
     # (Kalau mau tutup koneksi Mongo misalnya)
     print("🛑 Application shutting down...")
 
-app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan, default_response_class=NegotiatedResponse)
 
 # CORS (sesuaikan bila perlu)
 app.add_middleware(
@@ -43,16 +98,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # client baca versi untuk If-Match
 )
 
+# Kompresi + negosiasi JSON/MessagePack
+app.add_middleware(ResponseEncodingMiddleware)
+
+if settings.DB_ACCOUNTING_ENABLED:
+    app.add_middleware(DbAccountingMiddleware)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Static for uploads
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+if settings.STORAGE_BACKEND == "local" and settings.UPLOAD_DELIVERY == "static" and settings.UPLOAD_ACCESS == "public":
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+else:
+    # cek akses (token / URL bertanda tangan) lalu file dikirim proxy via X-Accel-Redirect / X-Sendfile,
+    # atau di-stream dari storage gridfs/s3 (dengan dukungan Range)
+    app.include_router(files_router)
 
 # API v1
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # format text Prometheus (multi-worker digabung via METRICS_MULTIPROC_DIR)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", include_in_schema=False)
 async def root():
     return RedirectResponse(url='/docs')
@@ -60,6 +137,10 @@ async def root():
 
 
 if __name__ == '__main__':
+    # import di sini: worker uvicorn tidak perlu memuat CLI/argparse saat import app
+    import argparse
+    import uvicorn
+
     argp = argparse.ArgumentParser(description="API GENERAL")
     argp.add_argument("-p", "--port", dest="port", type=int, default=8001)
     argp.add_argument('-w', '--worker', dest='worker', help='api worker', type=int, default=1)
@@ -0,0 +1,166 @@
+"""
+Migrasi data berurutan & idempotent. Yang sudah jalan dicatat di _meta {"_id": "migrations"}.
+
+Contoh:
+    python -m app.migrations            # jalankan migrasi yang belum diterapkan
+    python -m app.migrations --list
+
+Saat startup, migrasi yang pending dijalankan di background oleh 1 worker (lock di _meta),
+sama seperti build index.
+"""
+import os
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.core.search import normalize_key, user_search_fields
+from app.db.mongodb_config import META_COLLECTION, INDEX_MANIFEST, CI_COLLATION, get_db, acquire_lock
+
+MIGRATION_LOCK_LEASE = timedelta(minutes=30)
+
+
+async def bulk_set(db, collection: str, cond: dict, projection: dict,
+                   compute: Callable[[dict], dict], batch_size: int = 1000) -> int:
+    """
+    Untuk tiap dokumen yang cocok `cond`: $set hasil compute(doc), ditulis per batch bulk_write.
+    """
+    ops, total = [], 0
+    async for doc in db[collection].find(cond, projection):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": compute(doc)}))
+        if len(ops) >= batch_size:
+            await db[collection].bulk_write(ops, ordered=False)
+            total, ops = total + len(ops), []
+    if ops:
+        await db[collection].bulk_write(ops, ordered=False)
+        total += len(ops)
+    return total
+
+
+async def backfill_key(db, collection: str, source: str, target: str, batch_size: int = 1000) -> int:
+    """
+    Isi field kunci pencarian `target` = normalize_key(`source`) untuk dokumen yang belum punya.
+    """
+    return await bulk_set(db, collection, {target: {"$exists": False}}, {source: 1},
+                          lambda doc: {target: normalize_key(doc.get(source))}, batch_size)
+
+
+async def products_name_key(db) -> int:
+    return await backfill_key(db, "products", "name", "name_key")
+
+
+async def users_search_keys(db) -> int:
+    """
+    Kunci pencarian user: search_keys (nama) + email_key + phone_key. Sekalian trim spasi di email
+    (spasi ikut dibandingkan oleh index unik).
+    """
+    def compute(u):
+        email = u.get("email").strip() if isinstance(u.get("email"), str) else u.get("email")
+        return {"email": email, **user_search_fields(u.get("full_name"), email, u.get("phone_number"))}
+    return await bulk_set(db, "users", {"email_key": {"$exists": False}},
+                          {"full_name": 1, "email": 1, "phone_number": 1}, compute)
+
+
+async def _report_case_duplicates(db, collection: str, field: str) -> int:
+    dups = await db[collection].aggregate([
+        {"$group": {"_id": {"$toLower": f"${field}"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": 20},
+    ]).to_list(length=20)
+    for d in dups:
+        print(f"[WARN] {collection}.{field} duplicate (beda huruf besar/kecil): {d['_id']!r} x{d['n']}")
+    return len(dups)
+
+
+async def case_insensitive_unique(db) -> int:
+    """
+    Unik case-insensitive untuk users.email & categories.name: trim nama kategori, buat index
+    ber-collation, lalu drop index email lama (case-sensitive). Kalau masih ada duplikat beda
+    huruf besar/kecil, migrasi gagal (dicoba lagi di startup berikutnya) setelah dibereskan manual.
+    """
+    changed = await bulk_set(db, "categories", {"name": {"$regex": r"^\s|\s$"}}, {"name": 1},
+                             lambda c: {"name": c["name"].strip()})
+    dups = await _report_case_duplicates(db, "users", "email") + await _report_case_duplicates(db, "categories", "name")
+    if dups:
+        raise RuntimeError(f"{dups} case-insensitive duplicate(s) must be resolved first")
+
+    for coll, keys, opts in INDEX_MANIFEST:
+        if opts.get("collation") == CI_COLLATION and opts.get("unique"):
+            await db[coll].create_index(keys, **opts)
+    if "email_1" in await db.users.index_information():
+        await db.users.drop_index("email_1")
+    return changed
+
+
+# (nama, fungsi) — urutan penting; jangan ubah nama migrasi yang sudah dirilis
+MIGRATIONS: List[Tuple[str, Callable[..., Awaitable[int]]]] = [
+    ("0001_products_name_key", products_name_key),
+    ("0002_users_search_keys", users_search_keys),
+    ("0003_case_insensitive_unique", case_insensitive_unique),
+]
+
+
+async def applied_migrations(db) -> List[str]:
+    meta = await db[META_COLLECTION].find_one({"_id": "migrations"})
+    return (meta or {}).get("applied", [])
+
+
+async def run_migrations(db) -> List[str]:
+    applied = set(await applied_migrations(db))
+    done = []
+    for name, fn in MIGRATIONS:
+        if name in applied:
+            continue
+        started = time.perf_counter()
+        changed = await fn(db)
+        await db[META_COLLECTION].update_one(
+            {"_id": "migrations"},
+            {"$addToSet": {"applied": name}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        print(f"✅ Migration {name}: {changed:,} docs in {time.perf_counter() - started:.2f}s")
+        done.append(name)
+    return done
+
+
+async def _run_and_release(db, owner: str):
+    try:
+        await run_migrations(db)
+    except Exception as e:
+        print(f"[WARN] Migration failed: {e}")
+    finally:
+        await db[META_COLLECTION].delete_one({"_id": "migrations_lock", "owner": owner})
+
+
+async def ensure_migrations(db) -> Optional[asyncio.Task]:
+    """
+    Startup: tidak ada yang pending -> 1 query; ada -> 1 worker menjalankan di background.
+    """
+    applied = set(await applied_migrations(db))
+    if all(name in applied for name, _ in MIGRATIONS):
+        return None
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not await acquire_lock(db, "migrations_lock", owner, MIGRATION_LOCK_LEASE):
+        return None
+    return asyncio.create_task(_run_and_release(db, owner))
+
+
+async def main(args) -> None:
+    db = await get_db()
+    if args.list:
+        applied = set(await applied_migrations(db))
+        for name, _ in MIGRATIONS:
+            print(f"[{'x' if name in applied else ' '}] {name}")
+        return
+    done = await run_migrations(db)
+    print(f"✅ {len(done)} migration(s) applied" if done else "✅ Nothing to migrate")
+
+
+if __name__ == "__main__":
+    argp = argparse.ArgumentParser(description="Migrasi data")
+    argp.add_argument("--list", action="store_true", help="tampilkan status migrasi")
+    asyncio.run(main(argp.parse_args()))
@@ -0,0 +1,244 @@
+"""
+Generator data sintetis (categories, products, users) dalam jumlah besar.
+
+Contoh:
+    python -m app.seed_data --categories 50 --products 1000000 --users 10000 --seed 42
+    python -m app.seed_data --products 20000 --drop     # kosongkan collection dulu
+
+Koneksi memakai settings.MONGODB_URI / settings.MONGODB_DB (.env).
+Output deterministik untuk --seed yang sama (termasuk _id & hash password).
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+from bson import ObjectId
+from passlib.hash import pbkdf2_sha256
+from app.core.config import settings
+from app.core.search import normalize_key, user_search_fields
+from app.db.mongodb_config import get_db, init_indexes
+
+# Kategori awal (sama dengan seed lama) + kosakata nama produk furniture
+BASE_CATEGORIES = ["Meja", "Sofa", "Kursi", "Rak", "Lemari", "Lampu"]
+EXTRA_CATEGORIES = ["Kasur", "Cermin", "Karpet", "Gorden", "Nakas", "Bufet", "Bangku", "Dipan",
+                    "Meja Rias", "Rak Sepatu", "Lampu Gantung", "Meja Makan", "Kursi Kantor", "Partisi"]
+MATERIALS = ["Jati", "Mahoni", "Pinus", "Rotan", "Bambu", "Besi", "Aluminium", "Kaca", "Marmer",
+             "Plywood", "MDF", "Beludru", "Kulit", "Linen", "Akasia"]
+STYLES = ["Minimalis", "Skandinavia", "Industrial", "Klasik", "Modern", "Vintage", "Rustic",
+          "Japandi", "Tropis", "Retro", "Lipat", "Sudut", "Premium", "Compact"]
+COLORS = ["Putih", "Hitam", "Coklat", "Natural", "Abu", "Krem", "Walnut", "Oak", "Hijau Sage", "Navy"]
+FIRST_NAMES = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fitri", "Gilang", "Hana", "Indra", "Joko",
+               "Kartika", "Lina", "Made", "Nadia", "Oki", "Putri", "Rizky", "Sari", "Tono", "Wulan"]
+LAST_NAMES = ["Saputra", "Wijaya", "Pratama", "Lestari", "Santoso", "Hidayat", "Nugroho",
+              "Kusuma", "Siregar", "Simanjuntak", "Halim", "Gunawan", "Setiawan", "Utami"]
+IMAGE_EXTS = [".jpg", ".png", ".webp"]
+
+# Password pool: hashing PBKDF2 mahal, jadi di-hash sekali lalu dipakai ulang
+PASSWORD_POOL_SIZE = 8
+
+
+def _object_id(rng: random.Random, ts: datetime) -> ObjectId:
+    # 4 byte timestamp asli + 8 byte dari rng -> deterministik & tetap urut waktu
+    return ObjectId(int(ts.timestamp()).to_bytes(4, "big") + rng.randbytes(8))
+
+
+def _created_at(rng: random.Random, now: datetime, max_days: int = 730) -> datetime:
+    return (now - timedelta(seconds=rng.randint(0, max_days * 86400))).replace(microsecond=0)
+
+
+def generate_categories(rng: random.Random, n: int, now: datetime) -> List[dict]:
+    names = BASE_CATEGORIES + EXTRA_CATEGORIES
+    docs = []
+    for i in range(n):
+        name = names[i] if i < len(names) else f"{rng.choice(names)} {rng.choice(STYLES)} {i}"
+        created = _created_at(rng, now)
+        docs.append({
+            "_id": _object_id(rng, created),
+            "name": name,
+            "slug": name.lower().replace(" ", "-"),
+            "status": "active" if rng.random() < 0.9 else "inactive",
+            "created_at": created,
+            "updated_at": created,
+        })
+    return docs
+
+
+def generate_products(rng: random.Random, n: int, category_ids: List[ObjectId],
+                      now: datetime) -> Iterator[dict]:
+    """
+    Produk dengan distribusi realistis: harga log-normal (median ~1.5jt),
+    ~8% stok habis, sisanya mayoritas stok kecil, 0-4 gambar per produk.
+    """
+    for i in range(n):
+        created = _created_at(rng, now)
+        _id = _object_id(rng, created)
+        kind = rng.choice(BASE_CATEGORIES + EXTRA_CATEGORIES)
+        material, style = rng.choice(MATERIALS), rng.choice(STYLES)
+        name = f"{kind} {material} {style} {rng.choice(COLORS)}"
+        price = round(min(max(rng.lognormvariate(14.2, 0.9), 25_000), 150_000_000), -2)
+        stock = 0 if rng.random() < 0.08 else int(rng.expovariate(1 / 40)) + 1
+        ts_ms = int(created.timestamp() * 1000)
+        images = [
+            f"/uploads/{settings.PRODUCT_UPLOAD_SUBDIR}/product_{_id}_{ts_ms + k}{rng.choice(IMAGE_EXTS)}"
+            for k in range(rng.choices([0, 1, 2, 3, 4], weights=[10, 35, 30, 15, 10])[0])
+        ]
+        updated = created + timedelta(seconds=rng.randint(0, int((now - created).total_seconds())))
+        if rng.random() < 0.3:
+            name = f"{name} {i}"
+        yield {
+            "_id": _id,
+            "name": name,
+            "name_key": normalize_key(name),
+            "description": f"{kind} bahan {material.lower()} gaya {style.lower()}. " * rng.randint(1, 6),
+            "price": float(price),
+            "category_id": rng.choice(category_ids) if category_ids and rng.random() < 0.95 else None,
+            "images": images,
+            "stock": stock,
+            "low_stock_threshold": rng.choice([0, 5, 5, 10, 10, 20]),
+            "status": "active" if rng.random() < 0.85 else "inactive",
+            "created_at": created,
+            "updated_at": updated,
+        }
+
+
+def password_hashes(rng: random.Random, size: int = PASSWORD_POOL_SIZE) -> List[str]:
+    """
+    Hash untuk password 'password0'..'password{size-1}' dengan salt dari rng (deterministik).
+    """
+    return [pbkdf2_sha256.using(salt=rng.randbytes(16)).hash(f"password{i}") for i in range(size)]
+
+
+def generate_users(rng: random.Random, n: int, now: datetime, hashes: List[str]) -> Iterator[dict]:
+    for i in range(n):
+        created = _created_at(rng, now)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        _id = _object_id(rng, created)
+        email = f"{first.lower()}.{last.lower()}.{i}@example.com"
+        phone = f"08{rng.randint(10**9, 10**10 - 1)}"
+        yield {
+            "_id": _id,
+            "email": email,
+            "full_name": f"{first} {last}",
+            "phone_number": phone,
+            **user_search_fields(f"{first} {last}", email, phone),
+            "profile_image": None,
+            "role": "admin" if rng.random() < 0.01 else "user",
+            "status": "active" if rng.random() < 0.92 else "inactive",
+            "hashed_password": hashes[i % len(hashes)],
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+class Progress:
+    def __init__(self, label: str, total: Optional[int]):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def add(self, n: int) -> None:
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last >= 1 or (self.total is not None and self.done >= self.total):
+            self._last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            total = f"{self.total:,}" if self.total is not None else "?"
+            print(f"   {self.label}: {self.done:,}/{total} ({rate:,.0f} docs/s)", flush=True)
+
+
+async def bulk_insert(collection, docs: Iterator[dict], total: Optional[int], batch_size: int,
+                      parallel: int, label: str) -> int:
+    """
+    insert_many(ordered=False) per batch, maksimal `parallel` batch in-flight sekaligus.
+    total=None -> jumlah tidak diketahui (stream), hanya untuk tampilan progress.
+    """
+    if total is not None and total <= 0:
+        return 0
+    progress = Progress(label, total)
+    sem = asyncio.Semaphore(parallel)
+    tasks = []
+
+    async def _insert(batch):
+        try:
+            await collection.insert_many(batch, ordered=False)
+            progress.add(len(batch))
+        finally:
+            sem.release()
+
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await sem.acquire()
+            tasks.append(asyncio.create_task(_insert(batch)))
+            batch = []
+    if batch:
+        await sem.acquire()
+        tasks.append(asyncio.create_task(_insert(batch)))
+    await asyncio.gather(*tasks)
+    return progress.done
+
+
+async def seed(n_categories: int, n_products: int, n_users: int, seed_value: int,
+               batch_size: int = 5000, parallel: int = 4, drop: bool = False, db=None,
+               now: Optional[datetime] = None) -> dict:
+    db = db if db is not None else await get_db()
+    rng = random.Random(seed_value)
+    now = now or datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    if drop:
+        for name in ("categories", "products", "users"):
+            await db[name].delete_many({})
+
+    start = time.perf_counter()
+    categories = generate_categories(rng, n_categories, now)
+    category_ids = [c["_id"] for c in categories]
+    await bulk_insert(db.categories, iter(categories), len(categories), batch_size, parallel, "categories")
+
+    product_rng = random.Random(rng.random())
+    await bulk_insert(db.products, generate_products(product_rng, n_products, category_ids, now),
+                      n_products, batch_size, parallel, "products")
+
+    user_rng = random.Random(rng.random())
+    hashes = password_hashes(user_rng) if n_users else []
+    await bulk_insert(db.users, generate_users(user_rng, n_users, now, hashes),
+                      n_users, batch_size, parallel, "users")
+
+    elapsed = time.perf_counter() - start
+    total = n_categories + n_products + n_users
+    print(f"✅ Seeded {total:,} docs in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} docs/s)")
+    return {"category_ids": category_ids}
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="Seed data sintetis ke settings.MONGODB_URI")
+    argp.add_argument("--categories", type=int, default=20)
+    argp.add_argument("--products", type=int, default=10_000)
+    argp.add_argument("--users", type=int, default=100)
+    argp.add_argument("--seed", type=int, default=42)
+    argp.add_argument("--batch-size", dest="batch_size", type=int, default=5000)
+    argp.add_argument("--parallel", type=int, default=4, help="jumlah batch insert_many in-flight")
+    argp.add_argument("--drop", action="store_true", help="kosongkan categories/products/users dulu")
+    argp.add_argument("--no-indexes", dest="indexes", action="store_false",
+                      help="lewati init_indexes (lebih cepat untuk load besar, buat index belakangan)")
+    return argp.parse_args(argv)
+
+
+async def main(args) -> None:
+    db = await get_db()
+    print(f"🌱 Seeding {settings.MONGODB_DB}: {args.categories} categories, "
+          f"{args.products:,} products, {args.users:,} users (seed={args.seed})")
+    await seed(args.categories, args.products, args.users, args.seed,
+               batch_size=args.batch_size, parallel=args.parallel, drop=args.drop, db=db)
+    if args.indexes:
+        await init_indexes(db)
+        print("✅ MongoDB indexes initialized.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
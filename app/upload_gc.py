@@ -0,0 +1,157 @@
+"""
+Reconciler file upload: hapus file di storage upload (STORAGE_BACKEND) yang tidak direferensikan lagi oleh
+products(_archive).images / users.profile_image (sisa upload gagal, replace gambar, hapus yang error, dsb.).
+
+Contoh:
+    python -m app.upload_gc --dry-run          # laporan saja, tidak menghapus
+    python -m app.upload_gc --grace 600 --rate 200
+
+Jadwal dari lifespan opt-in (UPLOAD_GC_ENABLED=true): tiap UPLOAD_GC_INTERVAL_SECONDS, 1 worker per interval.
+"""
+import os
+import time
+import socket
+import random
+import asyncio
+import argparse
+
+from datetime import timedelta
+from typing import AsyncIterator, List, Optional
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.storage import StorageError, StoredFile, get_storage, public_path
+from app.db.mongodb_config import get_db, acquire_lock
+
+UPLOAD_GC_RUNS = registry.counter(
+    "upload_gc_runs_total", "Upload reconciler runs", ("result",))
+UPLOAD_GC_DELETED = registry.counter(
+    "upload_gc_deleted_files_total", "Orphaned upload files deleted")
+UPLOAD_GC_RECLAIMED = registry.counter(
+    "upload_gc_reclaimed_bytes_total", "Bytes reclaimed by deleting orphaned uploads")
+
+async def scan_uploads(storage, sub_dirs, batch_size: int) -> AsyncIterator[List[StoredFile]]:
+    """
+    Stream file di bawah sub_dirs dari storage aktif per batch; tidak membangun list besar.
+    """
+    batch = []
+    for sub_dir in sub_dirs:
+        async for f in storage.list(f"{sub_dir.strip('/')}/"):
+            batch.append(f)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def referenced_paths(db, paths: List[str]) -> set:
+    # 3 query per batch, semuanya pakai index (images multikey di products & arsip, users.profile_image)
+    found = set()
+    wanted = set(paths)
+    for collection in ("products", "products_archive"):
+        async for p in db[collection].find({"images": {"$in": paths}}, {"images": 1, "_id": 0}):
+            found.update(img for img in p.get("images") or [] if img in wanted)
+    async for u in db.users.find({"profile_image": {"$in": paths}}, {"profile_image": 1, "_id": 0}):
+        found.add(u["profile_image"])
+    return found
+
+
+async def reconcile(db, dry_run: bool = False, grace_seconds: Optional[float] = None,
+                    batch_size: Optional[int] = None, delete_rate: Optional[float] = None) -> dict:
+    """
+    Scan -> cek referensi per batch -> hapus file yatim (dibatasi delete_rate file/detik).
+    File yang lebih muda dari grace_seconds dilewati (upload yang DB write-nya belum selesai).
+    """
+    grace = settings.UPLOAD_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    batch_size = batch_size or settings.UPLOAD_GC_BATCH_SIZE
+    rate = delete_rate or settings.UPLOAD_GC_DELETE_RATE
+    cutoff = time.time() - grace
+
+    report = {"scanned": 0, "skipped_recent": 0, "referenced": 0, "orphans": 0,
+              "deleted": 0, "reclaimed_bytes": 0, "errors": 0, "dry_run": dry_run}
+    started = time.perf_counter()
+    next_delete = time.monotonic()
+
+    storage = get_storage()
+    # local: scandir per batch di thread; gridfs/s3: cursor / ListObjectsV2 per halaman
+    async for batch in scan_uploads(storage, [settings.PRODUCT_UPLOAD_SUBDIR, settings.USER_UPLOAD_SUBDIR], batch_size):
+        report["scanned"] += len(batch)
+        candidates = [f for f in batch if f.mtime < cutoff]
+        report["skipped_recent"] += len(batch) - len(candidates)
+        if not candidates:
+            continue
+
+        refs = await referenced_paths(db, [public_path(f.key) for f in candidates])
+        report["referenced"] += len(refs)
+        for key, size, _, _ in candidates:
+            if public_path(key) in refs:
+                continue
+            report["orphans"] += 1
+            if dry_run:
+                report["reclaimed_bytes"] += size
+                continue
+
+            delay = next_delete - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_delete = max(next_delete, time.monotonic()) + 1 / rate
+            try:
+                if await storage.delete(key):
+                    report["deleted"] += 1
+                    report["reclaimed_bytes"] += size
+                    UPLOAD_GC_DELETED.inc()
+                    UPLOAD_GC_RECLAIMED.inc(amount=size)
+            except (OSError, StorageError) as e:
+                report["errors"] += 1
+                print(f"[WARN] upload gc: failed to delete {key}: {e}")
+
+    report["duration_s"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def run_periodically(db, interval: Optional[float] = None) -> None:
+    """
+    Task lifespan: tiap interval, worker yang mendapat lock (_meta.upload_gc_lock) menjalankan GC.
+    Lease lock = interval, jadi dengan N worker uvicorn GC tetap jalan ~1x per interval.
+    """
+    interval = interval or settings.UPLOAD_GC_INTERVAL_SECONDS
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    # jitter awal supaya worker yang start bersamaan tidak rebutan di detik yang sama
+    await asyncio.sleep(random.uniform(0, min(interval, 60)))
+    while True:
+        try:
+            if await acquire_lock(db, "upload_gc_lock", owner, timedelta(seconds=interval * 0.9)):
+                report = await reconcile(db)
+                UPLOAD_GC_RUNS.inc("ok")
+                if report["orphans"]:
+                    print(f"🧹 Upload GC: {report}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            UPLOAD_GC_RUNS.inc("error")
+            print(f"[WARN] upload gc failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="Hapus file upload yang tidak direferensikan")
+    argp.add_argument("--dry-run", dest="dry_run", action="store_true", help="hanya laporan, tidak menghapus")
+    argp.add_argument("--grace", type=float, default=None, help="umur minimum file (detik)")
+    argp.add_argument("--batch-size", dest="batch_size", type=int, default=None)
+    argp.add_argument("--rate", type=float, default=None, help="maks file dihapus per detik")
+    return argp.parse_args(argv)
+
+
+async def main(args) -> None:
+    db = await get_db()
+    report = await reconcile(db, dry_run=args.dry_run, grace_seconds=args.grace,
+                             batch_size=args.batch_size, delete_rate=args.rate)
+    mb = report["reclaimed_bytes"] / 1024 / 1024
+    verb = "would reclaim" if args.dry_run else "reclaimed"
+    print(f"✅ Scanned {report['scanned']:,} files, {report['orphans']:,} orphans, "
+          f"{verb} {mb:,.2f} MB in {report['duration_s']}s")
+    print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,318 @@
+"""
+Benchmark / load test untuk semua endpoint API.
+
+Contoh:
+    # in-process app + mongod lokal (database terpisah: pms_bench)
+    python -m benchmarks.bench_api --mongo-uri mongodb://localhost:27017 --products 5000
+
+    # in-process app + Mongo in-memory (butuh `pip install mongomock-motor`)
+    python -m benchmarks.bench_api --in-memory --products 2000
+
+    # bandingkan dengan baseline, exit code 1 kalau ada regresi
+    python -m benchmarks.bench_api --in-memory --out bench.json --baseline benchmarks/baseline.json
+
+Catatan: "db_ops" dibaca dari header Server-Timing (DB_SERVER_TIMING=true). Backend in-memory
+tidak memicu CommandListener pymongo, jadi db_ops bernilai 0 di mode tsb.
+"""
+import os
+import io
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+
+from typing import Awaitable, Callable, Dict, List, Tuple
+from datetime import datetime, timezone
+
+import httpx
+
+# Server-Timing harus aktif sebelum app di-import
+os.environ.setdefault("DB_SERVER_TIMING", "true")
+# 1 admin user menembak semua request -> rate limit per user akan mendistorsi hasil
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import hash_password  # noqa: E402
+from app import seed_data  # noqa: E402
+
+ADMIN_EMAIL = "bench-admin@example.com"
+ADMIN_PASSWORD = "bench-password"
+API = settings.API_V1_STR
+
+# PNG 1x1 untuk skenario upload
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+_DB_OPS_RE = re.compile(r'desc="(\d+) queries"')
+
+
+# =====================
+# Setup database & app
+# =====================
+async def setup_app(args):
+    if args.db == settings.MONGODB_DB and not args.in_memory:
+        sys.exit(f"Refusing to seed into the application database '{args.db}', pakai --db lain")
+    settings.MONGODB_DB = args.db
+    if args.mongo_uri:
+        settings.MONGODB_URI = args.mongo_uri
+    # upload benchmark jangan sampai mengotori folder uploads/ project
+    settings.UPLOAD_DIR = args.upload_dir or tempfile.mkdtemp(prefix="pms-bench-uploads-")
+
+    from app.db import mongodb_config
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--in-memory butuh paket mongomock-motor (pip install mongomock-motor)")
+        mongodb_config._client = AsyncMongoMockClient()
+
+    from app.main import app
+    db = await mongodb_config.get_db()
+    return app, db
+
+
+async def seed(db, n_categories: int, n_products: int, seed_value: int) -> dict:
+    now = datetime.now(timezone.utc)
+    await seed_data.seed(n_categories, n_products, 0, seed_value, drop=True, db=db, now=now)
+    await db.users.insert_one({
+        "email": ADMIN_EMAIL, "full_name": "Bench Admin", "phone_number": None,
+        "profile_image": None, "role": "admin", "status": "active",
+        "hashed_password": hash_password(ADMIN_PASSWORD),
+        "created_at": now, "updated_at": now,
+    })
+    category_ids = [str(c["_id"]) async for c in db.categories.find({"status": "active"}, {"_id": 1})]
+    product_ids = [str(p["_id"]) async for p in db.products.find({}, {"_id": 1})]
+    return {"category_ids": category_ids, "product_ids": product_ids}
+
+
+async def login(client: httpx.AsyncClient) -> str:
+    r = await client.post(f"{API}/auth/login", data={"username": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+# =====================
+# Skenario workload
+# =====================
+Scenario = Callable[[httpx.AsyncClient, dict, random.Random], Awaitable[httpx.Response]]
+
+
+async def list_default(c, ctx, rng):
+    return await c.get(f"{API}/products")
+
+
+async def list_filtered(c, ctx, rng):
+    return await c.get(f"{API}/products", params={
+        "category_id": rng.choice(ctx["category_ids"]), "status": "active",
+        "sort_by": "price", "order": rng.choice(["asc", "desc"]), "page_size": 50,
+    })
+
+
+async def list_deep_page(c, ctx, rng):
+    pages = max(1, len(ctx["product_ids"]) // 20)
+    return await c.get(f"{API}/products", params={"page": rng.randint(pages // 2, pages), "page_size": 20})
+
+
+async def search(c, ctx, rng):
+    return await c.get(f"{API}/products", params={"search": rng.choice(["meja", "sofa", "jati", "lam"])})
+
+
+async def detail(c, ctx, rng):
+    return await c.get(f"{API}/products/{rng.choice(ctx['product_ids'])}")
+
+
+async def categories(c, ctx, rng):
+    # router categories punya prefix ganda (api.py + categories.py)
+    return await c.get(f"{API}/categories/categories")
+
+
+async def create_product(c, ctx, rng):
+    return await c.post(f"{API}/products", data={
+        "name": f"Bench {rng.randint(0, 10**9)}", "price": str(rng.randint(1000, 100000)),
+        "category_id": rng.choice(ctx["category_ids"]), "stock": "10",
+    })
+
+
+async def update_product(c, ctx, rng):
+    return await c.put(f"{API}/products/{rng.choice(ctx['product_ids'])}",
+                       data={"stock": str(rng.randint(0, 500))})
+
+
+async def upload_image(c, ctx, rng):
+    files = {"files": ("bench.png", io.BytesIO(TINY_PNG), "image/png")}
+    return await c.post(f"{API}/products/{rng.choice(ctx['product_ids'])}/images", files=files)
+
+
+SCENARIOS: Dict[str, Tuple[int, Scenario]] = {
+    # nama: (bobot, fungsi)
+    "list_default": (25, list_default),
+    "list_filtered": (15, list_filtered),
+    "list_deep_page": (5, list_deep_page),
+    "search": (10, search),
+    "detail": (25, detail),
+    "categories": (8, categories),
+    "create_product": (5, create_product),
+    "update_product": (5, update_product),
+    "upload_image": (2, upload_image),
+}
+
+
+# =====================
+# Runner & laporan
+# =====================
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    idx = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[idx]
+
+
+def summarize(samples: List[Tuple[float, int, int]], elapsed: float) -> dict:
+    lat = sorted(s[0] for s in samples)
+    errors = sum(1 for s in samples if s[1] >= 400)
+    ops = [s[2] for s in samples]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(lat, 50), 3),
+        "p95_ms": round(percentile(lat, 95), 3),
+        "p99_ms": round(percentile(lat, 99), 3),
+        "db_ops_per_request": round(sum(ops) / len(ops), 2) if ops else 0.0,
+    }
+
+
+async def run_workload(client, ctx, scenarios, total_requests: int, concurrency: int, seed: int):
+    names = list(scenarios)
+    weights = [scenarios[n][0] for n in names]
+    plan_rng = random.Random(seed)
+    plan = plan_rng.choices(names, weights=weights, k=total_requests)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, name in enumerate(plan):
+        queue.put_nowait((i, name))
+
+    results: Dict[str, list] = {n: [] for n in names}
+
+    async def worker(wid: int):
+        rng = random.Random(seed * 1000 + wid)
+        while True:
+            try:
+                _, name = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            r = await scenarios[name][1](client, ctx, rng)
+            ms = (time.perf_counter() - t0) * 1000
+            m = _DB_OPS_RE.search(r.headers.get("server-timing", ""))
+            results[name].append((ms, r.status_code, int(m.group(1)) if m else 0))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    report = {name: summarize(res, elapsed) for name, res in results.items() if res}
+    report["_overall"] = summarize([s for res in results.values() for s in res], elapsed)
+    return report
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Regresi = p95 naik atau throughput turun lebih dari `threshold` (relatif).
+    """
+    problems = []
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            problems.append(f"{name}: throughput {base['throughput_rps']} -> {cur['throughput_rps']} rps")
+    return problems
+
+
+def print_table(scenarios: dict) -> None:
+    print(f"{'scenario':<18}{'req':>7}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'db_ops':>8}")
+    for name, r in scenarios.items():
+        print(f"{name:<18}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['db_ops_per_request']:>8}")
+
+
+async def main(args) -> int:
+    app, db = await setup_app(args)
+    print(f"🌱 Seeding {args.categories} categories / {args.products} products ...")
+    ctx = await seed(db, args.categories, args.products, args.seed)
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        scenarios = {n: SCENARIOS[n] for n in args.scenarios.split(",")}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            token = await login(client)
+            client.headers["Authorization"] = f"Bearer {token}"
+            if args.warmup:
+                await run_workload(client, ctx, scenarios, args.warmup, args.concurrency, args.seed + 1)
+            report = await run_workload(client, ctx, scenarios, args.requests, args.concurrency, args.seed)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "backend": "in-memory" if args.in_memory else "mongod",
+            "products": args.products, "categories": args.categories,
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "scenarios": report,
+    }
+    print_table(report)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Result saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(result, baseline, args.threshold)
+        if problems:
+            print("❌ Regression detected:")
+            for p in problems:
+                print(f"   - {p}")
+            return 1
+        print("✅ No regression against baseline")
+    return 0
+
+
+def parse_args(argv=None):
+    argp = argparse.ArgumentParser(description="API benchmark")
+    argp.add_argument("--mongo-uri", dest="mongo_uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    argp.add_argument("--db", dest="db", default="pms_bench", help="database khusus benchmark (akan dikosongkan)")
+    argp.add_argument("--in-memory", dest="in_memory", action="store_true", help="pakai mongomock-motor")
+    argp.add_argument("--upload-dir", dest="upload_dir", default="", help="default: temp dir")
+    argp.add_argument("--categories", type=int, default=20)
+    argp.add_argument("--products", type=int, default=2000)
+    argp.add_argument("--requests", type=int, default=2000)
+    argp.add_argument("--warmup", type=int, default=100)
+    argp.add_argument("-c", "--concurrency", type=int, default=16)
+    argp.add_argument("--scenarios", default="", help="subset, pisahkan dengan koma")
+    argp.add_argument("--seed", type=int, default=42)
+    argp.add_argument("--out", default="", help="file JSON hasil")
+    argp.add_argument("--baseline", default="", help="file JSON baseline untuk dibandingkan")
+    argp.add_argument("--threshold", type=float, default=0.10, help="toleransi regresi relatif (0.10 = 10%%)")
+    return argp.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,77 @@
+"""
+Benchmark autocomplete: latency GET /products/autocomplete vs GET /products?search= (regex + count).
+Target: p95 autocomplete < 5 ms pada 1M produk (mongod lokal, index name_key).
+
+Contoh:
+    python -m benchmarks.bench_autocomplete --mongo-uri mongodb://localhost:27017 --products 1000000
+    python -m benchmarks.bench_autocomplete --in-memory --products 5000 --requests 300
+
+Mode --in-memory (mongomock) tidak punya index, jadi hanya untuk smoke test, bukan untuk target latency.
+"""
+import sys
+import time
+import random
+import asyncio
+
+import httpx
+
+from benchmarks.bench_api import API, setup_app, seed, login, percentile, parse_args as base_parse_args
+from app.core.config import settings
+from app.db.mongodb_config import init_indexes
+from app.seed_data import BASE_CATEGORIES, EXTRA_CATEGORIES, MATERIALS
+
+TARGET_P95_MS = 5.0
+
+
+def prefixes(rng: random.Random, n: int):
+    # ketikan realistis: 1-8 huruf pertama dari kosakata nama produk seed
+    words = [w.lower() for w in BASE_CATEGORIES + EXTRA_CATEGORIES + MATERIALS]
+    out = []
+    for _ in range(n):
+        word = rng.choice(words)
+        out.append(word[:rng.randint(1, min(8, len(word)))])
+    return out
+
+
+async def measure(client, path: str, params: list) -> dict:
+    latencies = []
+    for p in params:
+        t0 = time.perf_counter()
+        r = await client.get(path, params=p)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+    latencies.sort()
+    return {q: round(percentile(latencies, q), 3) for q in (50, 95, 99)}
+
+
+async def main(args) -> int:
+    # ukur jalur DB, bukan cache micro-TTL single-flight
+    settings.SINGLEFLIGHT_ENABLED = False
+    app, db = await setup_app(args)
+    await seed(db, args.categories, args.products, args.seed)
+    await init_indexes(db)
+
+    rng = random.Random(args.seed)
+    queries = prefixes(rng, args.requests)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            client.headers["Authorization"] = f"Bearer {await login(client)}"
+            await measure(client, f"{API}/products/autocomplete", [{"q": q} for q in queries[:args.warmup]])
+
+            auto = await measure(client, f"{API}/products/autocomplete", [{"q": q, "limit": 10} for q in queries])
+            # pembanding: cara lama type-ahead (regex /i + count + dokumen list)
+            search = await measure(client, f"{API}/products",
+                                   [{"search": q, "page_size": 10} for q in queries[:max(1, args.requests // 10)]])
+
+    print(f"{args.products:,} products, {args.requests} requests")
+    print(f"{'endpoint':<16}{'p50':>9}{'p95':>9}{'p99':>9}")
+    print(f"{'autocomplete':<16}{auto[50]:>9}{auto[95]:>9}{auto[99]:>9}")
+    print(f"{'search (list)':<16}{search[50]:>9}{search[95]:>9}{search[99]:>9}")
+    ok = auto[95] < TARGET_P95_MS
+    print(f"target p95 < {TARGET_P95_MS} ms: {'PASS' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(base_parse_args())))
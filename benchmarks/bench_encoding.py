@@ -0,0 +1,68 @@
+"""
+Benchmark trade-off ukuran vs latency per format response (JSON/MessagePack x identity/gzip/br/zstd).
+
+Contoh:
+    python -m benchmarks.bench_encoding --in-memory --products 2000 --requests 200
+"""
+import sys
+import time
+import asyncio
+
+import httpx
+
+from benchmarks.bench_api import API, setup_app, seed, login, percentile, parse_args as base_parse_args
+from app.core.encoding import COMPRESSORS, HAS_MSGPACK
+
+FORMATS = [
+    # (nama, Accept, Accept-Encoding)
+    ("json", "application/json", "identity"),
+    ("json+gzip", "application/json", "gzip"),
+    ("json+br", "application/json", "br"),
+    ("json+zstd", "application/json", "zstd"),
+    ("msgpack", "application/msgpack", "identity"),
+    ("msgpack+gzip", "application/msgpack", "gzip"),
+    ("msgpack+zstd", "application/msgpack", "zstd"),
+]
+
+
+async def measure(client, accept: str, accept_encoding: str, requests: int) -> dict:
+    latencies, sizes = [], []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        # ambil body mentah (tanpa decode) supaya ukuran = byte di wire
+        async with client.stream("GET", f"{API}/products", params={"page_size": 100, "fields": "*"},
+                                 headers={"Accept": accept, "Accept-Encoding": accept_encoding}) as r:
+            raw = b"".join([chunk async for chunk in r.aiter_raw()])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        sizes.append(len(raw))
+    latencies.sort()
+    return {
+        "bytes": round(sum(sizes) / len(sizes)),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+
+async def main(args) -> int:
+    app, db = await setup_app(args)
+    ctx = await seed(db, args.categories, args.products, args.seed)
+    formats = [
+        f for f in FORMATS
+        if (f[2] == "identity" or f[2] in COMPRESSORS) and (HAS_MSGPACK or "msgpack" not in f[1])
+    ]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            client.headers["Authorization"] = f"Bearer {await login(client)}"
+            print(f"{'format':<15}{'bytes':>10}{'ratio':>8}{'p50':>9}{'p95':>9}")
+            base = None
+            for name, accept, enc in formats:
+                r = await measure(client, accept, enc, args.requests)
+                base = base or r["bytes"]
+                print(f"{name:<15}{r['bytes']:>10}{r['bytes'] / base:>8.2f}{r['p50_ms']:>9}{r['p95_ms']:>9}")
+    return 0 if ctx else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(base_parse_args())))
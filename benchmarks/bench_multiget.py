@@ -0,0 +1,99 @@
+"""
+Benchmark multi-get: resolve N id produk dengan 1 x GET /products/batch?ids=... vs N x GET /products/{id}
+(berurutan, dan paralel seperti service cart/order yang fan-out).
+
+Contoh:
+    python -m benchmarks.bench_multiget --mongo-uri mongodb://localhost:27017 --products 20000 --ids 50
+    python -m benchmarks.bench_multiget --in-memory --products 2000 --requests 200 --ids 20
+
+"db_ops" = jumlah query Mongo per round (header Server-Timing); 0 di mode --in-memory.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.bench_api import API, _DB_OPS_RE, setup_app, seed, login, percentile, parse_args as base_parse_args
+from app.core.config import settings
+from app.db.mongodb_config import init_indexes
+
+
+def _db_ops(responses) -> int:
+    total = 0
+    for r in responses:
+        r.raise_for_status()
+        m = _DB_OPS_RE.search(r.headers.get("server-timing", ""))
+        total += int(m.group(1)) if m else 0
+    return total
+
+
+async def single_sequential(client, ids):
+    return [await client.get(f"{API}/products/{i}") for i in ids]
+
+
+async def single_parallel(client, ids):
+    return await asyncio.gather(*(client.get(f"{API}/products/{i}") for i in ids))
+
+
+async def batch(client, ids):
+    return [await client.get(f"{API}/products/batch", params={"ids": ",".join(ids)})]
+
+
+async def measure(client, fn, rounds) -> dict:
+    latencies, ops = [], 0
+    for ids in rounds:
+        t0 = time.perf_counter()
+        responses = await fn(client, ids)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ops += _db_ops(responses)
+    latencies.sort()
+    return {
+        **{q: round(percentile(latencies, q), 3) for q in (50, 95, 99)},
+        "db_ops": round(ops / len(rounds), 1),
+    }
+
+
+async def main(args) -> int:
+    # ukur jalur DB, bukan cache micro-TTL single-flight
+    settings.SINGLEFLIGHT_ENABLED = False
+    app, db = await setup_app(args)
+    ctx = await seed(db, args.categories, args.products, args.seed)
+    await init_indexes(db)
+
+    rng = random.Random(args.seed)
+    rounds = [rng.sample(ctx["product_ids"], args.ids) for _ in range(args.requests)]
+    variants = {
+        f"{args.ids} x single (seq)": single_sequential,
+        f"{args.ids} x single (par)": single_parallel,
+        "1 x batch": batch,
+    }
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            client.headers["Authorization"] = f"Bearer {await login(client)}"
+            results = {}
+            for name, fn in variants.items():
+                await measure(client, fn, rounds[:args.warmup] or rounds[:1])
+                results[name] = await measure(client, fn, rounds)
+
+    print(f"{args.products:,} products, {args.requests} rounds x {args.ids} ids")
+    print(f"{'variant':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'db_ops':>8}")
+    for name, r in results.items():
+        print(f"{name:<22}{r[50]:>9}{r[95]:>9}{r[99]:>9}{r['db_ops']:>8}")
+    return 0
+
+
+def parse_args(argv=None):
+    extra = argparse.ArgumentParser(add_help=False)
+    extra.add_argument("--ids", type=int, default=20, help="jumlah id per round")
+    ours, rest = extra.parse_known_args(argv)
+    args = base_parse_args(rest)
+    args.ids = min(ours.ids, settings.BATCH_GET_MAX_IDS)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,88 @@
+"""
+Benchmark cold start: waktu import app & time-to-first-request uvicorn (opsional multi-worker).
+
+Contoh (butuh mongod yang bisa diakses):
+    python -m benchmarks.bench_startup --mongo-uri mongodb://localhost:27017 --workers 4 --runs 5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+
+from app.core.config import settings
+
+PROBE_PATH = f"{settings.API_V1_STR}/categories/categories/select"  # endpoint publik yang menyentuh DB
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(runs: int) -> float:
+    code = "import time; t=time.perf_counter(); import app.main; print(time.perf_counter()-t)"
+    samples = [float(subprocess.check_output([sys.executable, "-c", code], text=True).strip().splitlines()[-1])
+               for _ in range(runs)]
+    return statistics.median(samples) * 1000
+
+
+def measure_first_request(env: dict, workers: int, timeout: float) -> float:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{PROBE_PATH}", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.01)
+        raise TimeoutError(f"server tidak merespons dalam {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main(argv=None) -> int:
+    argp = argparse.ArgumentParser(description="Startup benchmark")
+    argp.add_argument("--mongo-uri", dest="mongo_uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    argp.add_argument("--db", default="pms_bench")
+    argp.add_argument("--workers", type=int, default=1)
+    argp.add_argument("--runs", type=int, default=5)
+    argp.add_argument("--timeout", type=float, default=60)
+    argp.add_argument("--out", default="")
+    args = argp.parse_args(argv)
+
+    env = dict(os.environ, MONGODB_URI=args.mongo_uri, MONGODB_DB=args.db)
+    import_ms = measure_import(args.runs)
+    ttfr = [measure_first_request(env, args.workers, args.timeout) for _ in range(args.runs)]
+
+    result = {
+        "workers": args.workers,
+        "runs": args.runs,
+        "import_ms": round(import_ms, 1),
+        "time_to_first_request_ms": {
+            "first": round(ttfr[0], 1),  # run pertama = termasuk build index kalau versi berubah
+            "median": round(statistics.median(ttfr), 1),
+            "max": round(max(ttfr), 1),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
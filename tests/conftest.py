@@ -0,0 +1,116 @@
+"""
+Fixture bersama: app in-process di atas mongomock-motor (tanpa MongoDB sungguhan) dan folder
+upload sementara per test. Env di bawah di-set sebelum app di-import karena middleware dan
+mount /uploads ditentukan saat import.
+"""
+import os
+
+os.environ.setdefault("ADMISSION_ENABLED", "false")  # rate limit auth per IP mengganggu test berurutan
+os.environ.setdefault("UPLOAD_DELIVERY", "x-accel")  # /uploads lewat cek akses app, file dikirim stub proxy
+os.environ.setdefault("PRODUCT_EVENTS_FANOUT", "local")  # mongomock tidak punya capped collection
+os.environ.setdefault("UPLOAD_GC_ENABLED", "false")
+
+import threading
+
+import pytest
+
+from fastapi.testclient import TestClient
+from mongomock.collection import Collection
+from mongomock_motor import AsyncMongoMockClient
+from app.core.config import settings
+from app.core import storage
+from app.db import mongodb_config
+
+API = settings.API_V1_STR
+ADMIN = {"email": "admin@example.com", "password": "admin-pw"}
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(storage, "_storage", None)
+    return tmp_path / "uploads"
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(mongodb_config, "_client", client)
+    monkeypatch.setattr(mongodb_config, "_unique_ready", set())
+    monkeypatch.setattr(mongodb_config, "_unique_checked_at", {})
+    return client
+
+
+def make_client(asgi_app=None) -> TestClient:
+    from app.main import app
+    return TestClient(asgi_app or app)
+
+
+def login(client: TestClient, email: str, password: str) -> str:
+    r = client.post(f"{API}/auth/login", data={"username": email, "password": password})
+    assert r.status_code == 200, r.text
+    return r.json()["access_token"]
+
+
+def login_admin(client: TestClient) -> TestClient:
+    # user pertama yang register otomatis admin
+    client.post(f"{API}/auth/register", json=ADMIN)
+    client.headers["Authorization"] = f"Bearer {login(client, **ADMIN)}"
+    return client
+
+
+@pytest.fixture
+def client(upload_dir, mongo):
+    """
+    TestClient (lifespan jalan) yang sudah login sebagai admin.
+    """
+    with make_client() as c:
+        yield login_admin(c)
+
+
+# operasi collection yang masing-masing = 1 round-trip ke MongoDB sungguhan
+ROUND_TRIP_OPS = (
+    "find", "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "count_documents", "aggregate", "bulk_write", "distinct", "index_information",
+)
+
+
+class OpRecorder:
+    """
+    Catat operasi Mongo per collection (mongomock tidak mengirim command event, jadi dihitung di level
+    method Collection; panggilan bersarang di dalam mongomock tidak ikut dihitung).
+    """
+
+    def __init__(self):
+        self.ops = []
+        self._local = threading.local()
+
+    def wrap(self, name, fn):
+        recorder = self
+
+        def wrapper(coll, *args, **kwargs):
+            depth = getattr(recorder._local, "depth", 0)
+            if depth == 0:
+                recorder.ops.append(f"{coll.name}.{name}")
+            recorder._local.depth = depth + 1
+            try:
+                return fn(coll, *args, **kwargs)
+            finally:
+                recorder._local.depth = depth
+        return wrapper
+
+    def on(self, *collections):
+        # hanya collection bisnis: worker job / audit flusher jalan di background
+        return [op for op in self.ops if op.split(".", 1)[0] in collections]
+
+    def clear(self):
+        self.ops.clear()
+
+
+@pytest.fixture
+def db_ops(monkeypatch):
+    recorder = OpRecorder()
+    for name in ROUND_TRIP_OPS:
+        monkeypatch.setattr(Collection, name, recorder.wrap(name, getattr(Collection, name)))
+    return recorder
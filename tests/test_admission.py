@@ -0,0 +1,136 @@
+"""
+Admission control: rate limit per user/IP (429), batas concurrency per route class (503), Retry-After,
+IP client di belakang reverse proxy tepercaya.
+"""
+import asyncio
+import ipaddress
+
+import httpx
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionControlMiddleware, client_ip
+from app.core.config import settings
+
+LOGIN = f"{settings.API_V1_STR}/auth/login"
+PRODUCTS = f"{settings.API_V1_STR}/products"
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    def use(*networks):
+        monkeypatch.setattr(admission, "_TRUSTED_PROXIES", [ipaddress.ip_network(n) for n in networks])
+    return use
+
+
+def _scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"type": "http", "client": (peer, 5000), "headers": headers}
+
+
+def test_client_ip_ignores_forwarded_for_from_untrusted_peer(trusted):
+    trusted("10.0.0.0/8")
+    assert client_ip(_scope("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+
+
+def test_client_ip_through_trusted_proxies(trusted):
+    trusted("10.0.0.0/8", "127.0.0.1/32")
+    assert client_ip(_scope("127.0.0.1", "198.51.100.7")) == "198.51.100.7"
+    # hop paling kiri dipalsukan client; yang dipakai hop kanan pertama yang bukan proxy kita
+    assert client_ip(_scope("127.0.0.1", "6.6.6.6, 198.51.100.7, 10.1.2.3")) == "198.51.100.7"
+    # semua hop tepercaya -> hop paling kiri
+    assert client_ip(_scope("127.0.0.1", "10.9.9.9")) == "10.9.9.9"
+    assert client_ip(_scope("127.0.0.1")) == "127.0.0.1"
+
+
+def _post_logins(app, peer, forwarded_ips):
+    async def run():
+        transport = httpx.ASGITransport(app=app, client=(peer, 5000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as c:
+            return [(await c.post(LOGIN, headers={"X-Forwarded-For": ip})).status_code for ip in forwarded_ips]
+    return asyncio.run(run())
+
+
+def test_anonymous_rate_limit_per_forwarded_client(trusted, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMITS", "auth=0.001/2")
+    monkeypatch.setattr(settings, "ADMISSION_LIMITS", "")
+    trusted("127.0.0.1/32")
+    app = AdmissionControlMiddleware(ok_app)
+
+    # 2 client berbeda di belakang proxy yang sama: bucket masing-masing
+    assert _post_logins(app, "127.0.0.1", ["198.51.100.1"] * 3) == [200, 200, 429]
+    assert _post_logins(app, "127.0.0.1", ["198.51.100.2"] * 2) == [200, 200]
+
+    # tanpa proxy tepercaya semua request berbagi IP proxy
+    trusted()
+    app = AdmissionControlMiddleware(ok_app)
+    assert _post_logins(app, "127.0.0.1", ["198.51.100.1", "198.51.100.2", "198.51.100.3"]) == [200, 200, 429]
+
+
+def test_rate_limited_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMITS", "auth=0.5/1")
+    monkeypatch.setattr(settings, "ADMISSION_LIMITS", "")
+    app = AdmissionControlMiddleware(ok_app)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app, client=("198.51.100.1", 5000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as c:
+            return [await c.post(LOGIN) for _ in range(2)] + [await c.get(PRODUCTS)]
+
+    ok, limited, cheap = asyncio.run(run())
+    assert ok.status_code == 200
+    assert limited.status_code == 429 and limited.json() == {"detail": "Too many requests"}
+    # 1 token / 0.5 per detik -> 2 detik lagi
+    assert limited.headers["retry-after"] == "2"
+    assert cheap.status_code == 200  # request murah tidak dibatasi
+
+
+def _concurrent_list_requests(spec, n, monkeypatch):
+    """
+    n request list berat bersamaan; request pertama menahan slot sampai semua request lain selesai.
+    """
+    monkeypatch.setattr(settings, "RATE_LIMITS", "")
+    monkeypatch.setattr(settings, "ADMISSION_LIMITS", spec)
+    first_in, others_done, served = asyncio.Event(), asyncio.Event(), []
+
+    async def app(scope, receive, send):
+        served.append(scope["query_string"])
+        if not first_in.is_set():
+            first_in.set()
+            await others_done.wait()
+        await ok_app(scope, receive, send)
+
+    async def run():
+        transport = httpx.ASGITransport(app=AdmissionControlMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as c:
+            first = asyncio.create_task(c.get(PRODUCTS, params={"search": "meja", "n": 0}))
+            await first_in.wait()
+            others = [asyncio.create_task(c.get(PRODUCTS, params={"search": "meja", "n": i})) for i in range(1, n)]
+            # request yang antre baru bisa selesai setelah slot dilepas; yang ditolak selesai sendiri
+            done, _ = await asyncio.wait(others, timeout=0.3)
+            others_done.set()
+            return [await first] + [await t for t in others], len(done)
+
+    responses, finished_early = asyncio.run(run())
+    return responses, finished_early, served
+
+
+def test_queue_full_rejected_with_503(monkeypatch):
+    responses, _, served = _concurrent_list_requests("heavy_list=1/1/5", 3, monkeypatch)
+    assert [r.status_code for r in responses] == [200, 200, 503]
+    busy = responses[2]
+    assert busy.json() == {"detail": "Server busy, retry later"} and busy.headers["retry-after"] == "5"
+    # yang antre dilayani setelah slot dilepas (FIFO), yang ditolak tidak pernah sampai ke app
+    assert served == [b"search=meja&n=0", b"search=meja&n=1"]
+
+
+def test_queue_timeout_rejected_with_503(monkeypatch):
+    responses, finished_early, served = _concurrent_list_requests("heavy_list=1/4/0.05", 2, monkeypatch)
+    assert [r.status_code for r in responses] == [200, 503]
+    assert responses[1].headers["retry-after"] == "1"
+    assert finished_early == 1 and len(served) == 1
@@ -0,0 +1,146 @@
+"""
+Arsip produk (hot/cold): salinan arsip tidak boleh tertinggal untuk produk yang berubah atau dihapus
+di antara langkah salin & hapus archive_products.
+"""
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from mongomock.collection import Collection
+from mongomock_motor import AsyncMongoMockClient
+
+from app.archive import ARCHIVE_COLLECTION, archive_products
+
+
+def _old_inactive(**extra):
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+    return {"_id": ObjectId(), "name": "Lama", "status": "inactive", "updated_at": old, **extra}
+
+
+def _run_with_hook(monkeypatch, hook):
+    # hook jalan tepat setelah salinan arsip ditulis (sebelum hapus dari products)
+    original = Collection.bulk_write
+
+    def bulk_write(coll, *args, **kwargs):
+        result = original(coll, *args, **kwargs)
+        if coll.name == ARCHIVE_COLLECTION:
+            hook(coll.database)
+        return result
+
+    monkeypatch.setattr(Collection, "bulk_write", bulk_write)
+
+
+def test_archive_moves_products():
+    db = AsyncMongoMockClient()["t"]
+
+    async def run():
+        docs = [_old_inactive() for _ in range(3)] + [_old_inactive(status="active")]
+        await db.products.insert_many(docs)
+        report = await archive_products(db, older_than_days=90)
+        return report, await db.products.count_documents({}), await db[ARCHIVE_COLLECTION].count_documents({})
+
+    report, hot, cold = asyncio.run(run())
+    assert (report["archived"], report["skipped"], hot, cold) == (3, 0, 1, 3)
+
+
+def test_batch_moves_in_constant_round_trips(db_ops):
+    db = AsyncMongoMockClient()["t"]
+
+    async def run():
+        await db.products.insert_many([_old_inactive() for _ in range(250)])
+        db_ops.clear()
+        return await archive_products(db, older_than_days=90, batch_size=100)
+
+    report = asyncio.run(run())
+    assert report["archived"] == 250
+    batch = ["products.find", f"{ARCHIVE_COLLECTION}.bulk_write", "products.delete_many"]
+    assert db_ops.on("products", ARCHIVE_COLLECTION) == batch * 3 + ["products.find"]
+
+
+def test_product_deleted_during_archive_leaves_no_copy(client, mongo, monkeypatch):
+    from tests.conftest import API
+    from app.core.config import settings
+
+    db = mongo[settings.MONGODB_DB]
+    doomed, kept = _old_inactive(), _old_inactive()
+    # user menghapus produk lewat API tepat setelah archiver menyalinnya
+    _run_with_hook(monkeypatch, lambda _: client.delete(f"{API}/products/{doomed['_id']}").raise_for_status())
+
+    async def run():
+        await db.products.insert_many([doomed, kept])
+        report = await archive_products(db, older_than_days=90)
+        return report, [d["_id"] async for d in db[ARCHIVE_COLLECTION].find({}, {"_id": 1})]
+
+    report, archived = asyncio.run(run())
+    assert archived == [kept["_id"]]
+    assert (report["archived"], report["skipped"]) == (1, 1)
+
+
+def test_product_changed_during_archive_stays_hot(monkeypatch):
+    db = AsyncMongoMockClient()["t"]
+    doc = _old_inactive()
+    _run_with_hook(monkeypatch, lambda sync_db: sync_db.products.update_one(
+        {"_id": doc["_id"]}, {"$set": {"status": "active", "updated_at": datetime.now(timezone.utc)}}))
+
+    async def run():
+        await db.products.insert_one(doc)
+        await archive_products(db, older_than_days=90)
+        return await db.products.count_documents({}), await db[ARCHIVE_COLLECTION].count_documents({})
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_delete_category_in_use_by_archived_product(client, mongo):
+    from tests.conftest import API
+    from app.core.config import settings
+
+    category_id = client.post(f"{API}/categories/categories", json={"name": "Kursi"}).json()["category"]["_id"]
+    archive = mongo[settings.MONGODB_DB][ARCHIVE_COLLECTION]
+    doc = _old_inactive(category_id=ObjectId(category_id))
+    asyncio.run(archive.insert_one(doc))
+
+    r = client.delete(f"{API}/categories/categories/{category_id}")
+    assert r.status_code == 400, r.text
+
+    asyncio.run(archive.delete_one({"_id": doc["_id"]}))
+    assert client.delete(f"{API}/categories/categories/{category_id}").status_code == 200
+
+
+def _archived_product(client, mongo):
+    from tests.conftest import API
+    from app.core.config import settings
+
+    r = client.post(f"{API}/products", data={"name": "Rak", "price": "10", "status": "inactive"})
+    product_id, etag = r.json()["product"]["_id"], r.headers["ETag"]
+    db = mongo[settings.MONGODB_DB]
+
+    async def move():
+        doc = await db.products.find_one_and_delete({"_id": ObjectId(product_id)})
+        await db[ARCHIVE_COLLECTION].insert_one(doc)
+
+    asyncio.run(move())
+    return db, product_id, etag
+
+
+def _tiers(db, product_id):
+    async def count():
+        cond = {"_id": ObjectId(product_id)}
+        return await db.products.count_documents(cond), await db[ARCHIVE_COLLECTION].count_documents(cond)
+    return asyncio.run(count())
+
+
+def test_failed_write_does_not_restore_archived_product(client, mongo):
+    from tests.conftest import API
+
+    db, product_id, etag = _archived_product(client, mongo)
+    r = client.put(f"{API}/products/{product_id}", data={"stock": "3"}, headers={"If-Match": '"999"'})
+    assert r.status_code == 412, r.text
+    # tidak ada gambar untuk dihapus -> 404, juga tanpa restore
+    assert client.delete(f"{API}/products/{product_id}/images").status_code == 404
+    assert _tiers(db, product_id) == (0, 1)
+
+    r = client.put(f"{API}/products/{product_id}", data={"stock": "3"}, headers={"If-Match": etag})
+    assert r.status_code == 200, r.text
+    assert r.json()["product"]["stock"] == 3
+    assert _tiers(db, product_id) == (1, 0)
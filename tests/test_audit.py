@@ -0,0 +1,113 @@
+"""
+Audit log: antrean in-memory + flusher batch (sisa antrean di-flush saat shutdown), backpressure,
+dan filter endpoint GET /audit.
+"""
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from tests.conftest import API
+from app.core.audit import AUDIT_COLLECTION, AUDIT_EVENTS, AuditLog, audit_log, set_actor
+from app.core.config import settings
+
+
+@pytest.fixture
+def slow_flush(monkeypatch):
+    # flusher tidak sempat menulis sendiri selama test: batch besar, interval panjang
+    monkeypatch.setattr(settings, "AUDIT_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_INTERVAL_MS", 60_000)
+
+
+def test_queue_flushed_on_shutdown(slow_flush):
+    db = AsyncMongoMockClient()["t"]
+    actor = ObjectId()
+
+    async def run():
+        log = AuditLog()
+        log.start(db)
+        set_actor({"_id": actor, "role": "admin"})
+        for i in range(8):
+            assert await log.record("product.update", "products", i, {"price": {"from": i, "to": i + 1}})
+        await asyncio.sleep(0.01)  # flusher menulis batch yang penuh, 2 event terakhir menunggu interval
+        written = await db[AUDIT_COLLECTION].count_documents({})
+        await log.stop()
+        assert await log.record("product.update", "products", 99) is False  # sudah berhenti
+        return written, await db[AUDIT_COLLECTION].find({}, {"_id": 0}).to_list(None)
+
+    written, events = asyncio.run(run())
+    assert written == 6
+    # sisa batch yang sedang dikumpulkan + antrean ikut ditulis, urutan terjaga
+    assert [e["meta"]["entity_id"] for e in events] == list(range(8))
+    assert events[0]["meta"] == {"entity": "products", "entity_id": 0, "actor_id": actor}
+    assert (events[0]["action"], events[0]["actor_role"]) == ("product.update", "admin")
+
+
+def test_full_queue_drops_events(slow_flush, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "AUDIT_ENQUEUE_TIMEOUT_MS", 20)
+
+    async def run():
+        log = AuditLog()
+        log.db = AsyncMongoMockClient()["t"]
+        log._queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)  # tanpa flusher
+        return [await log.record("user.update", "users", i) for i in range(3)]
+
+    dropped = AUDIT_EVENTS.get("dropped")
+    assert asyncio.run(run()) == [True, True, False]
+    assert AUDIT_EVENTS.get("dropped") - dropped == 1
+
+
+def _events(client, **params):
+    r = client.get(f"{API}/audit", params=params)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+@pytest.fixture
+def trail(client, mongo):
+    """
+    Beberapa perubahan lewat API lalu flush (stop flusher) supaya semua event sudah tertulis.
+    """
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    other = client.post(f"{API}/products", data={"name": "Kursi", "price": "5"}).json()["product"]["_id"]
+    assert client.put(f"{API}/products/{pid}", data={"price": "12"}).status_code == 200
+    cid = client.post(f"{API}/categories/categories", json={"name": "Jati"}).json()["category"]["_id"]
+    admin = client.get(f"{API}/users/me").json()["user"]["_id"]
+    client.portal.call(audit_log.stop)
+    # event dari user lain, 2 hari lalu
+    asyncio.run(mongo[settings.MONGODB_DB][AUDIT_COLLECTION].insert_one({
+        "ts": datetime.now(timezone.utc) - timedelta(days=2), "action": "product.update",
+        "meta": {"entity": "products", "entity_id": ObjectId(pid), "actor_id": ObjectId()},
+        "actor_role": "admin", "changes": {},
+    }))
+    return {"product": pid, "other": other, "category": cid, "admin": admin}
+
+
+def test_query_filters(client, trail):
+    pid = trail["product"]
+    body = _events(client, entity="products", entity_id=pid)
+    assert body["meta"]["total"] == 3
+    # terbaru dulu, meta diratakan ke event
+    latest = body["items"][0]
+    assert (latest["action"], latest["entity"], latest["entity_id"]) == ("product.update", "products", pid)
+    assert latest["changes"]["price"] == {"from": 10, "to": 12} and latest["actor_id"] == trail["admin"]
+    assert [e["action"] for e in body["items"]] == ["product.update", "product.create", "product.update"]
+
+    assert _events(client, actor_id=trail["admin"])["meta"]["total"] == 4
+    assert [e["entity_id"] for e in _events(client, action="category.create")["items"]] == [trail["category"]]
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    assert _events(client, entity="products", entity_id=pid, since=since)["meta"]["total"] == 2
+    assert _events(client, entity="products", until=since)["meta"]["total"] == 1
+
+    page = _events(client, entity="products", page=2, page_size=2)
+    assert page["meta"] == {"total": 4, "page": 2, "page_size": 2, "pages": 2} and len(page["items"]) == 2
+
+
+def test_query_validation(client, trail):
+    assert client.get(f"{API}/audit", params={"entity_id": trail["product"]}).status_code == 400
+    assert client.get(f"{API}/audit", params={"actor_id": "nope"}).status_code == 400
+    assert client.get(f"{API}/audit", params={"entity": "orders"}).status_code == 422
@@ -0,0 +1,121 @@
+"""
+AUTH_STATELESS: role/status di claim access token, jadi perubahan di DB baru berlaku setelah refresh —
+paling lambat 1 umur access token (STATELESS_ACCESS_TOKEN_MINUTES).
+"""
+import asyncio
+import time
+
+import jwt
+import pytest
+from bson import ObjectId
+
+from tests.conftest import API, ADMIN, login
+from app.core import security
+from app.core.config import settings
+
+USER = {"email": "budi@example.com", "password": "budi-pw"}
+
+
+@pytest.fixture
+def stateless(client, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    client.headers["Authorization"] = f"Bearer {login(client, **ADMIN)}"
+    r = client.post(f"{API}/users", data=USER)
+    assert r.status_code == 200, r.text
+    return r.json()["user"]["_id"]
+
+
+def _login(client, ago=0):
+    # token diterbitkan `ago` detik yang lalu
+    now = time.time()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(security.time, "time", lambda: now - ago)
+        r = client.post(f"{API}/auth/login", data={"username": USER["email"], "password": USER["password"]})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _get(client, token, path="/users"):
+    return client.get(f"{API}{path}", headers={"Authorization": f"Bearer {token}"})
+
+
+def _set_user(mongo, user_id, **fields):
+    users = mongo[settings.MONGODB_DB].users
+    asyncio.run(users.update_one({"_id": ObjectId(user_id)}, {"$set": fields}))
+
+
+def test_token_lifetime_is_bounded(stateless, client):
+    tokens = _login(client)
+    payload = jwt.decode(tokens["access_token"], options={"verify_signature": False})
+    assert payload["role"] == "user"
+    assert payload["exp"] - payload["iat"] == settings.STATELESS_ACCESS_TOKEN_MINUTES * 60
+    assert "refresh_token" in tokens
+
+
+def test_role_change_applies_after_refresh(stateless, client, mongo):
+    tokens = _login(client)
+    assert _get(client, tokens["access_token"]).status_code == 403
+
+    _set_user(mongo, stateless, role="admin")
+    # token lama masih membawa role lama sampai habis / di-refresh
+    assert _get(client, tokens["access_token"]).status_code == 403
+
+    r = client.post(f"{API}/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200, r.text
+    assert r.json()["role"] == "admin"
+    assert _get(client, r.json()["access_token"]).status_code == 200
+
+
+def test_demotion_effective_within_one_token_lifetime(stateless, client, mongo):
+    _set_user(mongo, stateless, role="admin")
+    lifetime = settings.STATELESS_ACCESS_TOKEN_MINUTES * 60
+    recent = _login(client, ago=lifetime - 30)
+    expired = _login(client, ago=lifetime + 1)
+
+    _set_user(mongo, stateless, role="user")
+    # token admin yang masih dalam umurnya tetap lolos (batas basi yang didokumentasikan) ...
+    assert _get(client, recent["access_token"]).status_code == 200
+    # ... tapi tidak ada yang lolos lewat 1 umur token; refresh membaca role baru dari DB
+    assert _get(client, expired["access_token"]).status_code == 401
+    r = client.post(f"{API}/auth/refresh", json={"refresh_token": recent["refresh_token"]})
+    assert r.status_code == 200, r.text
+    assert r.json()["role"] == "user"
+    assert _get(client, r.json()["access_token"]).status_code == 403
+
+
+def test_deactivated_user_cannot_refresh(stateless, client):
+    tokens = _login(client)
+    r = client.put(f"{API}/users/{stateless}", data={"status": "inactive"})
+    assert r.status_code == 200, r.text
+
+    r = client.post(f"{API}/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+    # refresh token sekali pakai (rotasi)
+    r = client.post(f"{API}/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.json()["detail"] == "Refresh token already used"
+
+
+def test_logout_revokes_refresh_token(stateless, client):
+    tokens = _login(client)
+    r = client.post(f"{API}/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200, r.text
+
+    r = client.post(f"{API}/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+    # access token stateless tidak dicek ke DB: tetap berlaku sampai exp
+    assert _get(client, tokens["access_token"], "/users/me").status_code == 200
+
+
+def test_logout_rejects_invalid_token(stateless, client):
+    assert client.post(f"{API}/auth/logout", json={"refresh_token": "x.y.z"}).status_code == 401
+    # access token bukan refresh token
+    tokens = _login(client)
+    r = client.post(f"{API}/auth/logout", json={"refresh_token": tokens["access_token"]})
+    assert r.status_code == 401
+
+
+def test_logout_revokes_access_token_in_db_mode(client):
+    token = client.headers["Authorization"].split()[1]
+    assert client.get(f"{API}/users/me").status_code == 200
+    assert client.post(f"{API}/auth/logout", json={"token": token}).status_code == 200
+    assert client.get(f"{API}/users/me").status_code == 401
@@ -0,0 +1,81 @@
+"""
+Multi-get GET /{resource}/batch?ids=: 1 query $in, urutan mengikuti `ids`, id yang tidak ada di `missing`.
+"""
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from tests.conftest import API
+from app.archive import ARCHIVE_COLLECTION
+from app.core.config import settings
+
+
+@pytest.fixture
+def pids(client):
+    return [client.post(f"{API}/products", data={"name": name, "price": "10"}).json()["product"]["_id"]
+            for name in ("Meja", "Kursi", "Lemari")]
+
+
+def _batch(client, path, ids, **params):
+    r = client.get(f"{API}/{path}/batch", params={"ids": ",".join(ids), **params})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_products_keep_input_order_and_report_missing(client, pids, db_ops):
+    missing = str(ObjectId())
+    db_ops.clear()
+    body = _batch(client, "products", [pids[2], missing, pids[0], pids[2]], fields="name")
+    # duplikat dibuang, urutan sesuai input
+    assert body["items"] == [{"_id": pids[2], "name": "Lemari"}, {"_id": pids[0], "name": "Meja"}]
+    assert body["missing"] == [missing]
+    # id yang tidak ada di products dicari sekali di arsip
+    assert db_ops.on("products", "products_archive") == ["products.find", "products_archive.find"]
+
+
+def test_products_all_found_in_one_query(client, pids, db_ops):
+    db_ops.clear()
+    body = _batch(client, "products", list(reversed(pids)))
+    assert [p["name"] for p in body["items"]] == ["Lemari", "Kursi", "Meja"] and body["missing"] == []
+    assert db_ops.on("products", "products_archive") == ["products.find"]
+    # tanpa fields= sama dengan detail
+    assert body["items"][0] == client.get(f"{API}/products/{pids[2]}").json()
+
+
+def test_products_include_archived(client, pids, mongo):
+    db = mongo[settings.MONGODB_DB]
+
+    async def archive(pid):
+        doc = await db.products.find_one_and_delete({"_id": ObjectId(pid)})
+        await db[ARCHIVE_COLLECTION].insert_one(doc)
+
+    asyncio.run(archive(pids[1]))
+    body = _batch(client, "products", pids, fields="name")
+    assert [p["name"] for p in body["items"]] == ["Meja", "Kursi", "Lemari"] and body["missing"] == []
+
+
+def test_invalid_and_too_many_ids(client, pids, monkeypatch):
+    r = client.get(f"{API}/products/batch", params={"ids": f"{pids[0]},nope"})
+    assert r.status_code == 400 and "nope" in r.json()["detail"]
+    assert client.get(f"{API}/products/batch", params={"ids": " , "}).status_code == 400
+
+    monkeypatch.setattr(settings, "BATCH_GET_MAX_IDS", 2)
+    r = client.get(f"{API}/products/batch", params={"ids": ",".join(pids)})
+    assert r.status_code == 400 and r.json()["detail"] == "Too many ids (max 2)"
+
+
+def test_users_and_categories(client):
+    uid = client.post(f"{API}/users", data={"email": "budi@example.com", "password": "x"}).json()["user"]["_id"]
+    me = client.get(f"{API}/users/me").json()["user"]["_id"]
+    missing = str(ObjectId())
+    body = _batch(client, "users", [uid, missing, me])
+    assert [u["email"] for u in body["items"]] == ["budi@example.com", "admin@example.com"]
+    assert body["missing"] == [missing]
+    assert not {"hashed_password", "search_keys", "email_key"} & set(body["items"][0])
+
+    cids = [client.post(f"{API}/categories/categories", json={"name": n}).json()["category"]["_id"]
+            for n in ("Meja", "Kursi")]
+    body = _batch(client, "categories/categories", [cids[1], missing, cids[0]], fields="name")
+    assert body == {"items": [{"_id": cids[1], "name": "Kursi"}, {"_id": cids[0], "name": "Meja"}],
+                    "missing": [missing]}
@@ -0,0 +1,235 @@
+"""
+RedisCache + ResultCache di atas server RESP palsu (asyncio, in-process): protokol, lock SET NX
+anti-stampede, invalidasi generasi, dan fail-open saat server mati.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.cache import RedisCache, RedisError, ResultCache
+
+
+class FakeRedis:
+    """
+    Server RESP minimal: GET / SET [PX|EX] [NX] / DEL / INCR / AUTH / SELECT, TTL dicek saat dibaca.
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}  # key -> (value, expire_at | None)
+        self.commands = []
+        self.connections = 0
+        self.selected = []
+        self.server = None
+        self.clients = {}  # handler task -> writer
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{port}/3"
+
+    async def stop(self):
+        self.server.close()
+        # tutup koneksi client (pool) -> handler selesai normal lewat EOF, bukan di-cancel
+        for writer in self.clients.values():
+            writer.close()
+        await asyncio.gather(*self.clients)
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*", line
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self.clients[asyncio.current_task()] = writer
+        authed = self.password is None
+        try:
+            while (args := await self._read_command(reader)) is not None:
+                cmd = args[0].decode().upper()
+                self.commands.append(cmd)
+                if cmd == "AUTH":
+                    authed = args[1].decode() == self.password
+                    reply = b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n"
+                elif not authed:
+                    reply = b"-NOAUTH Authentication required.\r\n"
+                else:
+                    reply = self._dispatch(cmd, args[1:])
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def _live(self, key):
+        value, expire_at = self.data.get(key, (None, None))
+        if expire_at is not None and expire_at <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def _dispatch(self, cmd, args):
+        if cmd == "SELECT":
+            self.selected.append(int(args[0]))
+            return b"+OK\r\n"
+        if cmd == "GET":
+            value = self._live(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if cmd == "SET":
+            key, value, opts = args[0], args[1], [a.decode().upper() for a in args[2:]]
+            if "NX" in opts and self._live(key) is not None:
+                return b"$-1\r\n"
+            ttl = None
+            if "PX" in opts:
+                ttl = int(opts[opts.index("PX") + 1]) / 1000
+            elif "EX" in opts:
+                ttl = int(opts[opts.index("EX") + 1])
+            self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+            return b"+OK\r\n"
+        if cmd == "DEL":
+            n = sum(self.data.pop(k, None) is not None for k in args)
+            return b":%d\r\n" % n
+        if cmd == "INCR":
+            n = int(self._live(args[0]) or 0) + 1
+            _, expire_at = self.data.get(args[0], (None, None))
+            self.data[args[0]] = (str(n).encode(), expire_at)
+            return b":%d\r\n" % n
+        return b"-ERR unknown command '%s'\r\n" % cmd.encode()
+
+
+def run(coro_fn, **server_kwargs):
+    async def main():
+        server = FakeRedis(**server_kwargs)
+        url = await server.start()
+        try:
+            return await coro_fn(server, url)
+        finally:
+            if server.server.is_serving():
+                await server.stop()
+    return asyncio.run(main())
+
+
+def test_resp_commands_and_connection_setup():
+    async def scenario(server, url):
+        r = RedisCache(url)
+        assert await r.get("k") is None
+        await r.set("k", b"v\r\nwith crlf", ttl=10)
+        assert await r.get("k") == b"v\r\nwith crlf"
+        assert await r.add("k", b"other", ttl=10) is False
+        assert await r.add("n", b"1", ttl=10) is True
+        await r.delete("k")
+        assert await r.get("k") is None
+        assert await r.get_counter("gen") == 0
+        assert [await r.incr("gen") for _ in range(3)] == [1, 2, 3]
+        assert await r.get_counter("gen") == 3
+        # AUTH + SELECT sekali per koneksi, koneksi dipakai ulang lewat pool
+        assert server.connections == 1
+        assert server.commands[:2] == ["AUTH", "SELECT"] and server.selected == [3]
+
+    run(scenario, password="s3cret")
+
+
+def test_px_ttl_expires():
+    async def scenario(server, url):
+        r = RedisCache(url)
+        assert await r.add("lock", b"1", ttl=0.05) is True
+        assert await r.add("lock", b"1", ttl=0.05) is False
+        await asyncio.sleep(0.08)
+        assert await r.add("lock", b"1", ttl=0.05) is True
+
+    run(scenario)
+
+
+def test_error_reply_raises_and_drops_connection():
+    async def scenario(server, url):
+        r = RedisCache(url)
+        with pytest.raises(RedisError, match="unknown command"):
+            await r.execute("FLUSHALL")
+        assert await r.get("k") is None
+        assert server.connections == 2
+
+    run(scenario)
+
+
+def test_wrong_password_raises():
+    async def scenario(server, url):
+        r = RedisCache(url.replace("s3cret", "nope"))
+        with pytest.raises(RedisError, match="WRONGPASS"):
+            await r.get("k")
+
+    run(scenario, password="s3cret")
+
+
+def test_get_or_compute_hit_miss_and_invalidation():
+    async def scenario(server, url):
+        cache = ResultCache(RedisCache(url), ttl=30)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"items": [len(calls)]}
+
+        assert await cache.get_or_compute("products", {"page": 1}, compute) == {"items": [1]}
+        assert await cache.get_or_compute("products", {"page": 1}, compute) == {"items": [1]}
+        assert len(calls) == 1
+        assert await cache.generation("products") == 0
+
+        await cache.bump("products")
+        assert await cache.generation("products") == 1
+        assert await cache.get_or_compute("products", {"page": 1}, compute) == {"items": [2]}
+        # lock dilepas setelah hitung ulang
+        assert not [k for k in server.data if k.endswith(b":lock")]
+
+    run(scenario)
+
+
+def test_stampede_computes_once():
+    async def scenario(server, url):
+        cache = ResultCache(RedisCache(url), ttl=30)
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {"total": 42}
+
+        results = await asyncio.gather(*(cache.get_or_compute("products", {"q": "meja"}, slow) for _ in range(10)))
+        assert results == [{"total": 42}] * 10
+        assert len(calls) == 1
+        # 10x SET NX untuk lock (1 menang) + 1x simpan hasil; sisanya menunggu via GET
+        assert server.commands.count("SET") == 11
+
+    run(scenario)
+
+
+def test_fail_open_when_server_down():
+    async def scenario(server, url):
+        await server.stop()
+        cache = ResultCache(RedisCache(url, timeout=0.2), ttl=30, retry_after=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"ok": True}
+
+        assert await cache.get_or_compute("products", {}, compute) == {"ok": True}
+        # selama retry_after: langsung ke Mongo tanpa mencoba konek lagi
+        started = time.monotonic()
+        assert await cache.get_or_compute("products", {}, compute) == {"ok": True}
+        assert time.monotonic() - started < 0.05
+        assert len(calls) == 2
+        assert await cache.generation("products") is None
+        await cache.bump("products")  # hanya warning
+
+    run(scenario)
@@ -0,0 +1,99 @@
+"""
+Email user & nama kategori unik case-insensitive: sebelum index ber-collation siap, dicek lewat find_one
+dengan collation; sesudahnya DuplicateKeyError dari index -> 400 tanpa query tambahan.
+"""
+import asyncio
+import re
+
+import pytest
+from mongomock.collection import Collection
+
+from tests.conftest import API, ADMIN
+from app.core.config import settings
+from app.db import mongodb_config
+from app.db.mongodb_config import CI_COLLATION
+from app.migrations import case_insensitive_unique
+
+
+@pytest.fixture
+def no_ci_index(client, mongo, monkeypatch):
+    """
+    Kondisi sebelum index unik ber-collation selesai dibangun (mongomock membuatnya case-sensitive).
+    mongomock juga mengabaikan collation, jadi kesetaraan string di find_one(collation=CI_COLLATION)
+    disamakan dengan strength 2 (beda huruf besar/kecil dianggap sama).
+    """
+    db = mongo[settings.MONGODB_DB]
+    asyncio.run(db.users.drop_index("email_ci_unique"))
+    asyncio.run(db.categories.drop_index("name_ci_unique"))
+    monkeypatch.setattr(mongodb_config, "_unique_ready", set())
+    monkeypatch.setattr(mongodb_config, "_unique_checked_at", {})
+    find_one = Collection.find_one
+
+    def find_one_ci(coll, filter=None, *args, **kwargs):
+        if kwargs.get("collation") == CI_COLLATION:
+            filter = {k: re.compile(f"^{re.escape(v)}$", re.IGNORECASE) if isinstance(v, str) else v
+                      for k, v in (filter or {}).items()}
+        return find_one(coll, filter, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, "find_one", find_one_ci)
+    return db
+
+
+def _category(client, name):
+    return client.post(f"{API}/categories/categories", json={"name": name})
+
+
+def test_register_case_variant_email_rejected(client, no_ci_index):
+    r = client.post(f"{API}/auth/register", json={"email": "  ADMIN@Example.COM ", "password": "x"})
+    assert r.status_code == 400 and r.json()["detail"] == "Email already registered"
+
+    r = client.post(f"{API}/auth/register", json={"email": " Budi@Example.com ", "password": "x"})
+    assert r.status_code == 200 and r.json()["user"]["email"] == "Budi@Example.com"
+
+
+def test_create_user_case_variant_email_rejected(client, no_ci_index):
+    r = client.post(f"{API}/users", data={"email": ADMIN["email"].upper(), "password": "x"})
+    assert r.status_code == 400 and r.json()["detail"] == "Email already exists"
+
+
+def test_category_case_variant_name_rejected(client, no_ci_index):
+    assert _category(client, "Meja").status_code == 200
+    r = _category(client, "  mEJA ")
+    assert r.status_code == 400 and r.json()["detail"] == "Category name already exists"
+
+    other = _category(client, "Kursi").json()["category"]["_id"]
+    assert client.put(f"{API}/categories/categories/{other}", json={"name": "MEJA"}).status_code == 400
+    # ganti huruf besar/kecil nama sendiri boleh
+    r = client.put(f"{API}/categories/categories/{other}", json={"name": "KURSI"})
+    assert r.status_code == 200 and r.json()["category"]["name"] == "KURSI"
+
+
+def test_duplicate_key_from_index_returns_400(client, db_ops):
+    # index sudah ada: tanpa pre-check, index yang menolak
+    assert _category(client, "Meja").status_code == 200
+    db_ops.clear()
+    r = _category(client, "Meja")
+    assert r.status_code == 400 and r.json()["detail"] == "Category name already exists"
+    assert db_ops.on("categories") == ["categories.insert_one"]
+
+    r = client.post(f"{API}/auth/register", json={"email": ADMIN["email"], "password": "x"})
+    assert r.status_code == 400 and r.json()["detail"] == "Email already registered"
+
+
+def test_migration_requires_resolving_case_duplicates(mongo, capsys):
+    db = mongo["t"]
+
+    async def run():
+        await db.users.insert_many([{"email": "Budi@x.com"}, {"email": "budi@X.com"}, {"email": "ani@x.com"}])
+        await db.categories.insert_many([{"name": " Meja "}, {"name": "Kursi"}])
+        await db.users.create_index("email", unique=True)  # index lama, case-sensitive
+        with pytest.raises(RuntimeError, match="1 case-insensitive duplicate"):
+            await case_insensitive_unique(db)
+        await db.users.delete_one({"email": "budi@X.com"})
+        await case_insensitive_unique(db)
+        return await db.categories.distinct("name"), await db.users.index_information()
+
+    names, indexes = asyncio.run(run())
+    assert "[WARN] users.email duplicate (beda huruf besar/kecil): 'budi@x.com' x2" in capsys.readouterr().out
+    assert sorted(names) == ["Kursi", "Meja"]
+    assert "email_ci_unique" in indexes and "email_1" not in indexes
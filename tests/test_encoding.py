@@ -0,0 +1,78 @@
+"""
+Negosiasi response: kompresi zstd/br/gzip dari Accept-Encoding (q-value + preferensi server) dan
+MessagePack dari Accept, termasuk header Vary untuk cache di depan API.
+"""
+import msgpack
+import pytest
+from bson import ObjectId
+
+from tests.conftest import API
+from app.core.config import settings
+from app.core.encoding import choose_encoding
+
+
+@pytest.fixture
+def c(client, monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_SIZE", 200)
+    for i in range(5):
+        r = client.post(f"{API}/products", data={"name": f"Meja {i}", "price": "10", "description": "kayu jati " * 10})
+        assert r.status_code == 200, r.text
+    return client
+
+
+def _get(c, **headers):
+    return c.get(f"{API}/products", headers={"Accept-Encoding": "identity", **headers})
+
+
+def _vary(r) -> set:
+    return {v.strip() for v in r.headers.get("vary", "").split(",") if v.strip()}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compressed_body_matches_plain(c, encoding):
+    plain = _get(c)
+    assert "content-encoding" not in plain.headers
+
+    r = _get(c, **{"Accept-Encoding": encoding})
+    assert r.headers["content-encoding"] == encoding
+    assert int(r.headers["content-length"]) < len(plain.content)
+    assert "Accept-Encoding" in _vary(r)
+    assert r.json() == plain.json()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br, zstd", "zstd"),  # seri -> urutan preferensi server
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("zstd;q=0, br;q=0.4, gzip;q=0.2", "br"),
+    ("*", "zstd"),
+    ("*;q=0.5, gzip", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_small_response_not_compressed(c):
+    r = c.get(f"{API}/products/{ObjectId()}", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 404 and len(r.content) < settings.COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in r.headers
+
+
+def test_msgpack_negotiation(c):
+    plain = _get(c)
+    r = _get(c, Accept="application/msgpack")
+    assert r.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(r.content, raw=False) == plain.json()
+    assert "Accept" in _vary(r) and "Accept" in _vary(plain)
+
+    # JSON lebih disukai -> tetap JSON
+    r = _get(c, Accept="application/json, application/msgpack;q=0.5")
+    assert r.headers["content-type"] == "application/json"
+
+
+def test_msgpack_and_compression_vary_on_both(c):
+    r = _get(c, Accept="application/msgpack", **{"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["content-type"] == "application/msgpack"
+    assert _vary(r) == {"Accept", "Accept-Encoding"}
+    assert msgpack.unpackb(r.content, raw=False)["items"]
@@ -0,0 +1,151 @@
+"""
+SSE perubahan produk: replay setelah Last-Event-ID dari ring buffer, event `reset` kalau id sudah
+terlalu lama, client lambat diputus, dan event dari write API.
+"""
+import asyncio
+import json
+
+from collections import deque
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from tests.conftest import API
+from app.core import events
+from app.core.config import settings
+from app.core.events import SSE_DROPPED, ProductEventBroker
+
+
+@pytest.fixture
+def sse(monkeypatch):
+    monkeypatch.setattr(settings, "SSE_REPLAY_SIZE", 3)
+    monkeypatch.setattr(settings, "SSE_CLIENT_BUFFER", 2)
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 5)
+    return ProductEventBroker()
+
+
+def _event(product_id=None, stock=1):
+    return {"_id": ObjectId(), "type": "product.update", "product_id": product_id or ObjectId(),
+            "ts": datetime.now(timezone.utc), "changes": {"stock": {"from": 0, "to": stock}}, "stock": stock}
+
+
+def _id(frame: bytes) -> str:
+    return frame.split(b"\n", 1)[0].decode()[len("id: "):]
+
+
+async def _next(stream, timeout=1):
+    return await asyncio.wait_for(stream.__anext__(), timeout)
+
+
+def test_resume_replays_events_after_last_event_id(sse):
+    sent = [_event(stock=i) for i in range(3)]
+
+    async def run():
+        for e in sent:
+            sse.dispatch(e)
+        stream = sse.stream(last_event_id=str(sent[0]["_id"]))
+        frames = [await _next(stream) for _ in range(3)]
+        live = _event(stock=9)
+        sse.dispatch(live)
+        frames.append(await _next(stream))
+        await stream.aclose()
+        return frames, live
+
+    frames, live = asyncio.run(run())
+    assert frames[0] == b"retry: 3000\n\n"
+    assert [_id(f) for f in frames[1:]] == [str(sent[1]["_id"]), str(sent[2]["_id"]), str(live["_id"])]
+    event, data = frames[3].decode().split("\n")[1:3]
+    assert event == "event: product.update"
+    assert json.loads(data[len("data: "):])["stock"] == 9
+    assert sse.client_count == 0
+
+
+def test_resume_respects_product_filter(sse):
+    wanted = ObjectId()
+    sent = [_event(), _event(wanted), _event(), _event(wanted)]
+
+    async def run():
+        sse.dispatch(sent[0])
+        sse.dispatch(sent[1])
+        stream = sse.stream(last_event_id=str(sent[0]["_id"]), product_ids={str(wanted)})
+        frames = [await _next(stream) for _ in range(2)]
+        sse.dispatch(sent[2])
+        sse.dispatch(sent[3])
+        frames.append(await _next(stream))
+        await stream.aclose()
+        return frames
+
+    assert [_id(f) for f in asyncio.run(run())[1:]] == [str(sent[1]["_id"]), str(sent[3]["_id"])]
+
+
+def test_reset_when_last_event_id_too_old(sse):
+    sent = [_event() for _ in range(5)]  # ring buffer cuma 3
+
+    async def run():
+        for e in sent:
+            sse.dispatch(e)
+        stream = sse.stream(last_event_id=str(sent[0]["_id"]))
+        frames = [await _next(stream) for _ in range(2)]
+        sse.dispatch(_event())
+        frames.append(await _next(stream))
+        await stream.aclose()
+        return frames
+
+    _, reset, live = asyncio.run(run())
+    assert reset == b"event: reset\ndata: {}\n\n"
+    assert live.startswith(b"id: ")  # tetap lanjut live setelah reset
+
+
+def test_slow_client_dropped(sse):
+    async def run():
+        slow, fast = sse.stream(), sse.stream()
+        await _next(slow)
+        await _next(fast)
+        received = []
+        for _ in range(4):
+            sse.dispatch(_event())
+            received.append(await _next(fast))
+        # buffer 2 penuh di event ke-3 -> antrean dikosongkan, stream selesai
+        with pytest.raises(StopAsyncIteration):
+            await _next(slow)
+        count = sse.client_count
+        await fast.aclose()
+        return received, count
+
+    dropped = SSE_DROPPED.get()
+    received, count = asyncio.run(run())
+    assert len(received) == 4 and count == 1
+    assert SSE_DROPPED.get() - dropped == 1
+
+
+def test_heartbeat_when_idle(sse, monkeypatch):
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.01)
+
+    async def run():
+        stream = sse.stream()
+        frames = [await _next(stream) for _ in range(2)]
+        await stream.aclose()
+        return frames
+
+    assert asyncio.run(run())[1] == b": ping\n\n"
+
+
+def test_write_publishes_event(client, monkeypatch):
+    monkeypatch.setattr(events.broker, "_recent", deque(maxlen=10))
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10", "stock": "5",
+                                                "low_stock_threshold": "2"}).json()["product"]["_id"]
+    assert client.put(f"{API}/products/{pid}", data={"stock": "1"}).status_code == 200
+    assert client.put(f"{API}/products/{pid}", data={"description": "jati"}).status_code == 200  # tidak di-stream
+
+    payloads = [json.loads(f.data.decode().split("data: ", 1)[1]) for f in events.broker._recent]
+    assert [(p["type"], p["product_id"]) for p in payloads] == [("product.create", pid), ("product.update", pid)]
+    update = payloads[1]
+    assert update["changes"] == {"stock": {"from": 5, "to": 1}}
+    assert (update["low_stock"], update["low_stock_transition"]) == (True, "entered")
+
+
+def test_too_many_clients_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "SSE_MAX_CLIENTS", 0)
+    r = client.get(f"{API}/products/events")
+    assert r.status_code == 503 and r.headers["retry-after"] == "5"
@@ -0,0 +1,33 @@
+"""
+If-Match (optimistic concurrency): strong comparison — weak ETag tidak pernah cocok (RFC 9110 §13.1.1).
+"""
+from tests.conftest import API
+from app.api.v1.endpoints.utils import parse_if_match
+
+CATEGORIES = f"{API}/categories/categories"
+
+
+def test_parse_if_match():
+    assert parse_if_match(None) is None
+    assert parse_if_match(" * ") is None
+    assert parse_if_match('"3"') == [3]
+    assert parse_if_match('"3", "5"') == [3, 5]
+    assert parse_if_match('W/"3"') == []
+    assert parse_if_match('W/"3", "4"') == [4]
+    assert parse_if_match('"abc"') == []
+
+
+def test_weak_etag_never_matches(client):
+    r = client.post(CATEGORIES, json={"name": "Lemari"})
+    category_id, etag = r.json()["category"]["_id"], r.headers["ETag"]
+
+    for header in (f"W/{etag}", '"999"'):
+        r = client.put(f"{CATEGORIES}/{category_id}", json={"slug": "lemari"}, headers={"If-Match": header})
+        assert r.status_code == 412, (header, r.text)
+        r = client.delete(f"{CATEGORIES}/{category_id}", headers={"If-Match": header})
+        assert r.status_code == 412, (header, r.text)
+
+    r = client.put(f"{CATEGORIES}/{category_id}", json={"slug": "lemari"}, headers={"If-Match": f"W/{etag}, {etag}"})
+    assert r.status_code == 200, r.text
+    assert r.headers["ETag"] != etag
+    assert client.delete(f"{CATEGORIES}/{category_id}", headers={"If-Match": r.headers["ETag"]}).status_code == 200
@@ -0,0 +1,159 @@
+"""
+Job queue (collection `jobs`): claim/lease, retry dengan backoff, dead-letter setelah max_attempts.
+"""
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core import jobs
+from app.core.config import settings
+from app.core.jobs import JOBS_COLLECTION, JOBS_PROCESSED, JobWorker, enqueue, requeue_dead
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["t"]
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    calls = []
+
+    async def crash(payload):
+        calls.append(payload)
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(jobs._handlers, "test.crash", crash)
+    return calls
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(settings, "JOBS_RETRY_MAX_SECONDS", 25)
+
+
+def _aware(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+async def _expire_lease(db, job_id):
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db[JOBS_COLLECTION].update_one({"_id": job_id}, {"$set": {"locked_until": past}})
+
+
+def test_expired_lease_not_reclaimed_after_max_attempts(db, handler):
+    async def run():
+        worker = JobWorker(db, concurrency=1, visibility_timeout=30)
+        await enqueue(db, "test.crash", {}, max_attempts=2)
+        # worker crash di tengah handler: claim tanpa _fail/_finish, lease dibiarkan habis
+        for attempt in (1, 2):
+            job = await worker.claim()
+            assert job["attempts"] == attempt
+            await _expire_lease(db, job["_id"])
+        assert await worker.claim() is None
+        assert await worker.reap_expired() == 1
+        return await db[JOBS_COLLECTION].find_one({"_id": job["_id"]})
+
+    job = asyncio.run(run())
+    assert job["status"] == "dead" and job["attempts"] == 2
+    assert "lease expired" in job["last_error"] and "lease" not in job
+
+
+def test_reap_leaves_live_and_retryable_jobs(db, handler):
+    async def run():
+        worker = JobWorker(db, concurrency=1, visibility_timeout=30)
+        await enqueue(db, "test.crash", {"n": 1}, max_attempts=3)
+        await enqueue(db, "test.crash", {"n": 2}, max_attempts=1)
+        retryable, final = await worker.claim(), await worker.claim()
+        assert (retryable["payload"], final["payload"]) == ({"n": 1}, {"n": 2})
+        # n=1: lease habis tapi attempts tersisa; n=2: attempt terakhir, lease masih hidup
+        await _expire_lease(db, retryable["_id"])
+        assert await worker.reap_expired() == 0
+        reclaimed = await worker.claim()
+        return reclaimed, await db[JOBS_COLLECTION].distinct("status")
+
+    reclaimed, statuses = asyncio.run(run())
+    assert reclaimed["payload"] == {"n": 1} and reclaimed["attempts"] == 2
+    assert statuses == ["running"]
+
+
+def test_idle_worker_reaps_expired_final_attempt(db, handler):
+    async def run():
+        worker = JobWorker(db, concurrency=1, visibility_timeout=30)
+        await enqueue(db, "test.crash", {}, max_attempts=1)
+        job = await worker.claim()
+        await _expire_lease(db, job["_id"])
+        assert await worker.run_once() is False
+        return await db[JOBS_COLLECTION].find_one({"_id": job["_id"]})
+
+    assert asyncio.run(run())["status"] == "dead"
+
+
+def test_retry_delay_backoff_is_capped(backoff):
+    for attempts, cap in [(1, 10), (2, 20), (3, 25), (10, 25)]:
+        delays = [jobs.retry_delay(attempts) for _ in range(50)]
+        assert all(cap / 2 <= d <= cap for d in delays), (attempts, min(delays), max(delays))
+
+
+def test_failed_job_retries_with_backoff_then_dead_letter(db, handler, backoff):
+    async def run():
+        worker = JobWorker(db, concurrency=1, visibility_timeout=30)
+        await enqueue(db, "test.crash", {"n": 1}, max_attempts=3)
+        history = []
+        for _ in range(3):
+            before = datetime.now(timezone.utc)
+            assert await worker.run_once() is True
+            job = await db[JOBS_COLLECTION].find_one({})
+            history.append((job["status"], job["attempts"], (_aware(job["run_at"]) - before).total_seconds()))
+            # belum jatuh tempo -> tidak di-claim
+            assert await worker.claim() is None
+            await db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"run_at": before}})
+        assert await worker.run_once() is False
+        return history, job
+
+    dead = JOBS_PROCESSED.get("test.crash", "dead")
+    history, job = asyncio.run(run())
+    assert handler == [{"n": 1}] * 3
+    (s1, a1, d1), (s2, a2, d2), (s3, a3, _) = history
+    assert (s1, a1) == ("queued", 1) and 5 <= d1 <= 10.5
+    assert (s2, a2) == ("queued", 2) and 10 <= d2 <= 20.5
+    assert (s3, a3) == ("dead", 3)
+    assert job["last_error"] == "RuntimeError: boom" and "lease" not in job
+    assert JOBS_PROCESSED.get("test.crash", "dead") - dead == 1
+
+
+def test_requeue_dead_resets_attempts(db, handler):
+    async def run():
+        worker = JobWorker(db, concurrency=1, visibility_timeout=30)
+        await enqueue(db, "test.crash", {}, max_attempts=1)
+        await worker.run_once()
+        assert await requeue_dead(db, "test.other") == 0
+        assert await requeue_dead(db, "test.crash") == 1
+        return await worker.claim()
+
+    job = asyncio.run(run())
+    assert (job["status"], job["attempts"]) == ("running", 1)
+
+
+def test_stale_worker_cannot_overwrite_new_lease(db, monkeypatch):
+    async def ok(payload):
+        return None
+
+    monkeypatch.setitem(jobs._handlers, "test.ok", ok)
+
+    async def run():
+        slow, fast = JobWorker(db, visibility_timeout=30), JobWorker(db, visibility_timeout=30)
+        await enqueue(db, "test.ok", {})
+        stale = await slow.claim()
+        await _expire_lease(db, stale["_id"])
+        assert await fast.run_once() is True
+        # worker lama selesai belakangan: hasilnya diabaikan
+        await slow._fail(stale, RuntimeError("late"))
+        return await db[JOBS_COLLECTION].find_one({"_id": stale["_id"]})
+
+    job = asyncio.run(run())
+    assert job["status"] == "done" and job["attempts"] == 2 and "last_error" not in job
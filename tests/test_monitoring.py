@@ -0,0 +1,163 @@
+"""
+Observability: MetricsMiddleware (/metrics, label route template) dan DbAccountingMiddleware
+(slow request, N+1) — response SSE tidak dihitung sebagai request lambat.
+"""
+import asyncio
+import itertools
+import json
+import logging
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from bson import ObjectId
+from pymongo import monitoring
+
+from tests.conftest import API
+from app.core.config import settings
+from app.core.metrics import HTTP_LATENCY, HTTP_REQUESTS, MetricsMiddleware, Registry
+from app.db.monitoring import DbAccountingMiddleware, RequestAccountingListener
+
+
+def stub_app(route: str, content_type: bytes, delay: float = 0.0):
+    async def app(scope, receive, send):
+        scope["route"] = SimpleNamespace(path_format=route)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+    return app
+
+
+def call(app, path="/x"):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as c:
+            return await c.get(path)
+    return asyncio.run(run())
+
+
+def db_app(commands):
+    """
+    Stub app yang "menjalankan" command Mongo: event dikirim langsung ke RequestAccountingListener
+    (mongomock tidak mengirim command event).
+    """
+    listener, ids = RequestAccountingListener(), itertools.count(1)
+
+    async def app(scope, receive, send):
+        scope["route"] = SimpleNamespace(path_format="/t/orders")
+        for name, command in commands:
+            request_id = next(ids)
+            listener.started(monitoring.CommandStartedEvent(
+                {name: command.pop("collection"), **command}, "db", request_id, ("mongo", 27017), request_id))
+            listener.succeeded(monitoring.CommandSucceededEvent(
+                timedelta(milliseconds=2), {"ok": 1}, name, request_id, ("mongo", 27017), request_id))
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+@pytest.fixture
+def slow_log(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 0)
+    caplog.set_level(logging.WARNING, logger="app.db.monitoring")
+    return lambda: [r.getMessage() for r in caplog.records if '"slow_request"' in r.getMessage()]
+
+
+@pytest.fixture
+def db_log(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 5)
+    caplog.set_level(logging.WARNING, logger="app.db.monitoring")
+    return lambda event: [json.loads(r.getMessage()) for r in caplog.records if f'"{event}"' in r.getMessage()]
+
+
+def test_event_stream_not_reported_as_slow_request(slow_log):
+    app = MetricsMiddleware(DbAccountingMiddleware(stub_app("/t/events", b"text/event-stream", 0.02)))
+    assert call(app).status_code == 200
+    assert slow_log() == []
+    # tetap terhitung sebagai request, tapi tidak masuk histogram latency
+    assert HTTP_REQUESTS.get("GET", "/t/events", "200") == 1
+    assert "GET|/t/events|200" not in HTTP_LATENCY.samples()
+
+
+def test_regular_response_reported(slow_log):
+    app = MetricsMiddleware(DbAccountingMiddleware(stub_app("/t/json", b"application/json", 0.02)))
+    assert call(app).status_code == 200
+    assert len(slow_log()) == 1 and '"route": "/t/json"' in slow_log()[0]
+    assert sum(HTTP_LATENCY.samples()["GET|/t/json|200"][:-1]) == 1
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_prefix))
+
+
+def test_metrics_exposition_uses_route_template(client):
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    missing = str(ObjectId())
+    route = f'method="GET",route="{API}/products/{{product_id}}"'
+    before = client.get("/metrics").text
+
+    assert client.get(f"{API}/products/{pid}").status_code == 200
+    assert client.get(f"{API}/products/{missing}").status_code == 404
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    text = r.text
+    assert "# TYPE http_requests_total counter" in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    # 1 seri per template route, id asli tidak jadi label (kardinalitas terbatas)
+    assert pid not in text and missing not in text
+    for status in ("200", "404"):
+        prefix = f'http_requests_total{{{route},status="{status}"}}'
+        assert _sample(text, prefix) - _sample(before, prefix) == 1
+        inf = f'http_request_duration_seconds_bucket{{{route},status="{status}",le="+Inf"}}'
+        count = f'http_request_duration_seconds_count{{{route},status="{status}"}}'
+        assert _sample(text, inf) == _sample(text, count) >= 1
+
+
+def test_multiproc_snapshots_are_summed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_MULTIPROC_DIR", str(tmp_path))
+    reg = Registry()
+    requests = reg.counter("t_requests_total", "t", ("route",))
+    latency = reg.histogram("t_latency_seconds", "t", buckets=(0.1, 1.0))
+    requests.inc("/a", amount=2)
+    latency.observe(0.05)
+    # snapshot worker lain
+    (tmp_path / "99999.json").write_text(json.dumps({
+        "t_requests_total": {"/a": 3, "/b": 1},
+        "t_latency_seconds": {"": [0, 1, 0, 0.5]},
+    }))
+
+    text = reg.render()
+    assert 't_requests_total{route="/a"} 5.0' in text
+    assert 't_requests_total{route="/b"} 1.0' in text
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{le="1.0"} 2' in text
+    assert "t_latency_seconds_count 2" in text and "t_latency_seconds_sum 0.55" in text
+
+
+def _lookups(n):
+    # 1 find per item, filter sama bentuknya (nilai beda)
+    return [("find", {"collection": "categories", "filter": {"_id": ObjectId()}}) for _ in range(n)]
+
+
+def test_n_plus_one_warning(db_log, monkeypatch):
+    monkeypatch.setattr(settings, "DB_SERVER_TIMING", True)
+    commands = [("find", {"collection": "products", "filter": {"status": "active"}})] + _lookups(7)
+    r = call(DbAccountingMiddleware(db_app(commands)))
+    assert r.headers["server-timing"].startswith('db;dur=16.00;desc="8 queries", app;dur=')
+
+    (warning,) = db_log("n_plus_one")
+    assert warning == {"event": "n_plus_one", "method": "GET", "route": "/t/orders", "collection": "categories",
+                       "command": "find", "filter_keys": ["_id"], "repeats": 7}
+
+
+def test_repeats_under_threshold_not_reported(db_log):
+    call(DbAccountingMiddleware(db_app(_lookups(5))))
+    assert db_log("n_plus_one") == []
+
+
+def test_slow_request_log_includes_db_time(slow_log, db_log):
+    call(DbAccountingMiddleware(db_app(_lookups(3))))
+    (entry,) = db_log("slow_request")
+    assert (entry["route"], entry["status"], entry["db_commands"], entry["db_ms"]) == ("/t/orders", 200, 3, 6.0)
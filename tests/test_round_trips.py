@@ -0,0 +1,121 @@
+"""
+Jumlah operasi Mongo per write endpoint: write langsung mengembalikan dokumen (find_one_and_* /
+response dibangun dari dokumen yang di-insert), tanpa pre-read / baca ulang.
+"""
+import io
+
+import pytest
+
+from tests.conftest import API, ADMIN, login
+from app.core.config import settings
+from app.db import mongodb_config
+
+BUSINESS = ("users", "products", "products_archive", "categories")
+# PNG 1x1 (sama dengan TINY_PNG di benchmarks/bench_api.py)
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+@pytest.fixture
+def c(client, db_ops, monkeypatch):
+    # auth stateless: request terautentikasi tanpa query users/revoked_tokens -> yang terhitung hanya write-nya
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    client.headers["Authorization"] = f"Bearer {login(client, **ADMIN)}"
+    # kondisi normal setelah index build selesai: keunikan dijaga unique index, bukan pre-read
+    for coll, name in (("users", "email_ci_unique"), ("categories", "name_ci_unique")):
+        mongodb_config._unique_ready.add((settings.MONGODB_DB, coll, name))
+    client.ops = db_ops
+    return client
+
+
+def _ops(c, method, url, **kwargs):
+    c.ops.clear()
+    r = c.request(method, url, **kwargs)
+    assert r.status_code < 300, r.text
+    return r, c.ops.on(*BUSINESS)
+
+
+def _product(c, **data):
+    return c.post(f"{API}/products", data={"name": "Meja", "price": "10", **data}).json()["product"]["_id"]
+
+
+def test_register(c):
+    _, ops = _ops(c, "POST", f"{API}/auth/register", json={"email": "b@example.com", "password": "pw"})
+    # role admin pertama ditentukan dari 1 query; tanpa cek email & tanpa baca ulang
+    assert ops == ["users.find_one", "users.insert_one"]
+
+
+def test_create_user(c):
+    _, ops = _ops(c, "POST", f"{API}/users", data={"email": "b@example.com", "password": "pw"})
+    assert ops == ["users.insert_one"]
+
+
+def test_update_user(c):
+    uid = c.post(f"{API}/users", data={"email": "b@example.com", "password": "pw"}).json()["user"]["_id"]
+    r, ops = _ops(c, "PUT", f"{API}/users/{uid}", data={"full_name": "Budi", "phone_number": "0812"})
+    assert ops == ["users.find_one_and_update"]
+    assert r.json()["user"]["full_name"] == "Budi"
+
+
+def test_create_product(c):
+    _, ops = _ops(c, "POST", f"{API}/products", data={"name": "Meja", "price": "10"})
+    assert ops == ["products.insert_one"]
+
+
+def test_upload_product_images(c):
+    pid = _product(c)
+    r, ops = _ops(c, "POST", f"{API}/products/{pid}/images",
+                  files=[("files", ("a.png", io.BytesIO(PNG), "image/png"))])
+    assert ops == ["products.find_one_and_update"]
+    assert len(r.json()["product"]["images"]) == 1
+
+
+def test_update_product(c):
+    pid = _product(c)
+    r, ops = _ops(c, "PUT", f"{API}/products/{pid}", data={"stock": "7"})
+    assert ops == ["products.find_one_and_update"]
+    assert r.json()["product"]["stock"] == 7
+
+
+def test_delete_product_images(c):
+    pid = _product(c)
+    c.post(f"{API}/products/{pid}/images", files=[("files", ("a.png", io.BytesIO(PNG), "image/png"))])
+    _, ops = _ops(c, "DELETE", f"{API}/products/{pid}/images")
+    assert ops == ["products.find_one_and_update"]
+
+
+def test_delete_product(c):
+    pid = _product(c)
+    _, ops = _ops(c, "DELETE", f"{API}/products/{pid}")
+    assert ops == ["products.find_one_and_delete"]
+
+
+def test_delete_inactive_product_drops_archive_copy(c):
+    # kandidat arsip: salinan yang mungkin sedang ditulis archive_products ikut dibuang
+    pid = _product(c, status="inactive")
+    _, ops = _ops(c, "DELETE", f"{API}/products/{pid}")
+    assert ops == ["products.find_one_and_delete", "products_archive.delete_one"]
+
+
+def test_delete_archived_product_falls_back_to_archive(c):
+    pid = _product(c)
+    c.portal.call(_move_to_archive, pid)
+    _, ops = _ops(c, "DELETE", f"{API}/products/{pid}")
+    assert ops == ["products.find_one_and_delete", "products_archive.find_one_and_delete"]
+
+
+async def _move_to_archive(pid):
+    from bson import ObjectId
+    from app.archive import ARCHIVE_COLLECTION
+    db = await mongodb_config.get_db()
+    doc = await db.products.find_one_and_delete({"_id": ObjectId(pid)})
+    await db[ARCHIVE_COLLECTION].insert_one(doc)
+
+
+def test_update_category(c):
+    cid = c.post(f"{API}/categories/categories", json={"name": "Meja"}).json()["category"]["_id"]
+    r, ops = _ops(c, "PUT", f"{API}/categories/categories/{cid}", json={"slug": "meja"})
+    assert ops == ["categories.find_one_and_update"]
+    assert r.json()["category"]["slug"] == "meja"
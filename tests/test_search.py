@@ -0,0 +1,120 @@
+"""
+Pencarian produk: facet counts (1 aggregate $facet) di list produk dan autocomplete prefix nama
+(field name_key ter-normalisasi).
+"""
+import asyncio
+
+import pytest
+
+from tests.conftest import API
+from app.core.config import settings
+from app.migrations import products_name_key
+
+
+@pytest.fixture
+def catalog(client):
+    def category(name):
+        return client.post(f"{API}/categories/categories", json={"name": name}).json()["category"]["_id"]
+
+    def product(name, price, category_id=None, status="active"):
+        data = {"name": name, "price": str(price), "status": status}
+        if category_id:
+            data["category_id"] = category_id
+        r = client.post(f"{API}/products", data=data)
+        assert r.status_code == 200, r.text
+        return r.json()["product"]["_id"]
+
+    meja, kursi = category("Meja"), category("Kursi")
+    product("Meja Jati", 50_000, meja)
+    product("Meja Kaca", 700_000, meja)
+    product("Meja Lipat", 200_000, meja, status="inactive")
+    product("Kursi Meja Makan", 6_000_000, kursi)
+    product("Lemari", 300_000)
+    return {"meja": meja, "kursi": kursi}
+
+
+def _facets(client, **params):
+    r = client.get(f"{API}/products", params={"facets": "true", **params})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_facet_counts_follow_filter(client, catalog):
+    body = _facets(client, search="meja", page_size=2)
+    assert body["meta"]["total"] == 4 and len(body["items"]) == 2
+    facets = body["facets"]
+    assert facets["category"] == [
+        {"id": catalog["meja"], "name": "Meja", "count": 3},
+        {"id": catalog["kursi"], "name": "Kursi", "count": 1},
+    ]
+    assert sorted((s["value"], s["count"]) for s in facets["status"]) == [("active", 3), ("inactive", 1)]
+    # semua rentang harga tampil, termasuk yang kosong
+    assert [(p["min"], p["max"], p["count"]) for p in facets["price"]] == [
+        (0, 100_000, 1), (100_000, 500_000, 1), (500_000, 1_000_000, 1), (1_000_000, 5_000_000, 0),
+        (5_000_000, None, 1),
+    ]
+
+
+def test_facets_include_uncategorized_and_status_filter(client, catalog):
+    facets = _facets(client, status="active")["facets"]
+    assert {(c["name"], c["count"]) for c in facets["category"]} == {("Meja", 2), ("Kursi", 1), (None, 1)}
+    assert facets["status"] == [{"value": "active", "count": 4}]
+
+
+def test_facets_in_one_query(client, catalog, db_ops):
+    _facets(client)  # muat cache nama kategori
+    db_ops.clear()
+    body = _facets(client, category_id=catalog["kursi"])
+    assert body["facets"]["category"] == [{"id": catalog["kursi"], "name": "Kursi", "count": 1}]
+    # hasil, total & semua facet dari 1 aggregate; nama kategori dari cache per worker
+    assert db_ops.on("products", "categories") == ["products.aggregate"]
+
+
+def test_no_facets_by_default(client, catalog):
+    assert "facets" not in client.get(f"{API}/products").json()
+
+
+def _complete(client, q, **params):
+    r = client.get(f"{API}/products/autocomplete", params={"q": q, **params})
+    assert r.status_code == 200, r.text
+    return [item["name"] for item in r.json()]
+
+
+@pytest.fixture
+def names(client):
+    for name in ("Meja Makan", "  MEJA   kopi", "Méja Belajar", "Kursi Meja", "Lemari", "Meja (Lipat) 2+"):
+        assert client.post(f"{API}/products", data={"name": name, "price": "10"}).status_code == 200
+
+
+def test_autocomplete_prefix_is_normalized(client, names):
+    # casefold + tanpa aksen + spasi dirapikan; urut name_key, hanya awalan (bukan contains)
+    assert _complete(client, "meja") == ["Meja (Lipat) 2+", "Méja Belajar", "  MEJA   kopi", "Meja Makan"]
+    assert _complete(client, "  MÉJA  K") == ["  MEJA   kopi"]
+    assert _complete(client, "meja", limit=2) == ["Meja (Lipat) 2+", "Méja Belajar"]
+    # karakter regex di-escape
+    assert _complete(client, "meja (lipat) 2+") == ["Meja (Lipat) 2+"]
+    assert _complete(client, "eja") == []
+
+
+def test_autocomplete_items_are_minimal(client, names):
+    (item,) = client.get(f"{API}/products/autocomplete", params={"q": "lemari"}).json()
+    assert set(item) == {"id", "name", "thumbnail"} and item["thumbnail"] is None
+    product = client.get(f"{API}/products/{item['id']}").json()
+    assert "name_key" not in product
+
+
+def test_rename_updates_autocomplete(client, names):
+    pid = client.get(f"{API}/products/autocomplete", params={"q": "lemari"}).json()[0]["id"]
+    assert client.put(f"{API}/products/{pid}", data={"name": "Rak Buku"}).status_code == 200
+    assert _complete(client, "lemari") == []
+    assert _complete(client, "rak") == ["Rak Buku"]
+
+
+def test_migration_backfills_name_key(client, mongo):
+    db = mongo[settings.MONGODB_DB]
+    asyncio.run(db.products.insert_many([{"name": "Sofa Bed", "price": 1}, {"name": "Sofa  Kulit", "price": 2}]))
+    assert _complete(client, "sofa") == []
+
+    assert asyncio.run(products_name_key(db)) == 2
+    assert asyncio.run(products_name_key(db)) == 0  # idempotent
+    assert _complete(client, "sofa k") == ["Sofa  Kulit"]
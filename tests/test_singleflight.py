@@ -0,0 +1,71 @@
+"""
+Single-flight: GET identik yang datang bersamaan berbagi 1 query, hasil disimpan sebentar (micro-TTL),
+write menginvalidasi.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from tests.conftest import API
+from app.api.v1.endpoints import products
+from app.core.config import settings
+from app.core.singleflight import SINGLEFLIGHT_REQUESTS, singleflight
+
+
+@pytest.fixture
+def slow_reads(monkeypatch):
+    # mongomock menjawab tanpa pernah yield ke event loop -> perlambat supaya request benar-benar tumpang tindih
+    find_product = products._find_product
+
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await find_product(*args, **kwargs)
+
+    monkeypatch.setattr(products, "_find_product", slow)
+
+
+def _concurrent_gets(client, path, n):
+    async def run():
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", headers=client.headers) as c:
+            return await asyncio.gather(*(c.get(path) for _ in range(n)))
+    # loop yang sama dengan app (lifespan TestClient) supaya future single-flight terbagi
+    return client.portal.call(run)
+
+
+def test_concurrent_identical_gets_share_one_query(client, db_ops, slow_reads):
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    coalesced = SINGLEFLIGHT_REQUESTS.get("product", "coalesced")
+    db_ops.clear()
+
+    responses = _concurrent_gets(client, f"{API}/products/{pid}", 10)
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.content for r in responses}) == 1 and len({r.headers["etag"] for r in responses}) == 1
+    assert db_ops.on("products", "products_archive") == ["products.find_one"]
+    assert SINGLEFLIGHT_REQUESTS.get("product", "coalesced") - coalesced == 9
+
+
+def test_write_invalidates_cached_read(client, db_ops, monkeypatch):
+    monkeypatch.setattr(singleflight, "ttl", 60)
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    db_ops.clear()
+
+    assert client.get(f"{API}/products/{pid}").json()["price"] == 10
+    # micro-TTL: GET berikutnya dari cache, tanpa query
+    assert client.get(f"{API}/products/{pid}").json()["price"] == 10
+    assert db_ops.on("products") == ["products.find_one"]
+
+    assert client.put(f"{API}/products/{pid}", data={"price": "12"}).status_code == 200
+    db_ops.clear()
+    assert client.get(f"{API}/products/{pid}").json()["price"] == 12
+    assert db_ops.on("products") == ["products.find_one"]
+
+
+def test_disabled_queries_every_request(client, db_ops, slow_reads, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_ENABLED", False)
+    pid = client.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    db_ops.clear()
+
+    assert {r.status_code for r in _concurrent_gets(client, f"{API}/products/{pid}", 4)} == {200}
+    assert db_ops.on("products") == ["products.find_one"] * 4
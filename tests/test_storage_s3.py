@@ -0,0 +1,258 @@
+"""
+S3Storage terhadap stand-in S3/MinIO in-process (ASGI lewat httpx.ASGITransport): signature V4 dicek ulang
+di server, single PUT vs multipart (+ abort), Range GET, HEAD, list berhalaman, dan copy_storage local -> s3.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+from urllib.parse import parse_qsl, quote, unquote
+
+import httpx
+import pytest
+
+from app.core import storage
+from app.core.storage import LocalStorage, S3Storage, StorageError, copy_storage
+
+ACCESS_KEY, SECRET_KEY, REGION, BUCKET = "minio", "minio-secret", "us-east-1", "pms-uploads"
+
+
+class FakeS3:
+    """
+    Bucket tunggal di memori. Request dengan signature SigV4 yang salah -> 403 SignatureDoesNotMatch.
+    """
+
+    def __init__(self, secret_key=SECRET_KEY):
+        self.secret_key = secret_key
+        self.objects = {}  # key -> (data, content_type)
+        self.uploads = {}  # upload_id -> {part_number: data}
+        self.part_sizes = {}  # key -> ukuran part multipart yang selesai
+        self.requests = []  # (method, key, sorted query names)
+
+    def _signature_ok(self, method, raw_path, query, headers) -> bool:
+        auth = headers.get("authorization", "")
+        if not auth.startswith("AWS4-HMAC-SHA256 "):
+            return False
+        fields = dict(p.strip().split("=", 1) for p in auth[len("AWS4-HMAC-SHA256 "):].split(","))
+        access_key, day, region, service, _ = fields["Credential"].split("/")
+        names = fields["SignedHeaders"].split(";")
+        if access_key != ACCESS_KEY or not {"host", "x-amz-date", "x-amz-content-sha256"} <= set(names):
+            return False
+        canonical_query = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query))
+        canonical = "\n".join([
+            method, raw_path, canonical_query, "".join(f"{n}:{headers[n].strip()}\n" for n in names),
+            ";".join(names), headers["x-amz-content-sha256"],
+        ])
+        scope = f"{day}/{region}/{service}/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", headers["x-amz-date"], scope,
+                             hashlib.sha256(canonical.encode()).hexdigest()])
+        k = ("AWS4" + self.secret_key).encode()
+        for part in (day, region, service, "aws4_request"):
+            k = hmac.new(k, part.encode(), hashlib.sha256).digest()
+        expected = hmac.new(k, to_sign.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, fields["Signature"])
+
+    async def __call__(self, scope, receive, send):
+        headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        raw_path = scope["raw_path"].split(b"?", 1)[0].decode()
+        query = parse_qsl(scope["query_string"].decode(), keep_blank_values=True)
+        method = scope["method"]
+        bucket, _, key = unquote(raw_path).lstrip("/").partition("/")
+        self.requests.append((method, key, tuple(sorted(k for k, _ in query))))
+
+        if not self._signature_ok(method, raw_path, query, headers):
+            status, hdrs, out = 403, [], b"<Error><Code>SignatureDoesNotMatch</Code></Error>"
+        elif bucket != BUCKET:
+            status, hdrs, out = 404, [], b"<Error><Code>NoSuchBucket</Code></Error>"
+        else:
+            status, hdrs, out = self._handle(method, key, dict(query), headers, body)
+        await send({"type": "http.response.start", "status": status, "headers": hdrs})
+        await send({"type": "http.response.body", "body": out})
+
+    def _handle(self, method, key, q, headers, body):
+        if not key and method == "GET":
+            return self._list(q)
+        if method == "POST" and "uploads" in q:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+            return 200, [], f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>" \
+                            f"</InitiateMultipartUploadResult>".encode()
+        if method == "PUT" and "partNumber" in q:
+            self.uploads[q["uploadId"]][int(q["partNumber"])] = body
+            return 200, [(b"etag", f'"{hashlib.md5(body).hexdigest()}"'.encode())], b""
+        if method == "POST" and "uploadId" in q:
+            parts = self.uploads.pop(q["uploadId"])
+            listed = body.decode().count("<Part>")
+            etags = [f'"{hashlib.md5(parts[i]).hexdigest()}"' for i in sorted(parts)]
+            if listed != len(parts) or any(etag not in body.decode() for etag in etags):
+                return 400, [], b"<Error><Code>InvalidPart</Code></Error>"
+            self.objects[key] = (b"".join(parts[i] for i in sorted(parts)), "application/octet-stream")
+            self.part_sizes[key] = [len(parts[i]) for i in sorted(parts)]
+            return 200, [], b"<CompleteMultipartUploadResult/>"
+        if method == "DELETE" and "uploadId" in q:
+            return (204, [], b"") if self.uploads.pop(q["uploadId"], None) is not None else (404, [], b"")
+        if method == "DELETE":
+            self.objects.pop(key, None)
+            return 204, [], b""
+        if method == "PUT":
+            self.objects[key] = (body, headers.get("content-type"))
+            return 200, [(b"etag", f'"{hashlib.md5(body).hexdigest()}"'.encode())], b""
+        if key not in self.objects:
+            return 404, [], b"" if method == "HEAD" else b"<Error><Code>NoSuchKey</Code></Error>"
+        data, content_type = self.objects[key]
+        hdrs = [(b"content-type", content_type.encode()), (b"last-modified", b"Mon, 01 Jan 2024 00:00:00 GMT")]
+        if method == "HEAD":
+            return 200, hdrs + [(b"content-length", str(len(data)).encode())], b""
+        if "range" in headers:
+            start, end = headers["range"][len("bytes="):].split("-")
+            return 206, hdrs, data[int(start): int(end) + 1 if end else None]
+        return 200, hdrs, data
+
+    def _list(self, q):
+        assert q["list-type"] == "2"
+        keys = sorted(k for k in self.objects if k.startswith(q.get("prefix", "")))
+        # token opaque berisi karakter yang wajib di-encode ('/', '=', '+')
+        start = int(q["continuation-token"].split("/")[1].rstrip("=")) if "continuation-token" in q else 0
+        page = keys[start:start + int(q["max-keys"])]
+        xml = "".join(f"<Contents><Key>{k}</Key><LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+                      f"<Size>{len(self.objects[k][0])}</Size></Contents>" for k in page)
+        if start + len(page) < len(keys):
+            xml += f"<NextContinuationToken>t+k/{start + len(page)}==</NextContinuationToken>"
+        return 200, [], f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{xml}' \
+                        f'</ListBucketResult>'.encode()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setattr(storage, "S3_PART_SIZE", 64 * 1024)
+    server = FakeS3()
+
+    def make(secret_key=SECRET_KEY):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server))
+        return S3Storage("http://minio:9000", BUCKET, ACCESS_KEY, secret_key, REGION, client=client)
+
+    return server, make
+
+
+async def chunks(data: bytes, size: int = 10_000):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def read(it) -> bytes:
+    return b"".join([c async for c in it])
+
+
+def test_small_file_single_put(s3):
+    server, make = s3
+    data = os.urandom(1000)
+
+    async def run():
+        st = make()
+        assert await st.put("products/a b+ü.png", chunks(data)) == len(data)
+        return await read(st.get("products/a b+ü.png")), await st.stat("products/a b+ü.png")
+
+    body, info = asyncio.run(run())
+    assert body == data
+    assert (info.size, info.content_type) == (len(data), "image/png")
+    assert [m for m, _, _ in server.requests] == ["PUT", "GET", "HEAD"]
+    assert server.objects["products/a b+ü.png"][1] == "image/png"
+
+
+def test_wrong_secret_is_rejected(s3):
+    _, make = s3
+    with pytest.raises(StorageError, match="HTTP 403"):
+        asyncio.run(make("wrong").put("products/a.png", chunks(b"x")))
+
+
+def test_large_file_multipart(s3):
+    server, make = s3
+    data = os.urandom(64 * 1024 * 3 + 123)
+
+    async def run():
+        st = make()
+        assert await st.put("products/big.jpg", chunks(data, 7_000), "image/jpeg") == len(data)
+        return await read(st.get("products/big.jpg"))
+
+    assert asyncio.run(run()) == data
+    sizes = server.part_sizes["products/big.jpg"]
+    # S3: semua part kecuali terakhir >= ukuran minimum part
+    assert len(sizes) > 1 and min(sizes[:-1]) >= storage.S3_PART_SIZE
+    calls = [(m, q) for m, _, q in server.requests[:-1]]
+    assert calls == [("POST", ("uploads",))] + [("PUT", ("partNumber", "uploadId"))] * len(sizes) + \
+        [("POST", ("uploadId",))]
+    assert not server.uploads
+
+
+def test_multipart_aborted_on_error(s3):
+    server, make = s3
+
+    async def broken():
+        yield os.urandom(64 * 1024)
+        yield os.urandom(64 * 1024)
+        raise OSError("client disconnected")
+
+    with pytest.raises(OSError):
+        asyncio.run(make().put("products/half.png", broken()))
+    assert server.requests[-1][0::2] == ("DELETE", ("uploadId",))
+    assert not server.uploads and "products/half.png" not in server.objects
+
+
+def test_range_get_stat_and_delete(s3):
+    _, make = s3
+    data = bytes(range(256)) * 10
+
+    async def run():
+        st = make()
+        await st.put("users/u.jpg", chunks(data))
+        part = await read(st.get("users/u.jpg", 100, 612))
+        tail = await read(st.get("users/u.jpg", 2500))
+        assert await st.delete("users/u.jpg")
+        with pytest.raises(FileNotFoundError):
+            await read(st.get("users/u.jpg"))
+        return part, tail, await st.stat("users/u.jpg")
+
+    part, tail, gone = asyncio.run(run())
+    assert part == data[100:612] and tail == data[2500:]
+    assert gone is None
+
+
+def test_list_paginates_with_continuation_token(s3):
+    server, make = s3
+
+    async def run():
+        st = make()
+        for i in range(5):
+            await st.put(f"products/p{i}.png", chunks(b"x" * (i + 1)))
+        await st.put("users/u.png", chunks(b"u"))
+        server.requests.clear()
+        return [(f.key, f.size) async for f in st.list("products/", batch_size=2)]
+
+    assert asyncio.run(run()) == [(f"products/p{i}.png", i + 1) for i in range(5)]
+    assert len(server.requests) == 3  # 2 + 2 + 1
+
+
+def test_copy_local_to_s3(s3, upload_dir):
+    server, make = s3
+    files = {f"products/p{i}.png": os.urandom(500 + i) for i in range(12)}
+    files["products/big.png"] = os.urandom(64 * 1024 * 2 + 1)  # multipart di tujuan
+
+    async def run():
+        src, dst = LocalStorage(), make()
+        for key, data in files.items():
+            await src.put(key, chunks(data))
+        first = await copy_storage(src, dst, "products/", concurrency=4)
+        again = await copy_storage(src, dst, "products/", concurrency=4)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert (first["copied"], first["errors"], first["bytes"]) == (13, 0, sum(map(len, files.values())))
+    assert (again["copied"], again["skipped"]) == (0, 13)
+    assert {k: v[0] for k, v in server.objects.items()} == files
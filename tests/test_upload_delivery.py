@@ -0,0 +1,167 @@
+"""
+Pengiriman /uploads lewat reverse proxy (X-Accel-Redirect / X-Sendfile) dan URL upload bertanda tangan.
+AccelProxy meniru nginx: request diteruskan ke app, lalu header X-Accel-Redirect / X-Sendfile dilayani
+dari disk (location `internal`), persis seperti proxy sungguhan.
+"""
+import io
+import mimetypes
+
+from pathlib import Path
+from urllib.parse import unquote, urlsplit, parse_qs
+
+import pytest
+
+from app.core.config import settings
+from app.core.upload_urls import signed_url
+from tests.conftest import API, make_client, login_admin
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+class AccelProxy:
+    """
+    Stub reverse proxy di depan app ASGI yang menghormati X-Accel-Redirect / X-Sendfile.
+    """
+
+    def __init__(self, app, root: Path):
+        self.app = app
+        self.root = root
+        self.served = []  # path internal yang dikirim proxy (bukan app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start, body = {}, []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            else:
+                body.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        headers = {k.decode().lower(): v.decode() for k, v in start["headers"]}
+        target = None
+        if "x-accel-redirect" in headers:
+            internal = unquote(headers["x-accel-redirect"])
+            assert internal.startswith(settings.UPLOAD_ACCEL_PREFIX.rstrip("/") + "/")
+            target = self.root / internal[len(settings.UPLOAD_ACCEL_PREFIX.rstrip("/")) + 1:]
+        elif "x-sendfile" in headers:
+            target = Path(headers["x-sendfile"])
+
+        if target is None:
+            await send(start)
+            await send({"type": "http.response.body", "body": b"".join(body)})
+            return
+        assert not b"".join(body), "app tidak boleh mengirim isi file sendiri"
+        self.served.append(str(target))
+        if not target.is_file():
+            status, content, ctype = 404, b"not found", "text/plain"
+        else:
+            status, content = 200, target.read_bytes()
+            ctype = headers.get("content-type") or mimetypes.guess_type(target.name)[0]
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", ctype.encode()), (b"content-length", str(len(content)).encode())]})
+        await send({"type": "http.response.body", "body": content})
+
+
+@pytest.fixture
+def proxy(upload_dir, mongo):
+    from app.main import app
+    stub = AccelProxy(app, upload_dir)
+    with make_client(stub) as c:
+        c.stub = stub
+        yield login_admin(c)
+
+
+def _product_with_image(c) -> dict:
+    pid = c.post(f"{API}/products", data={"name": "Meja", "price": "10"}).json()["product"]["_id"]
+    r = c.post(f"{API}/products/{pid}/images", files=[("files", ("a.png", io.BytesIO(PNG), "image/png"))])
+    assert r.status_code == 200, r.text
+    return r.json()["product"]
+
+
+def _anonymous(c, url: str, **kwargs):
+    return c.get(url, headers={"Authorization": ""}, **kwargs)
+
+
+def test_x_accel_redirect_is_served_by_proxy(proxy):
+    path = _product_with_image(proxy)["images"][0]
+    r = proxy.get(path)
+    assert r.status_code == 200
+    assert r.content == PNG
+    assert r.headers["content-type"] == "image/png"
+    assert proxy.stub.served and proxy.stub.served[-1].endswith(Path(path).name)
+
+
+def test_missing_file_is_404_from_proxy(proxy):
+    assert proxy.get("/uploads/products/nope.png").status_code == 404
+
+
+def test_path_traversal_rejected_by_app(proxy):
+    assert proxy.get("/uploads/..%2F..%2Fetc%2Fpasswd").status_code == 404
+    assert not proxy.stub.served
+
+
+def test_x_sendfile(proxy, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DELIVERY", "x-sendfile")
+    path = _product_with_image(proxy)["images"][0]
+    r = proxy.get(path)
+    assert r.status_code == 200 and r.content == PNG
+
+
+def test_signed_mode_signs_every_upload_url(proxy, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_ACCESS", "signed")
+    product = _product_with_image(proxy)
+    pid = product["_id"]
+    raw = proxy.get(f"{API}/products/{pid}", params={"fields": "images"}).json()
+
+    urls = [
+        product["images"][0],  # response upload
+        raw["images"][0],  # detail
+        proxy.get(f"{API}/products").json()["items"][0]["thumbnail"],  # list
+        proxy.get(f"{API}/products/batch", params={"ids": pid}).json()["items"][0]["images"][0],
+        proxy.get(f"{API}/products/autocomplete", params={"q": "mej"}).json()[0]["thumbnail"],
+        proxy.put(f"{API}/products/{pid}", data={"stock": "3"}).json()["product"]["images"][0],
+    ]
+    for url in urls:
+        assert "st=" in url, url
+        r = _anonymous(proxy, url)
+        assert r.status_code == 200 and r.content == PNG, url
+
+    # path mentah / signature diubah / kadaluarsa -> ditolak app, proxy tidak mengirim apa pun
+    bare = urlsplit(urls[0]).path
+    served = len(proxy.stub.served)
+    assert _anonymous(proxy, bare).status_code == 403
+    assert _anonymous(proxy, urls[0].replace("st=", "st=x")).status_code == 403
+    assert _anonymous(proxy, signed_url(bare, ttl=60, now=1_000_000)).status_code == 403
+    assert len(proxy.stub.served) == served
+
+
+def test_signed_mode_profile_image(proxy, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_ACCESS", "signed")
+    r = proxy.post(f"{API}/users", data={"email": "b@example.com", "password": "pw"},
+                   files={"profile_image": ("u.png", io.BytesIO(PNG), "image/png")})
+    user = r.json()["user"]
+    listed = proxy.get(f"{API}/users").json()["items"]
+    detail = proxy.get(f"{API}/users/{user['_id']}").json()
+    for url in (user["profile_image"], detail["profile_image"],
+                next(u for u in listed if u["_id"] == user["_id"])["profile_image"]):
+        assert parse_qs(urlsplit(url).query).keys() >= {"st", "ts", "e"}
+        assert _anonymous(proxy, url).content == PNG
+
+
+def test_cached_responses_keep_raw_paths(proxy, monkeypatch):
+    # signature dibuat per response; hasil cache tetap path mentah -> mode public tidak ikut bertanda tangan
+    pid = _product_with_image(proxy)["_id"]
+    monkeypatch.setattr(settings, "UPLOAD_ACCESS", "signed")
+    assert "st=" in proxy.get(f"{API}/products/{pid}").json()["images"][0]
+    monkeypatch.setattr(settings, "UPLOAD_ACCESS", "public")
+    assert "st=" not in proxy.get(f"{API}/products/{pid}").json()["images"][0]
+
+
+def test_token_mode(proxy, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_ACCESS", "token")
+    path = urlsplit(_product_with_image(proxy)["images"][0]).path
+    assert _anonymous(proxy, path).status_code == 401
+    assert proxy.get(path).content == PNG